@@ -4,64 +4,496 @@
 # Jan 17, 2025
 # This portion is implemented as part of Phase 1 @Unique Karanjit
 # ----------------------------------------------------------------------------------------------------------------------
+
+from itertools import islice
+from operator import itemgetter
+
+from product import PRODUCT_TYPES
+
+
+def product_key(product, product_id=None):
+    """
+    Returns the key identifying a product inside a price bucket.
+
+    :param product: The product stored in the tree.
+    :param product_id: An explicit product ID, which takes precedence.
+    :return: The explicit ID, else the product's 'id' field, else a unique placeholder so that
+             products without an ID never replace each other.
+    """
+    if product_id is not None:
+        return product_id
+    if isinstance(product, PRODUCT_TYPES) and product.get('id'):
+        return product['id']
+    return object()
+
+
 class AVLNode:
     """
     Represents a node in an AVL tree.
 
-    Each node stores a product with its price, as well as pointers to its left and right children.
-    The height attribute is used to maintain AVL tree balance.
+    Each node stores one distinct price together with the bucket of products sharing that
+    price, as well as pointers to its left and right children. The height attribute is used
+    to maintain AVL tree balance, so the height depends on the number of distinct prices.
+    The size and total attributes hold the number of products and the sum of their prices in
+    the node's subtree, which answer order-statistic queries without visiting the products.
+    Nodes use __slots__ so that they carry no per-instance dictionary.
     """
 
-    def __init__(self, price, product):
+    __slots__ = ('price', 'products', 'height', 'size', 'total', 'left', 'right')
+
+    def __init__(self, price, product, product_id=None):
         """
         Initializes an AVL tree node.
 
         :param price: The price of the product (used as the sorting key).
-        :param product: The product associated with this price.
+        :param product: The first product associated with this price.
+        :param product_id: The product's ID (derived from the product if None).
         """
         self.price = price  # Key used for ordering nodes.
-        self.product = product  # Product information stored in the node.
+        self.products = {product_key(product, product_id): product}  # Products at this price, by ID.
         self.height = 1  # Initial height of the node (leaf nodes have height 1).
+        self.size = 1  # Number of products in this subtree.
+        self.total = price  # Sum of the prices of the products in this subtree.
         self.left = None  # Pointer to the left child.
         self.right = None  # Pointer to the right child.
 
 
 class AVLTree:
     """
-    An AVL Tree implementation that maintains balance during insertions.
+    An AVL Tree implementation that maintains balance during insertions and deletions.
 
     The tree automatically rebalances itself to ensure efficient search, insert, 
     and delete operations (O(log N) complexity).
     """
 
-    def __init__(self):
+    def __init__(self, track_ids=False):
         """
         Initializes an empty AVL tree.
+
+        :param track_ids: If True, the tree keeps a handle from every product ID to the node
+                          holding it, so a product can be found or removed by ID alone
+                          (see node_for, price_of and remove).
         """
         self.root = None  # The root of the AVL tree.
+        self._handles = {} if track_ids else None  # Product ID -> node, when tracking IDs.
 
-    def insert(self, root, price, product):
+        # Cached leftmost and rightmost nodes, valid for the tree rooted at _bounds_root.
+        # insert() and delete() keep them current so the cheapest and most expensive
+        # products are available in O(1).
+        self._min_node = None
+        self._max_node = None
+        self._bounds_root = None
+
+    def insert(self, root, price, product, product_id=None):
         """
         Inserts a new product into the AVL tree, maintaining balance.
 
+        If a node with the same price already exists, the product is added to that node's
+        bucket (replacing a product with the same ID) and the tree shape does not change.
+        Otherwise the insertion point is found iteratively while recording the path from the
+        root. The path is then walked back up to update heights and rotate, stopping as soon
+        as a subtree's height is unchanged because nothing above it can be affected.
+
         :param root: The root of the current subtree.
         :param price: The price of the product (used as the key).
         :param product: The product to be inserted.
+        :param product_id: The product's ID (taken from product['id'] if None).
         :return: The new root of the subtree after insertion and balancing.
         """
+        bounds_valid = root is self._bounds_root
+        handles = self._handles
         if not root:
-            return AVLNode(price, product)  # Create a new node if the subtree is empty.
+            new_node = AVLNode(price, product, product_id)
+            if handles is not None:
+                handles[next(iter(new_node.products))] = new_node
+            if bounds_valid:
+                self._min_node = self._max_node = self._bounds_root = new_node
+            return new_node  # Create a new node if the subtree is empty.
+
+        # Walk down to the insertion point, remembering the path.
+        path = []
+        node = root
+        while node:
+            if price == node.price:
+                key = product_key(product, product_id)
+                if key not in node.products:
+                    path.append(node)
+                    self._adjust_counts(path, 1, price)
+                node.products[key] = product
+                if handles is not None:
+                    handles[key] = node
+                return root
+            path.append(node)
+            node = node.left if price < node.price else node.right
 
-        if price < root.price:
-            root.left = self.insert(root.left, price, product)  # Insert into the left subtree.
+        new_node = AVLNode(price, product, product_id)
+        if handles is not None:
+            handles[next(iter(new_node.products))] = new_node
+        self._adjust_counts(path, 1, price)
+        parent = path[-1]
+        if price < parent.price:
+            parent.left = new_node  # Insert into the left subtree.
         else:
-            root.right = self.insert(root.right, price, product)  # Insert into the right subtree.
+            parent.right = new_node  # Insert into the right subtree.
+
+        root = self._rebalance_path(root, path)
+        if bounds_valid:
+            if price < self._min_node.price:
+                self._min_node = new_node
+            if price > self._max_node.price:
+                self._max_node = new_node
+            self._bounds_root = root
+        return root
+
+    def delete(self, root, price, product_id=None):
+        """
+        Deletes a product with the given price from the AVL tree, maintaining balance.
+
+        The product is removed from its price bucket; the node itself is only removed once its
+        bucket is empty. The node is located iteratively while recording the path from the
+        root. A node with two children is replaced by its in-order successor node (the node
+        itself is moved rather than its data copied), then heights and balance are restored on
+        the way back up, stopping once a subtree's height is unchanged. Runs in O(log N).
+
+        :param root: The root of the current subtree.
+        :param price: The price of the product to delete.
+        :param product_id: The ID of the product to delete. If None, the product that was
+                           added first at this price is deleted.
+        :return: The new root of the subtree after deletion and balancing.
+        """
+        path = []
+        node = root
+        while node and node.price != price:
+            path.append(node)
+            node = node.left if price < node.price else node.right
+        if not node:
+            return root  # Price not found.
+
+        if product_id is None:
+            product_id = next(iter(node.products))
+        elif product_id not in node.products:
+            return root  # No such product at this price.
+        del node.products[product_id]
+        if self._handles is not None:
+            self._handles.pop(product_id, None)
+        self._adjust_counts(path, -1, -price)
+        if node.products:
+            # Other products still share this price.
+            self._adjust_counts([node], -1, -price)
+            return root
+
+        bounds_valid = root is self._bounds_root
+        parent = path[-1] if path else None
+
+        if node.left and node.right:
+            # Find the in-order successor, recording the path down to it.
+            node_index = len(path)
+            path.append(node)
+            successor = node.right
+            while successor.left:
+                path.append(successor)
+                successor = successor.left
+
+            # The nodes between the two lose the successor's products, and the successor
+            # takes over the counts of the deleted node's subtree.
+            moved = len(successor.products)
+            self._adjust_counts(path[node_index + 1:], -moved, -successor.price * moved)
+            successor.size = node.size - 1
+            successor.total = node.total - price
+
+            if path[-1] is node:
+                successor.left = node.left
+            else:
+                path[-1].left = successor.right
+                successor.left = node.left
+                successor.right = node.right
+            successor.height = node.height
+            path[node_index] = successor
+            replacement = successor
+        else:
+            replacement = node.left or node.right
+
+        if parent is None:
+            root = replacement
+        elif parent.left is node:
+            parent.left = replacement
+        else:
+            parent.right = replacement
+        node.left = node.right = None
+
+        root = self._rebalance_path(root, path)
+        if bounds_valid:
+            if node is self._min_node:
+                self._min_node = self._leftmost(root)
+            if node is self._max_node:
+                self._max_node = self._rightmost(root)
+            self._bounds_root = root
+        return root
+
+    @classmethod
+    def from_items(cls, items, presorted=False, track_ids=False):
+        """
+        Builds a perfectly balanced AVL tree from (price, product) pairs in O(N) after a
+        single sort, instead of N separate insertions with rotations.
+
+        :param items: An iterable of (price, product) pairs.
+        :param presorted: Set to True if the items are already sorted by price.
+        :param track_ids: Whether the new tree keeps ID handles (see __init__).
+        :return: A new AVLTree holding every product.
+        """
+        tree = cls(track_ids=track_ids)
+        tree.merge(items, presorted=presorted)
+        return tree
+
+    def merge(self, items, presorted=False):
+        """
+        Adds a batch of (price, product) pairs to this tree.
+
+        Small batches are inserted one by one. Larger batches are sorted once and merged with
+        the tree's existing nodes in order, and the tree is then rebuilt perfectly balanced
+        bottom-up. Existing node objects are reused, so the rebuild costs O(N + M) for a tree
+        of N prices and a batch of M products.
+
+        :param items: An iterable of (price, product) pairs.
+        :param presorted: Set to True if the items are already sorted by price.
+        """
+        items = items if presorted else sorted(items, key=itemgetter(0))
+        if not isinstance(items, (list, tuple)):
+            items = list(items)
+        height = self.root.height if self.root else 0
+        # Inserting costs O(M log N); a rebuild costs O(N + M). Measured, one insert costs about
+        # as much as rebuilding two nodes per level it descends, which picks the cheaper of the two.
+        if self.root and len(items) * height < 2 * (len(self) + len(items)):
+            for price, product in items:
+                self.root = self.insert(self.root, price, product)
+            return
+
+        existing = list(self._iter_nodes()) if self.root else []
+        handles = self._handles
+        merged = []
+        i = 0
+        node = None
+        for price, product in items:
+            if node is None or price != node.price:
+                # Move past the existing prices below this one, then reuse or create its node.
+                while i < len(existing) and existing[i].price < price:
+                    merged.append(existing[i])
+                    i += 1
+                if i < len(existing) and existing[i].price == price:
+                    node = existing[i]
+                    i += 1
+                else:
+                    key = product_key(product)
+                    node = AVLNode(price, product, key)
+                    merged.append(node)
+                    if handles is not None:
+                        handles[key] = node
+                    continue
+                merged.append(node)
+            key = product_key(product)
+            node.products[key] = product
+            if handles is not None:
+                handles[key] = node
+        merged.extend(existing[i:])
 
-        # Update height of the current node after insertion.
-        root.height = 1 + max(self._height(root.left), self._height(root.right))
+        self.root = self._build_balanced(merged)
+        self._min_node = merged[0] if merged else None
+        self._max_node = merged[-1] if merged else None
+        self._bounds_root = self.root
 
-        # Balance the tree and return the new root.
-        return self._balance(root)
+    def delete_many(self, items):
+        """
+        Deletes a batch of products, given as (price, product_id) pairs.
+
+        Small batches are deleted one by one. Larger batches are removed from their price
+        buckets in a single in-order pass, and the remaining nodes are rebuilt into a
+        perfectly balanced tree as in merge.
+
+        :param items: An iterable of (price, product_id) pairs. A product_id of None deletes
+                      the product that was added first at that price.
+        :return: The number of products that were deleted.
+        """
+        items = items if isinstance(items, (list, tuple)) else list(items)
+        if not self.root or not items:
+            return 0
+        before = len(self)
+        height = self.root.height
+        if len(items) * height < 1.6 ** height:
+            for price, product_id in items:
+                self.root = self.delete(self.root, price, product_id)
+            return before - len(self)
+
+        doomed = {}
+        for price, product_id in items:
+            doomed.setdefault(price, []).append(product_id)
+        remaining = []
+        for node in self._iter_nodes():
+            product_ids = doomed.get(node.price)
+            if product_ids:
+                for product_id in product_ids:
+                    if product_id is None and node.products:
+                        product_id = next(iter(node.products))
+                    if node.products.pop(product_id, None) is not None and self._handles is not None:
+                        self._handles.pop(product_id, None)
+            if node.products:
+                remaining.append(node)
+
+        self.root = self._build_balanced(remaining)
+        self._min_node = remaining[0] if remaining else None
+        self._max_node = remaining[-1] if remaining else None
+        self._bounds_root = self.root
+        return before - len(self)
+
+    def _build_balanced(self, nodes):
+        """
+        Links a list of nodes sorted by price into a perfectly balanced tree, setting the
+        children, heights and subtree counts of every node.
+
+        :param nodes: The nodes in ascending price order.
+        :return: The root of the new tree, or None if the list is empty.
+        """
+        def build(lo, hi):
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = nodes[mid]
+            left = node.left = build(lo, mid)
+            right = node.right = build(mid + 1, hi)
+            # Same as _update_node, inlined because this runs once per node of the tree.
+            count = len(node.products)
+            height, size, total = 0, count, node.price * count
+            if left:
+                height, size, total = left.height, size + left.size, total + left.total
+            if right:
+                height = max(height, right.height)
+                size += right.size
+                total += right.total
+            node.height = height + 1
+            node.size = size
+            node.total = total
+            return node
+
+        return build(0, len(nodes))
+
+    def _iter_nodes(self):
+        """
+        Yields every node in ascending price order using an iterative in-order traversal.
+        """
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node
+            node = node.right
+
+    def _rebalance_path(self, root, path):
+        """
+        Restores heights and balance along a root-to-node path after the subtree below its
+        last node changed. The subtree counts along the path must already be up to date;
+        rotations recompute the counts of the nodes they move.
+
+        :param root: The root of the tree.
+        :param path: The nodes from the root down to the changed position.
+        :return: The new root of the tree.
+        """
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            old_height = node.height
+            left_height = node.left.height if node.left else 0
+            right_height = node.right.height if node.right else 0
+            if abs(left_height - right_height) <= 1:
+                # Still balanced: only the height may need updating.
+                node.height = 1 + max(left_height, right_height)
+                if node.height == old_height:
+                    break
+                continue
+
+            subtree = self._balance(node)
+            if subtree is not node:
+                # A rotation replaced the subtree root; hook the new one into the parent.
+                if i == 0:
+                    root = subtree
+                elif path[i - 1].left is node:
+                    path[i - 1].left = subtree
+                else:
+                    path[i - 1].right = subtree
+            if subtree.height == old_height:
+                break
+        return root
+
+    def _update_counts(self, node):
+        """
+        Recomputes a node's subtree size and price total from its children and its bucket.
+        """
+        left = node.left
+        right = node.right
+        count = len(node.products)
+        node.size = count + (left.size if left else 0) + (right.size if right else 0)
+        node.total = node.price * count + (left.total if left else 0) + (right.total if right else 0)
+
+    def _adjust_counts(self, nodes, count, amount):
+        """
+        Adds to the subtree counts of the given nodes, typically the ancestors of a product
+        that was inserted or deleted.
+
+        :param nodes: The nodes to update.
+        :param count: The change in the number of products.
+        :param amount: The change in the sum of prices.
+        """
+        for node in nodes:
+            node.size += count
+            node.total += amount
+
+    def _update_node(self, node):
+        """
+        Recomputes a node's height and subtree counts from its children.
+        """
+        node.height = 1 + max(self._height(node.left), self._height(node.right))
+        self._update_counts(node)
+
+    def _leftmost(self, node):
+        """
+        Returns the node with the smallest price in a subtree, or None if it is empty.
+        """
+        while node and node.left:
+            node = node.left
+        return node
+
+    def _rightmost(self, node):
+        """
+        Returns the node with the largest price in a subtree, or None if it is empty.
+        """
+        while node and node.right:
+            node = node.right
+        return node
+
+    def _refresh_bounds(self):
+        """
+        Recomputes the cached cheapest and most expensive nodes if the tree was changed
+        without going through insert() or delete() on self.root.
+        """
+        if self._bounds_root is not self.root:
+            self._min_node = self._leftmost(self.root)
+            self._max_node = self._rightmost(self.root)
+            self._bounds_root = self.root
+
+    def _entry(self, price, product):
+        """
+        Builds the product summary returned by the query methods.
+
+        :param price: The price the product is stored under.
+        :param product: The product (a product dictionary, a Product record or just its name).
+        :return: A dictionary with the product's name and price, plus its ID when known.
+        """
+        if not isinstance(product, PRODUCT_TYPES):
+            return {'name': product, 'price': price}
+        entry = {'name': product['name'], 'price': price}
+        if product.get('id'):
+            entry['id'] = product['id']
+        return entry
 
     def _height(self, node):
         """
@@ -82,8 +514,8 @@ class AVLTree:
         if not node:
             return node
 
-        # Update height
-        node.height = 1 + max(self._height(node.left), self._height(node.right))
+        # Update height and subtree counts
+        self._update_node(node)
         
         # Get balance factor
         balance = self._get_balance(node)
@@ -114,8 +546,8 @@ class AVLTree:
         y.left = z
         z.right = T2
         
-        z.height = 1 + max(self._height(z.left), self._height(z.right))
-        y.height = 1 + max(self._height(y.left), self._height(y.right))
+        self._update_node(z)
+        self._update_node(y)
         
         return y
         
@@ -127,70 +559,284 @@ class AVLTree:
         y.right = z
         z.left = T3
         
-        z.height = 1 + max(self._height(z.left), self._height(z.right))
-        y.height = 1 + max(self._height(y.left), self._height(y.right))
+        self._update_node(z)
+        self._update_node(y)
         
         return y
 
     def is_balanced(self):
         """
         Checks if the entire tree is balanced according to AVL rules.
-        Returns (is_balanced, height)
+        Heights are recomputed with an iterative post-order traversal and compared with
+        the stored ones.
+        Returns True if the tree is balanced, False otherwise.
         """
-        def check_balance(node):
+        stack = [(self.root, False)]
+        heights = []  # Computed heights of finished subtrees, left before right.
+        while stack:
+            node, children_done = stack.pop()
             if not node:
-                return True, 0
-                
-            left_balanced, left_height = check_balance(node.left)
-            right_balanced, right_height = check_balance(node.right)
-            
-            # Check if both subtrees are balanced
-            if not left_balanced or not right_balanced:
-                return False, 0
-                
-            # Check balance factor
-            balance = self._get_balance(node)
-            is_balanced = abs(balance) <= 1
-            
+                heights.append(0)
+                continue
+            if not children_done:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+                continue
+
+            right_height = heights.pop()
+            left_height = heights.pop()
             height = 1 + max(left_height, right_height)
-            
-            return is_balanced, height
-            
-        balanced, _ = check_balance(self.root)
-        return balanced
+
+            # Check balance factor and the cached height
+            if abs(left_height - right_height) > 1 or node.height != height:
+                return False
+            heights.append(height)
+        return True
 
     def _get_balance(self, node):
         if not node:
             return 0
         return self._height(node.left) - self._height(node.right)
 
-    def find_products_in_range(self, min_price, max_price):
+    def iter_range(self, min_price, max_price, descending=False, limit=None, offset=0):
         """
-        Find all products within a given price range using in-order traversal.
-        Returns a list of products with their names and prices.
+        Lazily yields the products priced between min_price and max_price (inclusive).
+
+        The subtree sizes are used to jump straight to the first product of the requested
+        page, and the walk then continues with an explicit stack. Nothing is produced before
+        it is asked for, so stopping early or asking for one page with limit/offset costs
+        O(log N + page).
+
+        :param min_price: The lowest price to include.
+        :param max_price: The highest price to include.
+        :param descending: If True, the most expensive products come first.
+        :param limit: The maximum number of products to yield (None for no limit).
+        :param offset: The number of matching products to skip first.
         """
-        result = []
-        
-        def inorder(node):
-            if not node:
+        if limit is not None and limit <= 0:
+            return
+        if descending:
+            start = len(self) - self._prefix(max_price, inclusive=True)[0] + offset
+        else:
+            start = self._prefix(min_price)[0] + offset
+        stack, skip = self._seek(start, descending)
+
+        remaining = limit
+        node = None
+        while True:
+            # Descend to the next price in order (nothing to do right after seeking).
+            while node:
+                stack.append(node)
+                node = node.right if descending else node.left
+            if not stack:
                 return
-                
-            # If current node's price is greater than min_price,
-            # then products in left subtree may be in range
-            if node.price > min_price:
-                inorder(node.left)
-                
-            # Check if current node is within range
-            if min_price <= node.price <= max_price:
-                result.append({
-                    'name': node.product,
-                    'price': node.price
-                })
-                
-            # If current node's price is less than max_price,
-            # then products in right subtree may be in range
-            if node.price < max_price:
-                inorder(node.right)
-                
-        inorder(self.root)
-        return result
+
+            node = stack.pop()
+            past_end = node.price < min_price if descending else node.price > max_price
+            if past_end:
+                return
+
+            products = reversed(node.products.values()) if descending else node.products.values()
+            if skip:
+                products = islice(products, skip, None)
+                skip = 0
+            for product in products:
+                yield self._entry(node.price, product)
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+            node = node.left if descending else node.right
+
+    def _seek(self, index, descending=False):
+        """
+        Positions an in-order traversal at the product with the given index.
+
+        :param index: The 0-based position, counted from the cheapest product (or from the
+                      most expensive one when descending).
+        :param descending: Whether the traversal runs from the most expensive product.
+        :return: A (stack, skip) pair. Popping the stack yields the node holding the product,
+                 followed by the later nodes in order; skip is the product's position within
+                 that node's bucket. The stack is empty if the index is past the end.
+        """
+        stack = []
+        node = self.root
+        while node:
+            near = node.right if descending else node.left
+            near_size = near.size if near else 0
+            if index < near_size:
+                stack.append(node)
+                node = near
+            elif index < near_size + len(node.products):
+                stack.append(node)
+                return stack, index - near_size
+            else:
+                index -= near_size + len(node.products)
+                node = node.left if descending else node.right
+        return [], 0
+
+    def _prefix(self, price, inclusive=False):
+        """
+        Counts the products cheaper than a price, and sums their prices, in O(log N).
+
+        :param price: The price to compare against.
+        :param inclusive: If True, products priced exactly at price are included too.
+        :return: A (count, total) pair.
+        """
+        count = 0
+        total = 0
+        node = self.root
+        while node:
+            if price < node.price or (price == node.price and not inclusive):
+                node = node.left
+            else:
+                if node.left:
+                    count += node.left.size
+                    total += node.left.total
+                count += len(node.products)
+                total += node.price * len(node.products)
+                node = node.right
+        return count, total
+
+    def __len__(self):
+        """
+        Returns the number of products in the tree in O(1).
+        """
+        return self.root.size if self.root else 0
+
+    def rank(self, price):
+        """
+        Returns the number of products strictly cheaper than the given price in O(log N).
+        """
+        return self._prefix(price)[0]
+
+    def count_in_range(self, min_price, max_price):
+        """
+        Returns the number of products priced between min_price and max_price (inclusive)
+        in O(log N), without visiting the matching products.
+        """
+        if max_price < min_price:
+            return 0
+        return self._prefix(max_price, inclusive=True)[0] - self._prefix(min_price)[0]
+
+    def sum_in_range(self, min_price, max_price):
+        """
+        Returns the sum of the prices of the products priced between min_price and max_price
+        (inclusive) in O(log N).
+        """
+        if max_price < min_price:
+            return 0
+        return self._prefix(max_price, inclusive=True)[1] - self._prefix(min_price)[1]
+
+    def select(self, k):
+        """
+        Returns the k-th cheapest product (0-based) in O(log N).
+
+        :param k: The position of the product in ascending price order.
+        :return: The product summary.
+        :raises IndexError: If k is out of range.
+        """
+        if not 0 <= k < len(self):
+            raise IndexError("Product index out of range")
+        stack, skip = self._seek(k)
+        node = stack[-1]
+        return self._entry(node.price, next(islice(node.products.values(), skip, None)))
+
+    def median(self):
+        """
+        Returns the median price in O(log N), or None if the tree is empty.
+        For an even number of products the two middle prices are averaged.
+        """
+        count = len(self)
+        if not count:
+            return None
+        upper = self.select(count // 2)['price']
+        if count % 2:
+            return upper
+        return (self.select(count // 2 - 1)['price'] + upper) / 2
+
+    def node_for(self, product_id):
+        """
+        Returns the node holding a product in O(1), or None if the product is not in the
+        tree. Requires the tree to track IDs.
+
+        :param product_id: The product's ID.
+        """
+        if self._handles is None:
+            raise ValueError("The tree does not track product IDs")
+        return self._handles.get(product_id)
+
+    def price_of(self, product_id):
+        """
+        Returns the price a product is stored under, or None if it is not in the tree (or
+        the tree does not track IDs). Unlike the product's own 'price' field, this cannot
+        drift if the product is modified in place.
+
+        :param product_id: The product's ID.
+        """
+        if self._handles is None:
+            return None
+        node = self._handles.get(product_id)
+        return node.price if node else None
+
+    def summary_of(self, product_id):
+        """
+        Returns a product's summary, as the query methods return it, or None if the product
+        is not in the tree. Requires the tree to track IDs.
+        """
+        node = self.node_for(product_id)
+        if node is None:
+            return None
+        return self._entry(node.price, node.products[product_id])
+
+    def remove(self, product_id):
+        """
+        Removes a product by ID alone, using the ID handle to find its price in O(1).
+        Requires the tree to track IDs.
+
+        :param product_id: The product's ID.
+        :return: True if the product was removed, False if it was not in the tree.
+        """
+        node = self.node_for(product_id)
+        if node is None:
+            return False
+        self.root = self.delete(self.root, node.price, product_id)
+        return True
+
+    def find_products_in_range(self, min_price, max_price):
+        """
+        Find all products within a given price range.
+        Returns a list of products with their names and prices; use iter_range to
+        consume a large range lazily instead.
+        """
+        return list(self.iter_range(min_price, max_price))
+
+    def find_cheapest(self):
+        """
+        Returns the cheapest product in O(1) using the cached leftmost node.
+        Returns None if the tree is empty.
+        """
+        self._refresh_bounds()
+        if not self._min_node:
+            return None
+        return self._entry(self._min_node.price, next(iter(self._min_node.products.values())))
+
+    def find_most_expensive(self):
+        """
+        Returns the most expensive product in O(1) using the cached rightmost node.
+        Returns None if the tree is empty.
+        """
+        self._refresh_bounds()
+        if not self._max_node:
+            return None
+        return self._entry(self._max_node.price, next(reversed(self._max_node.products.values())))
+
+    def get_sorted_products(self, descending=False):
+        """
+        Yields every product ordered by price without building an intermediate list.
+        Products sharing a price are yielded in insertion order (reversed when descending).
+
+        :param descending: If True, the most expensive products come first.
+        """
+        return self.iter_range(float('-inf'), float('inf'), descending=descending)
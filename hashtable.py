@@ -5,7 +5,229 @@
 # This portion is implemented as part of Phase 1 @Unique Karanjit
 # ----------------------------------------------------------------------------------------------------------------------
 
+import math
 import uuid  # Add this at the top of the file
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+from product import PRODUCT_TYPES, is_valid_price
+
+
+class PrefixIndex:
+    """
+    A sorted index of keys used to answer prefix (partial ID) lookups.
+
+    Keys are ordered by their lowercase string form and stored in a list of sorted chunks,
+    so a prefix search is a binary search followed by a scan over the matching keys only.
+    Inserting or removing a key only shifts the entries of one chunk instead of the whole index.
+    """
+
+    _CHUNK_SIZE = 512  # Chunks are split once they grow past twice this size.
+
+    def __init__(self):
+        """
+        Initializes an empty prefix index.
+        """
+        self._folds = []  # Sorted chunks of lowercase keys.
+        self._keys = []  # Original keys, parallel to self._folds.
+        self._maxes = []  # Largest lowercase key of each chunk.
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @staticmethod
+    def _fold(key):
+        """
+        Returns the lowercase string form of a key, reusing the key itself when it is
+        already a lowercase string (the common case for UUIDs).
+        """
+        text = key if isinstance(key, str) else str(key)
+        folded = text.lower()
+        return text if folded == text else folded
+
+    def add(self, key):
+        """
+        Adds a key to the index. The caller is responsible for not adding a key twice.
+
+        :param key: The key to add.
+        """
+        fold = self._fold(key)
+        self._len += 1
+        if not self._maxes:
+            self._folds.append([fold])
+            self._keys.append([key])
+            self._maxes.append(fold)
+            return
+
+        pos = bisect_left(self._maxes, fold)
+        if pos == len(self._maxes):
+            pos -= 1  # Larger than every key: append to the last chunk.
+        folds = self._folds[pos]
+        keys = self._keys[pos]
+        i = bisect_right(folds, fold)
+        folds.insert(i, fold)
+        keys.insert(i, key)
+        self._maxes[pos] = folds[-1]
+
+        if len(folds) > 2 * self._CHUNK_SIZE:
+            half = len(folds) // 2
+            self._folds.insert(pos + 1, folds[half:])
+            self._keys.insert(pos + 1, keys[half:])
+            del folds[half:]
+            del keys[half:]
+            self._maxes[pos] = folds[-1]
+            self._maxes.insert(pos + 1, self._folds[pos + 1][-1])
+
+    def remove(self, key):
+        """
+        Removes a key from the index.
+
+        :param key: The key to remove.
+        :return: True if the key was found and removed, False otherwise.
+        """
+        fold = self._fold(key)
+        pos = bisect_left(self._maxes, fold)
+        # Keys that fold to the same string may span several chunks.
+        while pos < len(self._maxes):
+            folds = self._folds[pos]
+            keys = self._keys[pos]
+            i = bisect_left(folds, fold)
+            while i < len(folds) and folds[i] == fold:
+                if keys[i] == key:
+                    del folds[i]
+                    del keys[i]
+                    self._len -= 1
+                    if folds:
+                        self._maxes[pos] = folds[-1]
+                    else:
+                        del self._folds[pos]
+                        del self._keys[pos]
+                        del self._maxes[pos]
+                    return True
+                i += 1
+            if i < len(folds):
+                return False
+            pos += 1
+        return False
+
+    def update(self, keys):
+        """
+        Adds several keys to the index. The caller is responsible for not adding a key twice.
+
+        A batch that is large compared to the index is merged with a single sort and the
+        chunks are rebuilt, instead of inserting the keys one at a time.
+
+        :param keys: The keys to add.
+        """
+        keys = keys if isinstance(keys, list) else list(keys)
+        if len(keys) * 8 < self._len:
+            for key in keys:
+                self.add(key)
+            return
+        pairs = self._pairs()
+        fold = self._fold
+        pairs.extend([(fold(key), key) for key in keys])
+        pairs.sort(key=itemgetter(0))  # Stable, so equal folds keep their insertion order.
+        self._rebuild(pairs)
+
+    def remove_many(self, keys):
+        """
+        Removes several keys from the index, rebuilding it in one pass for large batches.
+
+        :param keys: The keys to remove.
+        :return: The number of keys that were found and removed.
+        """
+        keys = keys if isinstance(keys, list) else list(keys)
+        if len(keys) * 8 < self._len:
+            return sum(1 for key in keys if self.remove(key))
+        doomed = set(keys)
+        before = self._len
+        self._rebuild([pair for pair in self._pairs() if pair[1] not in doomed])
+        return before - self._len
+
+    def _pairs(self):
+        """
+        Returns every (folded key, key) pair in sorted order.
+        """
+        pairs = []
+        for folds, keys in zip(self._folds, self._keys):
+            pairs.extend(zip(folds, keys))
+        return pairs
+
+    def _rebuild(self, pairs):
+        """
+        Replaces the chunks with the given (folded key, key) pairs, which must be sorted.
+        """
+        size = self._CHUNK_SIZE
+        folds = [fold for fold, _ in pairs]
+        keys = [key for _, key in pairs]
+        self._folds = [folds[i:i + size] for i in range(0, len(folds), size)]
+        self._keys = [keys[i:i + size] for i in range(0, len(keys), size)]
+        self._maxes = [chunk[-1] for chunk in self._folds]
+        self._len = len(pairs)
+
+    def iter_prefix(self, prefix):
+        """
+        Yields the keys whose lowercase form starts with the given prefix, in sorted order.
+
+        :param prefix: The prefix to search for (matched case-insensitively).
+        """
+        prefix = prefix.lower()
+        pos = bisect_left(self._maxes, prefix)
+        if pos == len(self._maxes):
+            return
+        i = bisect_left(self._folds[pos], prefix)
+        while pos < len(self._maxes):
+            folds = self._folds[pos]
+            keys = self._keys[pos]
+            for j in range(i, len(folds)):
+                if not folds[j].startswith(prefix):
+                    return
+                yield keys[j]
+            pos += 1
+            i = 0
+
+
+def _bucket_find(bucket, key_hash, key):
+    """
+    Returns the position of a key within a chaining bucket, or -1 if it is not there.
+
+    A bucket is a single list laid out as [hash_0 .. hash_n-1, key_0 .. key_n-1, value_0 .. value_n-1].
+    The cached hashes are searched with list.index, which runs in C and only compares integers,
+    and a key is compared only once its hash matches.
+    """
+    n = len(bucket) // 3
+    start = 0
+    while start < n:
+        try:
+            i = bucket.index(key_hash, start, n)
+        except ValueError:
+            return -1
+        if bucket[n + i] == key:
+            return i
+        start = i + 1
+    return -1
+
+
+def _bucket_append(bucket, key_hash, key, value):
+    """
+    Adds an entry to the end of a chaining bucket (see _bucket_find for the layout).
+    """
+    n = len(bucket) // 3
+    bucket.insert(n, key_hash)
+    bucket.insert(2 * n + 1, key)
+    bucket.append(value)
+
+
+def _bucket_entries(bucket):
+    """
+    Returns an iterator over the (key, value) pairs of a chaining bucket.
+    """
+    n = len(bucket) // 3
+    return zip(bucket[n:2 * n], bucket[2 * n:])
+
 
 class HashTable:
     """
@@ -13,38 +235,308 @@ class HashTable:
     
     This hash table stores key-value pairs, where the keys are hashed to determine their 
     placement in the table. If collisions occur (multiple keys hashing to the same index), 
-    the values are stored in a list at that index.
+    the values are stored in a list at that index. The number of buckets grows (and optionally
+    shrinks) with the number of stored items so that chains stay short.
+
+    Passing ``backend="open_addressing"`` returns an OpenAddressingHashTable instead, which
+    keeps the same API but stores entries in flat arrays.
     """
 
-    def __init__(self, size=100):
+    def __new__(cls, *args, backend="chaining", **kwargs):
+        """
+        Selects the storage backend requested at construction.
+
+        :param backend: Either "chaining" (default) or "open_addressing".
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown hash table backend '{backend}'")
+        if cls is HashTable:
+            cls = BACKENDS[backend]
+        return super().__new__(cls)
+
+    def __init__(self, size=100, max_load_factor=0.75, min_load_factor=None, rehash_step=4, backend="chaining"):
         """
         Initializes the hash table with a given size.
 
+        The table grows automatically once the number of stored items divided by the number
+        of buckets (the load factor) exceeds ``max_load_factor``. If ``min_load_factor`` is
+        given, the table also shrinks (never below the initial size) when the load factor
+        drops under it. Resizing is incremental: the old buckets are migrated a few at a time
+        by later inserts and deletes, so no single operation pays for a full rehash.
+
         :param size: The number of buckets in the hash table (default is 100).
+        :param max_load_factor: Load factor above which the table doubles in size.
+        :param min_load_factor: Load factor below which the table halves in size (None disables shrinking).
+        :param rehash_step: Number of old buckets migrated per insert/delete while a resize is in progress.
+        :param backend: The storage backend, see ``__new__``.
         """
         if size <= 0:
             raise ValueError("Hash table size must be positive")
+        if max_load_factor <= 0:
+            raise ValueError("Maximum load factor must be positive")
+        if min_load_factor is not None and not 0 < min_load_factor * 2 < max_load_factor:
+            raise ValueError("Minimum load factor must be positive and less than half the maximum load factor")
+        if rehash_step < 1:
+            raise ValueError("Rehash step must be at least 1")
+        self.max_load_factor = max_load_factor
+        self.min_load_factor = min_load_factor
+        self.rehash_step = rehash_step
+        self.backend = backend
+        self._count = 0  # Number of key-value pairs currently stored.
+        self._prefix_index = PrefixIndex()  # Sorted keys backing find_by_partial_id.
+        self._init_storage(size)
+        self._initial_size = self.size
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Storage primitives. Subclasses providing another backend override these.
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _init_storage(self, size):
+        """
+        Allocates the bucket array.
+
+        :param size: The number of buckets.
+        """
         self.size = size
-        self.table = [[] for _ in range(size)]  # Create a list of empty lists for separate chaining.
+        self.table = [None] * size  # Buckets for separate chaining, created on first use.
+
+        # State of an in-progress incremental resize. While _old_table is not None, buckets
+        # below _rehash_index have already been moved into self.table.
+        self._old_table = None
+        self._old_size = 0
+        self._rehash_index = 0
 
-    def _hash(self, key):
+    def _key_hash(self, key):
         """
-        Computes the hash index for a given key.
+        Computes the full hash of a key.
+
+        String keys (such as UUIDs) are hashed directly; other keys are hashed through their
+        string form so that, for example, 5 and "5" land in the same bucket.
 
         :param key: The key to be hashed.
-        :return: The index in the table where the key-value pair should be stored.
+        :return: The hash value of the key.
+        """
+        if type(key) is str:
+            if key:
+                return hash(key)
+        elif key is not None:
+            return hash(str(key))
+        raise ValueError("Key cannot be None or empty")
+
+    def _buckets_for(self, key_hash, create=False):
+        """
+        Returns the buckets that may hold a key with the given hash.
+
+        While a resize is in progress the key can still live in the old table if its bucket
+        has not been migrated yet, so that bucket is checked before the one in the new table.
+
+        :param key_hash: The full hash of the key, as returned by _key_hash.
+        :param create: If True, the key's bucket in the current table is created if missing
+                       and is always the last bucket returned.
+        :return: A list of zero, one or two buckets.
+        """
+        buckets = []
+        if self._old_table is not None:
+            old_index = key_hash % self._old_size
+            if old_index >= self._rehash_index and self._old_table[old_index]:
+                buckets.append(self._old_table[old_index])
+        index = key_hash % self.size
+        bucket = self.table[index]
+        if bucket is None and create:
+            bucket = self.table[index] = []
+        if bucket is not None:
+            buckets.append(bucket)
+        return buckets
+
+    def _lookup(self, key):
+        """
+        Returns the value stored for a key, or None if it is missing.
+        """
+        key_hash = self._key_hash(key)
+        for bucket in self._buckets_for(key_hash):
+            i = _bucket_find(bucket, key_hash, key)
+            if i >= 0:
+                return bucket[2 * (len(bucket) // 3) + i]
+        return None
+
+    def _store(self, key, value):
+        """
+        Stores a key-value pair, replacing the value of an existing key.
+
+        :return: True if the key was not present before, False if it was updated.
+        """
+        key_hash = self._key_hash(key)
+        buckets = self._buckets_for(key_hash, create=True)
+        
+        # Update if key exists
+        for bucket in buckets:
+            i = _bucket_find(bucket, key_hash, key)
+            if i >= 0:
+                bucket[2 * (len(bucket) // 3) + i] = value
+                return False
+                
+        # Insert new key-value pair
+        _bucket_append(buckets[-1], key_hash, key, value)
+        return True
+
+    def _store_many(self, items, new_keys):
+        """
+        Stores several key-value pairs, appending the keys that were not present before to
+        new_keys. Must only be called with no resize in progress and enough room reserved,
+        so the buckets can be addressed directly.
+        """
+        table = self.table
+        size = self.size
+        key_hash_of = self._key_hash
+        for key, value in items:
+            key_hash = key_hash_of(key)
+            index = key_hash % size
+            bucket = table[index]
+            if bucket is None:
+                table[index] = [key_hash, key, value]
+                new_keys.append(key)
+                continue
+            i = _bucket_find(bucket, key_hash, key)
+            if i >= 0:
+                bucket[2 * (len(bucket) // 3) + i] = value
+            else:
+                _bucket_append(bucket, key_hash, key, value)
+                new_keys.append(key)
+
+    def _remove(self, key):
+        """
+        Removes a key from storage.
+
+        :return: True if the key was found and removed, False otherwise.
+        """
+        key_hash = self._key_hash(key)
+        for bucket in self._buckets_for(key_hash):
+            i = _bucket_find(bucket, key_hash, key)
+            if i >= 0:
+                n = len(bucket) // 3
+                # Delete from the back so the earlier positions do not shift.
+                del bucket[2 * n + i]
+                del bucket[n + i]
+                del bucket[i]
+                return True
+        return False
+
+    def _iter_entries(self):
+        """
+        Yields every stored (key, value) pair.
+        """
+        if self._old_table is not None:
+            # Buckets not yet migrated by an in-progress resize still hold entries.
+            for bucket in self._old_table[self._rehash_index:]:
+                if bucket:
+                    yield from _bucket_entries(bucket)
+        for bucket in self.table:  # Iterate through each bucket in the table.
+            if bucket:
+                yield from _bucket_entries(bucket)
+
+    def _resizing(self):
+        """
+        Returns True while an incremental resize is migrating entries.
+        """
+        return self._old_table is not None
+
+    def _start_resize(self, new_size):
+        """
+        Allocates a new bucket array and starts migrating entries into it.
+
+        :param new_size: The number of buckets in the new table.
+        """
+        self._old_table = self.table
+        self._old_size = self.size
+        self._rehash_index = 0
+        self.size = new_size
+        self.table = [None] * new_size
+
+    def _rehash_step(self):
+        """
+        Moves up to ``rehash_step`` buckets from the old table into the new one.
         """
-        if not key:
-            raise ValueError("Key cannot be None or empty")
-        return hash(str(key)) % self.size
+        if self._old_table is None:
+            return
+        stop = min(self._rehash_index + self.rehash_step, self._old_size)
+        for index in range(self._rehash_index, stop):
+            bucket = self._old_table[index]
+            if bucket:
+                n = len(bucket) // 3
+                for i in range(n):
+                    # The cached hash means migrating an entry never rehashes its key.
+                    key_hash = bucket[i]
+                    new_index = key_hash % self.size
+                    if self.table[new_index] is None:
+                        self.table[new_index] = []
+                    _bucket_append(self.table[new_index], key_hash, bucket[n + i], bucket[2 * n + i])
+            self._old_table[index] = None  # Release the migrated bucket.
+        self._rehash_index = stop
+        if self._rehash_index >= self._old_size:
+            self._old_table = None
+            self._old_size = 0
+            self._rehash_index = 0
+
+    def _maybe_resize(self):
+        """
+        Starts a grow or shrink if the load factor has crossed its threshold.
+        A new resize is never started while another one is still migrating.
+        """
+        if self._resizing():
+            return
+        if self._count > self.max_load_factor * self.size:
+            self._start_resize(self.size * 2)
+        elif (self.min_load_factor is not None and self.size > self._initial_size
+                and self._count < self.min_load_factor * self.size):
+            self._start_resize(max(self._initial_size, self.size // 2))
+
+    def _capacity_for(self, count):
+        """
+        Returns the table size needed to hold count items without resizing, or None if the
+        current size is already enough. The table at least doubles, like an automatic grow, so
+        reserving room batch after batch costs amortized O(1) per item instead of a full rehash
+        per batch.
+        """
+        if count <= self.max_load_factor * self.size:
+            return None
+        return max(math.ceil(count / self.max_load_factor), 2 * self.size)
+
+    def _finish_resize(self):
+        """
+        Completes an in-progress incremental resize immediately.
+        """
+        while self._resizing():
+            self._rehash_step()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def __len__(self):
+        """
+        Returns the number of key-value pairs stored in the hash table in O(1).
+        """
+        return self._count
+
+    def __bool__(self):
+        """
+        Returns True if the hash table holds at least one key-value pair.
+        """
+        return self._count > 0
+
+    def load_factor(self):
+        """
+        Returns the current ratio of stored items to buckets.
+        """
+        return self._count / self.size
 
     def insert(self, key, value):
         """
         Insert a key-value pair into the hash table.
         If key is None, generates a new UUID.
         """
-        if not isinstance(value, dict):
-            raise ValueError("Value must be a dictionary")
+        if not isinstance(value, PRODUCT_TYPES):
+            raise ValueError("Value must be a dictionary or a Product")
             
         # Generate new UUID if key is None
         if key is None:
@@ -56,33 +548,71 @@ class HashTable:
             raise ValueError("Product must have a name")
         if 'price' not in value:
             raise ValueError("Product must have a price")
-        if not isinstance(value['price'], (int, float)) or value['price'] <= 0:
+        if not is_valid_price(value['price']):
             raise ValueError("Invalid price value")
             
-        index = self._hash(key)
-        
-        # Update if key exists
-        for i, (k, v) in enumerate(self.table[index]):
-            if k == key:
-                self.table[index][i] = (key, value)
-                return value
-                
-        # Insert new key-value pair
-        self.table[index].append((key, value))
+        if self._store(key, value):
+            self._count += 1
+            self._prefix_index.add(key)
+            self._rehash_step()
+            self._maybe_resize()
         return value
 
+    def reserve(self, count):
+        """
+        Grows the table once so that it can hold count items without further resizing.
+        Any resize in progress is completed first.
+
+        :param count: The total number of items the table should have room for.
+        """
+        self._finish_resize()
+        capacity = self._capacity_for(count)
+        if capacity is not None:
+            self._start_resize(capacity)
+            self._finish_resize()
+
+    def insert_many(self, items):
+        """
+        Inserts or updates several key-value pairs after reserving room for all of them.
+
+        Unlike insert, the values are not validated and the keys must not be None; this is
+        the fast path for callers that have already validated the whole batch.
+
+        :param items: An iterable of (key, value) pairs.
+        :return: The number of keys that were not present before.
+        """
+        items = items if isinstance(items, (list, tuple)) else list(items)
+        self.reserve(self._count + len(items))
+        new_keys = []
+        try:
+            self._store_many(items, new_keys)
+        finally:
+            self._count += len(new_keys)
+            self._prefix_index.update(new_keys)
+        return len(new_keys)
+
+    def delete_many(self, keys):
+        """
+        Deletes several keys, updating the prefix index in one pass.
+
+        :param keys: An iterable of keys; missing keys are ignored.
+        :return: The number of keys that were deleted.
+        """
+        self._finish_resize()
+        removed = [key for key in keys if key is not None and key != "" and self._remove(key)]
+        self._count -= len(removed)
+        self._prefix_index.remove_many(removed)
+        self._maybe_resize()
+        return len(removed)
+
     def get(self, key):
         """
         Retrieves a value by key.
         """
-        if not key:
+        if key is None or key == "":
             return None
             
-        index = self._hash(key)
-        for k, v in self.table[index]:
-            if k == key:
-                return v
-        return None
+        return self._lookup(key)
 
     def delete(self, key):
         """
@@ -91,15 +621,16 @@ class HashTable:
         :param key: The key to delete
         :return: True if deleted, False if not found
         """
-        if not key:
+        if key is None or key == "":
             return False
             
-        index = self._hash(key)
-        for i, (k, _) in enumerate(self.table[index]):
-            if k == key:
-                self.table[index].pop(i)
-                return True
-        return False
+        if not self._remove(key):
+            return False
+        self._count -= 1
+        self._prefix_index.remove(key)
+        self._rehash_step()
+        self._maybe_resize()
+        return True
 
     def items(self):
         """
@@ -107,10 +638,27 @@ class HashTable:
 
         :return: A list of tuples containing all the key-value pairs.
         """
-        all_items = []
-        for bucket in self.table:  # Iterate through each bucket in the table.
-            all_items.extend(bucket)  # Add all key-value pairs from the current bucket to the list.
-        return all_items
+        return list(self._iter_entries())
+
+    def find_by_prefix(self, prefix, limit=None):
+        """
+        Returns the values whose keys start with the given prefix (case-insensitive).
+
+        The lookup uses the prefix index, so it costs O(log N + matches) rather than a scan
+        of the whole table.
+
+        :param prefix: The key prefix to search for.
+        :param limit: Stop after this many matches (None returns all of them).
+        :return: A list of matching values in key order.
+        """
+        matches = []
+        if limit is not None and limit <= 0:
+            return matches
+        for key in self._prefix_index.iter_prefix(prefix):
+            matches.append(self.get(key))
+            if limit is not None and len(matches) >= limit:
+                break
+        return matches
 
     def find_by_partial_id(self, partial_id):
         """
@@ -133,11 +681,7 @@ class HashTable:
             print("ID should only contain letters and numbers")
             return None
         
-        matches = []
-        for bucket in self.table:
-            for key, product in bucket:
-                if str(key).lower().startswith(partial_id):
-                    matches.append(product)
+        matches = self.find_by_prefix(partial_id)
         
         if not matches:
             print(f"No products found with ID starting with '{partial_id}'")
@@ -151,3 +695,215 @@ class HashTable:
             return None
         
         return matches[0]
+
+
+_TOMBSTONE = object()  # Marks a deleted slot so that probe sequences continue past it.
+
+
+class OpenAddressingHashTable(HashTable):
+    """
+    A hash table that stores its entries with open addressing (linear probing).
+
+    Instead of a list of buckets holding (key, value) tuples, the entries live in three flat
+    parallel arrays of hashes, keys and values. A deleted entry leaves a tombstone behind so
+    that lookups keep probing past it; tombstones are dropped the next time the table is
+    rehashed. Resizing is incremental, as in the chaining backend.
+    """
+
+    def __init__(self, size=64, max_load_factor=0.6, min_load_factor=None, rehash_step=8,
+                 backend="open_addressing"):
+        """
+        Initializes the hash table.
+
+        :param size: The minimum number of slots (rounded up to a power of two).
+        :param max_load_factor: Fraction of slots, including tombstones, that may be in use before rehashing.
+        :param min_load_factor: Load factor below which the table halves in size (None disables shrinking).
+        :param rehash_step: Number of old slots migrated per insert/delete while a resize is in progress.
+        :param backend: Always "open_addressing"; accepted for symmetry with HashTable.
+        """
+        if max_load_factor >= 1:
+            raise ValueError("Maximum load factor must be less than 1 for open addressing")
+        super().__init__(size, max_load_factor, min_load_factor, rehash_step, backend="open_addressing")
+
+    def _init_storage(self, size):
+        capacity = 8
+        while capacity < size:
+            capacity *= 2
+        self._allocate(capacity)
+        self._old_keys = None
+
+    def _allocate(self, capacity):
+        """
+        Replaces the current slot arrays with empty ones of the given capacity.
+        """
+        self.size = capacity
+        self._mask = capacity - 1
+        self._hashes = array('q', bytes(8 * capacity))
+        self._keys = [None] * capacity  # None marks a never-used slot.
+        self._values = [None] * capacity
+        self._fill = 0  # Live entries plus tombstones in the current arrays.
+
+    @staticmethod
+    def _probe(hashes, keys, mask, key, key_hash):
+        """
+        Finds the slot holding a key in the given arrays.
+
+        :return: A (slot, free_slot) pair. ``slot`` is the index of the key or -1 if absent;
+                 ``free_slot`` is where the key should be inserted if it is absent.
+        """
+        i = key_hash & mask
+        free_slot = -1
+        while True:
+            k = keys[i]
+            if k is None:
+                return -1, (i if free_slot < 0 else free_slot)
+            if k is _TOMBSTONE:
+                if free_slot < 0:
+                    free_slot = i
+            elif hashes[i] == key_hash and k == key:
+                return i, free_slot
+            i = (i + 1) & mask
+
+    def _lookup(self, key):
+        key_hash = self._key_hash(key)
+        slot, _ = self._probe(self._hashes, self._keys, self._mask, key, key_hash)
+        if slot >= 0:
+            return self._values[slot]
+        if self._old_keys is not None:
+            slot, _ = self._probe(self._old_hashes, self._old_keys, self._old_mask, key, key_hash)
+            if slot >= 0:
+                return self._old_values[slot]
+        return None
+
+    def _store(self, key, value):
+        key_hash = self._key_hash(key)
+        if self._old_keys is not None:
+            # A key that has not been migrated yet is updated where it is.
+            slot, _ = self._probe(self._old_hashes, self._old_keys, self._old_mask, key, key_hash)
+            if slot >= 0:
+                self._old_values[slot] = value
+                return False
+        slot, free_slot = self._probe(self._hashes, self._keys, self._mask, key, key_hash)
+        if slot >= 0:
+            self._values[slot] = value
+            return False
+        if self._keys[free_slot] is None:
+            self._fill += 1  # Reusing a tombstone does not change the fill.
+        self._hashes[free_slot] = key_hash
+        self._keys[free_slot] = key
+        self._values[free_slot] = value
+        return True
+
+    def _store_many(self, items, new_keys):
+        hashes, keys, values, mask = self._hashes, self._keys, self._values, self._mask
+        probe = self._probe
+        key_hash_of = self._key_hash
+        for key, value in items:
+            key_hash = key_hash_of(key)
+            slot, free_slot = probe(hashes, keys, mask, key, key_hash)
+            if slot >= 0:
+                values[slot] = value
+                continue
+            if keys[free_slot] is None:
+                self._fill += 1
+            hashes[free_slot] = key_hash
+            keys[free_slot] = key
+            values[free_slot] = value
+            new_keys.append(key)
+
+    def _remove(self, key):
+        key_hash = self._key_hash(key)
+        slot, _ = self._probe(self._hashes, self._keys, self._mask, key, key_hash)
+        if slot >= 0:
+            self._keys[slot] = _TOMBSTONE
+            self._values[slot] = None
+            return True
+        if self._old_keys is not None:
+            slot, _ = self._probe(self._old_hashes, self._old_keys, self._old_mask, key, key_hash)
+            if slot >= 0:
+                self._old_keys[slot] = _TOMBSTONE
+                self._old_values[slot] = None
+                return True
+        return False
+
+    def _capacity_for(self, count):
+        # Tombstones occupy slots until the next rehash, which drops them.
+        tombstones = self._fill - self._count
+        if count + tombstones <= min(self.max_load_factor * self.size, self.size - 2):
+            return None
+        capacity = self.size
+        while count > min(self.max_load_factor * capacity, capacity - 2):
+            capacity *= 2
+        return capacity
+
+    def _iter_entries(self):
+        if self._old_keys is not None:
+            for key, value in zip(self._old_keys, self._old_values):
+                if key is not None and key is not _TOMBSTONE:
+                    yield key, value
+        for key, value in zip(self._keys, self._values):
+            if key is not None and key is not _TOMBSTONE:
+                yield key, value
+
+    def _resizing(self):
+        return self._old_keys is not None
+
+    def _start_resize(self, new_size):
+        self._old_hashes = self._hashes
+        self._old_keys = self._keys
+        self._old_values = self._values
+        self._old_mask = self._mask
+        self._rehash_index = 0
+        self._allocate(new_size)
+
+    def _rehash_step(self):
+        if self._old_keys is None:
+            return
+        old_keys = self._old_keys
+        stop = min(self._rehash_index + self.rehash_step, len(old_keys))
+        for i in range(self._rehash_index, stop):
+            key = old_keys[i]
+            if key is None or key is _TOMBSTONE:
+                continue
+            key_hash = self._old_hashes[i]
+            j = key_hash & self._mask
+            while self._keys[j] is not None and self._keys[j] is not _TOMBSTONE:
+                j = (j + 1) & self._mask
+            if self._keys[j] is None:
+                self._fill += 1
+            self._hashes[j] = key_hash
+            self._keys[j] = key
+            self._values[j] = self._old_values[i]
+            # Leave a tombstone so probes through the old arrays still reach later slots.
+            old_keys[i] = _TOMBSTONE
+            self._old_values[i] = None
+        self._rehash_index = stop
+        if stop >= len(old_keys):
+            self._old_hashes = self._old_keys = self._old_values = None
+
+    def _maybe_resize(self):
+        # Always keep a couple of never-used slots so that every probe sequence terminates.
+        limit = min(self.max_load_factor * self.size, self.size - 2)
+        if self._resizing():
+            if self._fill <= limit:
+                return
+            # The new arrays filled up before the migration finished; complete it now.
+            while self._resizing():
+                self._rehash_step()
+        if self._fill > limit:
+            # Size the new arrays so that the live entries use at most half the allowed load,
+            # which also drops every tombstone.
+            capacity = self.size
+            while self._count > capacity * self.max_load_factor / 2:
+                capacity *= 2
+            self._start_resize(capacity)
+        elif (self.min_load_factor is not None and self.size > self._initial_size
+                and self._count < self.min_load_factor * self.size):
+            self._start_resize(max(self._initial_size, self.size // 2))
+
+
+# Storage backends selectable with HashTable(backend=...).
+BACKENDS = {
+    "chaining": HashTable,
+    "open_addressing": OpenAddressingHashTable,
+}
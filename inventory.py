@@ -0,0 +1,767 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Inventory Facade
+# Author: Unique Karanjit
+# Single entry point that keeps the hash table and the AVL tree consistent
+# ----------------------------------------------------------------------------------------------------------------------
+
+import os
+from functools import wraps
+
+from hashtable import HashTable
+from AVLTree import AVLTree
+from persistent_avl import PersistentAVLTree
+from price_index import PriceIndex
+from product import Product, is_valid_price, product_error
+from rwlock import ReadWriteLock
+from snapshot import read_snapshot, write_snapshot
+from utils import bulk_upsert, bulk_delete, gc_paused
+from wal import WriteAheadLog, INSERT, DELETE, PRICE
+
+
+class Inventory:
+    """
+    Owns the product indexes and keeps them consistent.
+
+    Products are stored in a HashTable keyed by product ID and in an AVLTree keyed by price.
+    Every change goes through this class, so the two indexes always hold the same products
+    at the same prices. The tree keeps a handle from each product ID to its node, so a
+    product is removed from the tree by ID without trusting its (possibly modified) price.
+
+    A secondary index maps each product name (category) to the IDs of its products and,
+    optionally, to a price-ordered AVLTree of just that category, so that a query such as
+    "all Laptops under $800" costs O(log N + k) instead of a scan of every product.
+
+    An optional QueryCache keeps the results of find_products_in_range and
+    find_by_partial_id. Every change invalidates just the cached ranges holding the
+    product's old or new price and the cached prefixes of its ID. (A ConcurrentInventory
+    with persistent=True does not cache ranges, see QueryCache.)
+
+    With price_index=True a columnar PriceIndex is kept next to the tree and serves the
+    price range queries (find_products_in_range, iter_range, count_in_range).
+    """
+
+    def __init__(self, backend="chaining", category_trees=True, persistent=False, cache=None, price_index=False,
+                 **table_options):
+        """
+        Initializes an empty inventory.
+
+        :param backend: The hash table backend, see HashTable.
+        :param category_trees: Whether to keep a price-ordered tree per category. Without them,
+                               category queries filter the category's products by price.
+        :param persistent: Whether the price index is a PersistentAVLTree, whose versions can
+                           be scanned while it is being updated (see ConcurrentInventory).
+        :param cache: A QueryCache for range and partial ID query results (None for no caching).
+        :param price_index: Whether to answer price range queries from a PriceIndex.
+        :param table_options: Further keyword arguments for the HashTable (size, load factors...).
+        """
+        self.hashTable = HashTable(backend=backend, **table_options)
+        self.avlTree = PersistentAVLTree(track_ids=True) if persistent else AVLTree(track_ids=True)
+
+        self._category_ids = {}  # Category -> set of product IDs.
+        self._category_of = {}  # Product ID -> category it is indexed under.
+        self._category_trees = {} if category_trees else None  # Category -> AVLTree.
+        self.cache = cache
+        self.priceIndex = PriceIndex() if price_index else None
+
+        self.log = None  # WriteAheadLog of an inventory created by open().
+        self._snapshot_path = None
+        self._compact_bytes = None
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def insert(self, product):
+        """
+        Inserts a product, or replaces the product with the same ID.
+
+        :param product: A product dictionary or Product record. A missing ID is generated.
+        :return: The stored product.
+        :raises ValueError: If the product is invalid; the inventory is then unchanged.
+        """
+        # Check everything up front: a failure after the first index is written would leave
+        # the indexes disagreeing.
+        error = product_error(product)
+        if error is not None:
+            raise ValueError(f"Invalid product: {error}")
+        product_id = product.get('id')
+        product = self.hashTable.insert(product_id or None, product)
+        old_price = self.avlTree.price_of(product['id'])
+        self.avlTree.remove(product['id'])
+        self.avlTree.root = self.avlTree.insert(self.avlTree.root, product['price'], product)
+        self._unindex_category(product['id'])
+        self._index_category(product)
+        if self.priceIndex is not None:
+            self.priceIndex.insert(product['price'], product)
+        if self.cache is not None:
+            self.cache.invalidate((product['id'],), (old_price, product['price']))
+        if self.log is not None:
+            self.log.log_insert(product)
+            self._maybe_compact()
+        return product
+
+    def update_price(self, product_id, price):
+        """
+        Changes a product's price in both indexes.
+
+        :param product_id: The product's ID.
+        :param price: The new price.
+        :return: The updated product, or None if no product has this ID.
+        :raises ValueError: If the price is invalid.
+        """
+        if not is_valid_price(price):
+            raise ValueError("Invalid price value")
+        product = self.hashTable.get(product_id)
+        if product is None:
+            return None
+        old_price = self.avlTree.price_of(product_id)
+        self.avlTree.remove(product_id)
+        product['price'] = price
+        self.avlTree.root = self.avlTree.insert(self.avlTree.root, price, product)
+        if self._category_trees is not None:
+            tree = self._category_trees[self._category_of[product_id]]
+            tree.remove(product_id)
+            tree.root = tree.insert(tree.root, price, product)
+        if self.priceIndex is not None:
+            self.priceIndex.insert(price, product)
+        if self.cache is not None:
+            self.cache.invalidate((product_id,), (old_price, price))
+        if self.log is not None:
+            self.log.log_price(product_id, price)
+            self._maybe_compact()
+        return product
+
+    def delete(self, product_id):
+        """
+        Deletes a product from both indexes.
+
+        :param product_id: The product's ID.
+        :return: True if deleted, False if not found.
+        """
+        if not self.hashTable.delete(product_id):
+            return False
+        price = self.avlTree.price_of(product_id)
+        self.avlTree.remove(product_id)
+        self._unindex_category(product_id)
+        if self.priceIndex is not None:
+            self.priceIndex.delete(product_id)
+        if self.cache is not None:
+            self.cache.invalidate((product_id,), (price,))
+        if self.log is not None:
+            self.log.log_delete(product_id)
+            self._maybe_compact()
+        return True
+
+    def bulk_upsert(self, products):
+        """
+        Inserts or updates a batch of products, see utils.bulk_upsert.
+
+        :return: The counts of inserted, updated and rejected products.
+        """
+        stored = []
+        if self.cache is not None:
+            products = products if isinstance(products, (list, tuple)) else list(products)
+            # Only valid products can be stored; the others are left for bulk_upsert to reject.
+            old_prices = {
+                product.get('id'): self.avlTree.price_of(product.get('id'))
+                for product in products if product_error(product) is None
+            }
+        with gc_paused():
+            report = bulk_upsert(self.hashTable, self.avlTree, products, stored)
+            if self._category_of:
+                self._unindex_categories([product['id'] for product in stored])
+            self._index_categories(stored)
+            if self.priceIndex is not None and not self.priceIndex:
+                # A first load is sorted once instead of merged in batches.
+                self.priceIndex = PriceIndex.from_items(
+                    ((product['price'], product) for product in stored), self.priceIndex.batch_size)
+            elif self.priceIndex is not None:
+                for product in stored:
+                    self.priceIndex.insert(product['price'], product)
+        if self.cache is not None:
+            self.cache.invalidate(
+                [product['id'] for product in stored],
+                [old_prices.get(product['id']) for product in stored] + [product['price'] for product in stored],
+            )
+        if self.log is not None:
+            for product in stored:
+                self.log.log_insert(product)
+            self._maybe_compact()
+        return report
+
+    def bulk_delete(self, ids):
+        """
+        Deletes a batch of products, see utils.bulk_delete.
+
+        :return: The counts of deleted and missing IDs.
+        """
+        ids = ids if isinstance(ids, (list, tuple)) else list(ids)
+        if self.cache is not None:
+            prices = [self.avlTree.price_of(product_id) for product_id in ids]
+        with gc_paused():
+            report = bulk_delete(self.hashTable, self.avlTree, ids)
+            self._unindex_categories(
+                [product_id for product_id in ids if product_id in self._category_of and product_id not in self]
+            )
+            if self.priceIndex is not None:
+                for product_id in ids:
+                    self.priceIndex.delete(product_id)
+        if self.cache is not None and report["deleted"]:
+            self.cache.invalidate(ids, prices)
+        if self.log is not None and report["deleted"]:
+            for product_id in ids:
+                self.log.log_delete(product_id)
+            self._maybe_compact()
+        return report
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def save_snapshot(self, path):
+        """
+        Saves every product to a binary snapshot file, see snapshot.write_snapshot.
+
+        :param path: The snapshot file to create or replace (atomically).
+        :return: The number of products saved.
+        """
+        with gc_paused():
+            # The price tree yields the products already in the order the file stores them. Its
+            # current root is read rather than a published version, so a checkpoint taken in the
+            # middle of a write includes that write before the log is emptied.
+            return write_snapshot(path, list(self.avlTree.get_sorted_products()))
+
+    @classmethod
+    def load_snapshot(cls, path, as_records=False, **options):
+        """
+        Creates an inventory from a snapshot file written by save_snapshot.
+
+        The snapshot stores the products in price order, so the price tree is built from
+        presorted data and every index is bulk-loaded instead of replayed product by product.
+
+        :param path: The snapshot file.
+        :param as_records: Load the products as Product records instead of dictionaries.
+        :param options: Keyword arguments for the new Inventory (backend, category_trees...).
+        :return: The restored inventory.
+        """
+        inventory = cls(**options)
+        with gc_paused():
+            products = read_snapshot(path, as_records)
+            inventory.hashTable.insert_many([(product['id'], product) for product in products])
+            inventory.avlTree.merge([(product['price'], product) for product in products], presorted=True)
+            inventory._index_categories(products)
+            if inventory.priceIndex is not None:
+                inventory.priceIndex = PriceIndex.from_items((product['price'], product) for product in products)
+        return inventory
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Durability
+    # ------------------------------------------------------------------------------------------------------------------
+
+    SNAPSHOT_FILE = "inventory.snap"
+    LOG_FILE = "inventory.log"
+
+    @classmethod
+    def open(cls, directory, sync_every=64, sync_interval=0.05, compact_bytes=16 * 1024 * 1024,
+             as_records=False, **options):
+        """
+        Opens a durable inventory stored in a directory.
+
+        The inventory is restored from the directory's snapshot, then the write-ahead log of
+        the changes made since that snapshot is replayed on top of it. Every later change is
+        appended to the log (see WriteAheadLog for the group-commit policy), and once the log
+        grows past compact_bytes a new snapshot is saved and the log is emptied.
+
+        :param directory: The directory holding the snapshot and the log; created if missing.
+        :param sync_every: Group commit: fsync the log once this many changes are pending.
+        :param sync_interval: Group commit: fsync the log when a change arrives this many seconds
+                              after the last fsync.
+        :param compact_bytes: Log size that triggers a checkpoint.
+        :param as_records: Store the products as Product records instead of dictionaries.
+        :param options: Keyword arguments for the new Inventory (backend, category_trees...).
+        :return: The restored inventory. Call close() when done with it.
+        """
+        os.makedirs(directory, exist_ok=True)
+        snapshot_path = os.path.join(directory, cls.SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            inventory = cls.load_snapshot(snapshot_path, as_records, **options)
+        else:
+            inventory = cls(**options)
+
+        with gc_paused():
+            log = WriteAheadLog(os.path.join(directory, cls.LOG_FILE), sync_every, sync_interval)
+            inventory._replay(log.replay(), as_records)
+        inventory.log = log
+        inventory._snapshot_path = snapshot_path
+        inventory._compact_bytes = compact_bytes
+        inventory._maybe_compact()
+        return inventory
+
+    def _replay(self, records, as_records=False):
+        """
+        Applies log records in order. Consecutive inserts and deletes are applied as one batch.
+
+        Every record is idempotent (inserts carry the whole product), so replaying changes that
+        the snapshot already contains is harmless.
+        """
+        batch = []
+        for index, record in enumerate(records):
+            op = record[0]
+            if op == INSERT:
+                product_id, name, price = record[1:]
+                batch.append(Product(product_id, name, price) if as_records
+                             else {"id": product_id, "name": name, "price": price})
+            elif op == DELETE:
+                batch.append(record[1])
+            elif op == PRICE:
+                self.update_price(record[1], record[2])
+            if batch and (index + 1 == len(records) or records[index + 1][0] != op):
+                if op == INSERT:
+                    self.bulk_upsert(batch)
+                else:
+                    self.bulk_delete(batch)
+                batch = []
+
+    def _maybe_compact(self):
+        """
+        Checkpoints once the log has grown past the compaction threshold.
+        """
+        if self.log.size >= self._compact_bytes:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Saves a snapshot of the inventory and empties the write-ahead log.
+
+        The log is only emptied after the new snapshot has replaced the old one, so a crash
+        at any point leaves a snapshot and a log that together hold every synced change.
+        """
+        if self.log is None:
+            raise ValueError("Only an inventory created by Inventory.open has a log to checkpoint")
+        self.log.sync()
+        self.save_snapshot(self._snapshot_path)
+        self.log.reset()
+
+    def close(self):
+        """
+        Makes every change durable and closes the write-ahead log.
+        """
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Category index
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _index_category(self, product):
+        """
+        Adds a stored product to its category's index.
+        """
+        category = product['name']
+        self._category_ids.setdefault(category, set()).add(product['id'])
+        self._category_of[product['id']] = category
+        if self._category_trees is not None:
+            tree = self._category_trees.get(category)
+            if tree is None:
+                tree = self._category_trees[category] = AVLTree(track_ids=True)
+            tree.root = tree.insert(tree.root, product['price'], product)
+
+    def _unindex_category(self, product_id):
+        """
+        Removes a product from the category it is indexed under, if any.
+        """
+        category = self._category_of.pop(product_id, None)
+        if category is None:
+            return
+        ids = self._category_ids[category]
+        ids.discard(product_id)
+        if self._category_trees is not None:
+            self._category_trees[category].remove(product_id)
+        if not ids:
+            del self._category_ids[category]
+            if self._category_trees is not None:
+                del self._category_trees[category]
+
+    def _index_categories(self, products):
+        """
+        Adds a batch of stored products to the category index, merging each category's
+        products into its tree in one sorted batch.
+        """
+        batches = {}
+        for product in products:
+            batch = batches.get(product['name'])
+            if batch is None:
+                batch = batches[product['name']] = []
+            batch.append(product)
+
+        for category, batch in batches.items():
+            ids = [product['id'] for product in batch]
+            self._category_ids.setdefault(category, set()).update(ids)
+            self._category_of.update(dict.fromkeys(ids, category))
+            if self._category_trees is not None:
+                tree = self._category_trees.get(category)
+                if tree is None:
+                    tree = self._category_trees[category] = AVLTree(track_ids=True)
+                tree.merge([(product['price'], product) for product in batch])
+
+    def _unindex_categories(self, product_ids):
+        """
+        Removes a batch of products from the category index.
+        """
+        batches = {}
+        for product_id in product_ids:
+            category = self._category_of.pop(product_id, None)
+            if category is None:
+                continue
+            self._category_ids[category].discard(product_id)
+            batches.setdefault(category, []).append(product_id)
+
+        for category, product_ids in batches.items():
+            if not self._category_ids[category]:
+                del self._category_ids[category]
+                if self._category_trees is not None:
+                    del self._category_trees[category]
+            elif self._category_trees is not None:
+                tree = self._category_trees[category]
+                tree.delete_many([(tree.price_of(product_id), product_id) for product_id in product_ids])
+
+    def categories(self):
+        """
+        Returns the number of products in each category.
+
+        :return: A dictionary mapping each category to its product count.
+        """
+        return {category: len(ids) for category, ids in self._category_ids.items()}
+
+    def find_by_category(self, category, min_price=None, max_price=None, limit=None):
+        """
+        Returns the products of a category, optionally within a price range, in ascending
+        price order. With category trees this costs O(log N + k) for k results.
+
+        :param category: The product name to match exactly.
+        :param min_price: The lowest price to include (no lower bound if None).
+        :param max_price: The highest price to include (no upper bound if None).
+        :param limit: The maximum number of products to return (None for no limit).
+        :return: A list of product summaries, as returned by the price queries.
+        """
+        return list(self.iter_category(category, min_price, max_price, limit=limit))
+
+    def iter_category(self, category, min_price=None, max_price=None, descending=False, limit=None, offset=0):
+        """
+        Lazily yields the products of a category within a price range, see find_by_category.
+
+        :param descending: If True, the most expensive products come first.
+        :param offset: The number of matching products to skip first.
+        """
+        min_price = float('-inf') if min_price is None else min_price
+        max_price = float('inf') if max_price is None else max_price
+        if self._category_trees is not None:
+            tree = self._category_trees.get(category)
+            if tree is None:
+                return iter(())
+            return tree.iter_range(min_price, max_price, descending, limit, offset)
+
+        # Without a category tree, filter the category's products and sort the matches.
+        matches = []
+        for product_id in self._category_ids.get(category, ()):
+            price = self.avlTree.price_of(product_id)
+            if min_price <= price <= max_price:
+                matches.append((price, product_id))
+        matches.sort(key=lambda match: match[0], reverse=descending)
+        end = None if limit is None else offset + limit
+        return (self.avlTree.summary_of(product_id) for _, product_id in matches[offset:end])
+
+    def count_by_category(self, category, min_price=None, max_price=None):
+        """
+        Returns the number of products of a category within a price range. With category
+        trees this costs O(log N).
+        """
+        if self._category_trees is None:
+            return sum(1 for _ in self.iter_category(category, min_price, max_price))
+        tree = self._category_trees.get(category)
+        if tree is None:
+            return 0
+        return tree.count_in_range(
+            float('-inf') if min_price is None else min_price,
+            float('inf') if max_price is None else max_price,
+        )
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Lookups by ID
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def get(self, product_id):
+        """
+        Returns the product with the given ID, or None.
+        """
+        return self.hashTable.get(product_id)
+
+    def find_by_partial_id(self, partial_id):
+        """
+        Returns the single product whose ID starts with partial_id, see HashTable.find_by_partial_id.
+        With a cache, products found are cached under the normalized prefix; lookups that find
+        nothing are not cached, so their messages are still printed.
+        """
+        if self.cache is None or not isinstance(partial_id, str):
+            return self.hashTable.find_by_partial_id(partial_id)
+        prefix = partial_id.strip().lower()
+        product = self.cache.get(prefix)
+        if product is None:
+            product = self.hashTable.find_by_partial_id(partial_id)
+            if product is not None:
+                self.cache.put_prefix(prefix, product)
+        return product
+
+    def find_by_prefix(self, prefix, limit=None):
+        """
+        Returns the products whose IDs start with prefix, see HashTable.find_by_prefix.
+        """
+        return self.hashTable.find_by_prefix(prefix, limit)
+
+    def items(self):
+        """
+        Returns every (product ID, product) pair.
+        """
+        return self.hashTable.items()
+
+    def __contains__(self, product_id):
+        return self.hashTable.get(product_id) is not None
+
+    def __len__(self):
+        """
+        Returns the number of products in O(1).
+        """
+        return len(self.hashTable)
+
+    def __bool__(self):
+        """
+        Returns True if the inventory holds at least one product.
+        """
+        return bool(self.hashTable)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Queries by price
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def find_cheapest(self):
+        """
+        Returns the cheapest product, or None if the inventory is empty.
+        """
+        return self.avlTree.find_cheapest()
+
+    def find_most_expensive(self):
+        """
+        Returns the most expensive product, or None if the inventory is empty.
+        """
+        return self.avlTree.find_most_expensive()
+
+    @property
+    def _range_index(self):
+        """
+        The structure that answers price range queries: the PriceIndex if there is one.
+        """
+        return self.priceIndex if self.priceIndex is not None else self.avlTree
+
+    def iter_range(self, min_price, max_price, descending=False, limit=None, offset=0):
+        """
+        Lazily yields the products priced between min_price and max_price, see AVLTree.iter_range.
+        """
+        return self._range_index.iter_range(min_price, max_price, descending, limit, offset)
+
+    def find_products_in_range(self, min_price, max_price):
+        """
+        Returns the products priced between min_price and max_price (inclusive). With a cache,
+        repeated windows are answered from it until a change touches a price in the window.
+        """
+        if self.cache is None:
+            return self._range_index.find_products_in_range(min_price, max_price)
+        key = ("range", min_price, max_price)
+        products = self.cache.get(key)
+        if products is None:
+            products = self._range_index.find_products_in_range(min_price, max_price)
+            self.cache.put_range(key, min_price, max_price, products)
+        return list(products)
+
+    def count_in_range(self, min_price, max_price):
+        """
+        Returns the number of products priced between min_price and max_price (inclusive).
+        """
+        return self._range_index.count_in_range(min_price, max_price)
+
+    def get_sorted_products(self, descending=False):
+        """
+        Yields every product ordered by price.
+        """
+        return self.avlTree.get_sorted_products(descending)
+
+    def is_consistent(self):
+        """
+        Checks that every index holds the same products at the same prices, and under their
+        current names in the category index. Runs in O(N); intended for tests and diagnostics.
+
+        :return: True if the indexes agree and the tree is balanced.
+        """
+        if len(self.hashTable) != len(self.avlTree) or not self.avlTree.is_balanced():
+            return False
+        for product_id, product in self.hashTable.items():
+            if self.avlTree.price_of(product_id) != product['price']:
+                return False
+            category = self._category_of.get(product_id)
+            if category != product['name'] or product_id not in self._category_ids[category]:
+                return False
+            if (self._category_trees is not None
+                    and self._category_trees[category].price_of(product_id) != product['price']):
+                return False
+        if sum(len(ids) for ids in self._category_ids.values()) != len(self.hashTable):
+            return False
+        if self.priceIndex is not None and (
+                len(self.priceIndex) != len(self.hashTable)
+                or self.priceIndex.count_in_range(float('-inf'), float('inf')) != len(self.hashTable)):
+            return False
+        return True
+
+
+def _reading(method):
+    """
+    Wraps an Inventory method so that it runs under the read lock.
+    """
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        lock = self.lock
+        lock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+    return locked
+
+
+def _reading_all(method):
+    """
+    Wraps a lazy Inventory query so that it is run to completion under the read lock. A
+    generator that held the lock between items could stall writers indefinitely.
+    """
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        lock = self.lock
+        lock.acquire_read()
+        try:
+            return iter(list(method(self, *args, **kwargs)))
+        finally:
+            lock.release_read()
+    return locked
+
+
+def _writing(method):
+    """
+    Wraps an Inventory method so that it runs under the write lock, and publishes the new
+    version of a persistent price tree once the whole change has been made.
+    """
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.write():
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._publish()
+    return locked
+
+
+def _scanning(method, collect=False):
+    """
+    Wraps a price query so that it runs lock-free on a pinned version of a persistent price
+    tree, or under the read lock otherwise.
+    """
+    locked = _reading_all(method) if collect else _reading(method)
+
+    @wraps(method)
+    def scan(self, *args, **kwargs):
+        if self._versioned:
+            return getattr(self.snapshot(), method.__name__)(*args, **kwargs)
+        return locked(self, *args, **kwargs)
+    return scan
+
+
+class ConcurrentInventory(Inventory):
+    """
+    An Inventory that can be shared between threads.
+
+    Lookups and queries take a shared read lock and run concurrently with each other; updates
+    take the exclusive write lock. A reader therefore never sees a hash table bucket or a
+    tree rotation half done, nor a product that is in one index but not yet in the other.
+    Lazy queries (iter_range, iter_category, get_sorted_products) are collected under the
+    lock and returned as iterators over the result.
+
+    With persistent=True the price queries take no lock at all: they run on a version of the
+    PersistentAVLTree pinned when the query starts, so a long scan or sorted listing neither
+    blocks writers nor sees their changes, and iter_range stays lazy. Writers publish a new
+    version at the end of each change, so a scan never sees half of an update.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes an empty inventory, see Inventory.
+        """
+        super().__init__(*args, **kwargs)
+        self.lock = ReadWriteLock()
+        self._versioned = isinstance(self.avlTree, PersistentAVLTree)
+
+    @classmethod
+    def load_snapshot(cls, path, as_records=False, **options):
+        """
+        Creates an inventory from a snapshot file, see Inventory.load_snapshot.
+        """
+        inventory = super().load_snapshot(path, as_records, **options)
+        inventory._publish()
+        return inventory
+
+    def _publish(self):
+        """
+        Makes the price tree's current version visible to lock-free scans, and merges the
+        price index's buffered changes so that readers never have to.
+        """
+        if self._versioned:
+            self.avlTree.publish()
+        if self.priceIndex is not None:
+            self.priceIndex.flush()
+
+    def snapshot(self):
+        """
+        Returns the latest published version of the price tree in O(1). The returned tree
+        never changes, so several queries against it see one consistent state.
+
+        :raises ValueError: If the inventory was not created with persistent=True.
+        """
+        if not self._versioned:
+            raise ValueError("Snapshots require an inventory created with persistent=True")
+        return self.avlTree.snapshot()
+
+    insert = _writing(Inventory.insert)
+    update_price = _writing(Inventory.update_price)
+    delete = _writing(Inventory.delete)
+    bulk_upsert = _writing(Inventory.bulk_upsert)
+    bulk_delete = _writing(Inventory.bulk_delete)
+    checkpoint = _writing(Inventory.checkpoint)
+    close = _writing(Inventory.close)
+
+    save_snapshot = _reading(Inventory.save_snapshot)
+    categories = _reading(Inventory.categories)
+    find_by_category = _reading(Inventory.find_by_category)
+    count_by_category = _reading(Inventory.count_by_category)
+    get = _reading(Inventory.get)
+    find_by_partial_id = _reading(Inventory.find_by_partial_id)
+    find_by_prefix = _reading(Inventory.find_by_prefix)
+    items = _reading(Inventory.items)
+    __contains__ = _reading(Inventory.__contains__)
+    __len__ = _reading(Inventory.__len__)
+    __bool__ = _reading(Inventory.__bool__)
+    is_consistent = _reading(Inventory.is_consistent)
+    iter_category = _reading_all(Inventory.iter_category)
+
+    find_cheapest = _scanning(Inventory.find_cheapest)
+    find_most_expensive = _scanning(Inventory.find_most_expensive)
+    find_products_in_range = _scanning(Inventory.find_products_in_range)
+    count_in_range = _scanning(Inventory.count_in_range)
+    iter_range = _scanning(Inventory.iter_range, collect=True)
+    get_sorted_products = _scanning(Inventory.get_sorted_products, collect=True)
@@ -0,0 +1,182 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Inventory Import and Export
+# Author: Unique Karanjit
+# Streaming CSV and JSON Lines readers and writers that move catalogue files in fixed-size chunks
+# ----------------------------------------------------------------------------------------------------------------------
+
+import csv
+import gzip
+import json
+import math
+from itertools import islice
+
+from product import Product
+from utils import gc_paused
+
+FIELDS = ('id', 'name', 'price')
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _open(path, mode, encoding):
+    """
+    Opens a text file for csv/json streaming, transparently (de)compressing .gz files.
+    """
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding=encoding, newline="")
+    return open(path, mode, encoding=encoding, newline="")
+
+
+def _chunks(iterable, chunk_size):
+    """
+    Yields lists of at most chunk_size items from an iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _make_product(product_id, name, price, as_records):
+    """
+    Builds a product from raw field values. Prices that are not finite numbers ("nan" and
+    "inf" parse as floats) are passed through unchanged so that the bulk load rejects them
+    as invalid.
+    """
+    if isinstance(price, str):
+        try:
+            value = float(price)
+        except ValueError:
+            value = None
+        if value is not None and math.isfinite(value):
+            price = value
+    product_id = product_id or None  # An empty ID column means "generate one".
+    if as_records:
+        return Product(product_id, name, price)
+    return {"id": product_id, "name": name, "price": price}
+
+
+def _import(inventory, products, chunk_size):
+    """
+    Bulk-loads products into the inventory one chunk at a time and adds up the reports.
+    The collector stays paused between chunks too: parsing allocates as much as loading.
+    """
+    report = {"inserted": 0, "updated": 0, "rejected": {}}
+    with gc_paused():
+        for chunk in _chunks(products, chunk_size):
+            result = inventory.bulk_upsert(chunk)
+            report["inserted"] += result["inserted"]
+            report["updated"] += result["updated"]
+            for reason, count in result["rejected"].items():
+                report["rejected"][reason] = report["rejected"].get(reason, 0) + count
+    return report
+
+
+def import_csv(inventory, path, chunk_size=DEFAULT_CHUNK_SIZE, as_records=False, encoding="utf-8"):
+    """
+    Imports products from a CSV file with a header row containing id, name and price.
+
+    The file is read row by row and loaded with Inventory.bulk_upsert in chunks of chunk_size
+    products, so memory use does not grow with the size of the file. Other columns are
+    ignored and an empty id generates a new one.
+
+    :param inventory: The Inventory to load into.
+    :param path: The CSV file (.csv.gz files are decompressed on the fly).
+    :param chunk_size: The number of products per bulk load.
+    :param as_records: Store the products as Product records instead of dictionaries.
+    :param encoding: The file's text encoding.
+    :return: The counts of inserted, updated and rejected products, as bulk_upsert returns them.
+    :raises ValueError: If the header lacks a name or price column.
+    """
+    with _open(path, "r", encoding) as f:
+        reader = csv.DictReader(f)
+        missing = [field for field in ('name', 'price') if field not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{path} has no {' or '.join(missing)} column")
+        products = (_make_product(row.get('id'), row['name'], row['price'], as_records) for row in reader)
+        return _import(inventory, products, chunk_size)
+
+
+def import_jsonl(inventory, path, chunk_size=DEFAULT_CHUNK_SIZE, as_records=False, encoding="utf-8"):
+    """
+    Imports products from a JSON Lines file with one product object per line.
+
+    Like import_csv, the file is streamed and loaded in chunks. Blank lines are skipped and
+    lines that are not JSON objects are counted as rejected ("malformed line").
+
+    :param inventory: The Inventory to load into.
+    :param path: The JSON Lines file (.jsonl.gz files are decompressed on the fly).
+    :param chunk_size: The number of products per bulk load.
+    :param as_records: Store the products as Product records instead of dictionaries.
+    :param encoding: The file's text encoding.
+    :return: The counts of inserted, updated and rejected products, as bulk_upsert returns them.
+    """
+    malformed = 0
+
+    def products(f):
+        nonlocal malformed
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                malformed += 1
+                continue
+            yield _make_product(data.get('id'), data.get('name'), data.get('price'), as_records)
+
+    with _open(path, "r", encoding) as f:
+        report = _import(inventory, products(f), chunk_size)
+    if malformed:
+        report["rejected"]["malformed line"] = malformed
+    return report
+
+
+def export_csv(inventory, path, chunk_size=DEFAULT_CHUNK_SIZE, encoding="utf-8"):
+    """
+    Exports every product to a CSV file with an id, name, price header, in ascending price order.
+
+    Products are streamed from the price tree and written chunk_size rows at a time, so no
+    copy of the inventory is built.
+
+    :param inventory: The Inventory to export.
+    :param path: The CSV file to write (.csv.gz files are compressed on the fly).
+    :param chunk_size: The number of rows per write.
+    :param encoding: The file's text encoding.
+    :return: The number of products written.
+    """
+    count = 0
+    with _open(path, "w", encoding) as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        rows = ((product['id'], product['name'], product['price']) for product in inventory.get_sorted_products())
+        for chunk in _chunks(rows, chunk_size):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def export_jsonl(inventory, path, chunk_size=DEFAULT_CHUNK_SIZE, encoding="utf-8"):
+    """
+    Exports every product to a JSON Lines file, one object per line, in ascending price order.
+
+    :param inventory: The Inventory to export.
+    :param path: The JSON Lines file to write (.jsonl.gz files are compressed on the fly).
+    :param chunk_size: The number of lines per write.
+    :param encoding: The file's text encoding.
+    :return: The number of products written.
+    """
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    count = 0
+    with _open(path, "w", encoding) as f:
+        lines = (
+            encode({"id": product['id'], "name": product['name'], "price": product['price']}) + "\n"
+            for product in inventory.get_sorted_products()
+        )
+        for chunk in _chunks(lines, chunk_size):
+            f.write("".join(chunk))
+            count += len(chunk)
+    return count
@@ -0,0 +1,175 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Inventory Server Load Generator
+# Author: Unique Karanjit
+# Drives the inventory server with pipelined requests and reports latency percentiles and throughput
+# ----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from inventory import Inventory
+from server import InventoryServer
+from utils import generate_random_inventory
+
+CATEGORIES = ["Laptop", "Phone", "Tablet", "Watch", "Camera", "Headphones", "Speaker", "Charger"]
+
+
+def _percentile(sorted_values, q):
+    """
+    Returns the q-th percentile (0-100) of an already sorted list, by nearest rank.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _make_request(rng, known_ids, write_ratio):
+    """
+    Returns a random request: an insert or delete with probability write_ratio, otherwise a
+    get, prefix lookup, range query, min/max or sorted page.
+    """
+    if rng.random() < write_ratio:
+        if known_ids and rng.random() < 0.2:
+            return {"op": "delete", "id": known_ids.pop(rng.randrange(len(known_ids)))}
+        product_id = str(uuid.uuid4())
+        known_ids.append(product_id)
+        price = round(rng.uniform(10, 2000), 2)
+        return {"op": "insert", "product": {"id": product_id, "name": rng.choice(CATEGORIES), "price": price}}
+    kind = rng.random()
+    if kind < 0.5 and known_ids:
+        return {"op": "get", "id": rng.choice(known_ids)}
+    if kind < 0.65 and known_ids:
+        return {"op": "prefix", "prefix": rng.choice(known_ids)[:4], "limit": 10}
+    if kind < 0.85:
+        low = round(rng.uniform(10, 1990), 2)
+        return {"op": "range", "min": low, "max": low + 10, "limit": 20}
+    if kind < 0.95:
+        return {"op": rng.choice(("min", "max"))}
+    return {"op": "sorted_page", "offset": rng.randrange(1000), "limit": 20}
+
+
+async def _client(host, port, path, requests, pipeline, write_ratio, seed, known_ids, latencies):
+    """
+    Runs one connection that keeps up to pipeline requests in flight.
+    """
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random(seed)
+    sent_at = {}
+    window = asyncio.Semaphore(pipeline)
+    errors = 0
+
+    async def receive():
+        nonlocal errors
+        for _ in range(requests):
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent_at.pop(response["req"]))
+            if not response["ok"]:
+                errors += 1
+            window.release()
+
+    receiver = asyncio.ensure_future(receive())
+    for number in range(requests):
+        await window.acquire()
+        request = _make_request(rng, known_ids, write_ratio)
+        request["req"] = number
+        sent_at[number] = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b"\n")
+        if window.locked():
+            await writer.drain()
+    await writer.drain()
+    await receiver
+    writer.close()
+    return errors
+
+
+async def run_load(host="127.0.0.1", port=8765, path=None, connections=8, requests=2000, pipeline=16,
+                   write_ratio=0.2, seed=0, known_ids=None):
+    """
+    Drives a server with several pipelined connections and measures every request.
+
+    :param connections: The number of concurrent connections.
+    :param requests: The number of requests sent per connection.
+    :param pipeline: The number of requests each connection keeps in flight.
+    :param write_ratio: The fraction of requests that are inserts or deletes.
+    :param known_ids: IDs already in the inventory, used for gets, prefixes and deletes.
+    :return: A dictionary with "requests", "errors", "seconds", "ops_per_sec", "p50_ms" and "p99_ms".
+    """
+    latencies = []
+    known_ids = list(known_ids or ())
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(
+        _client(host, port, path, requests, pipeline, write_ratio, seed + i, known_ids, latencies)
+        for i in range(connections)
+    ))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "seconds": seconds,
+        "ops_per_sec": len(latencies) / seconds,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+async def run_local(products=10000, max_batch=512, **load_options):
+    """
+    Starts a server on an ephemeral local port with random products and runs the load against it.
+
+    :return: The load report, plus the number of write batches the server applied.
+    """
+    inventory = Inventory()
+    inventory.bulk_upsert(generate_random_inventory(CATEGORIES, products, seed=load_options.get("seed", 0)))
+    server = InventoryServer(inventory, max_batch)
+    listener = await server.start("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        report = await run_load("127.0.0.1", port, known_ids=[product_id for product_id, _ in inventory.items()],
+                                **load_options)
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        await server.stop()
+    report["write_batches"] = server.batches
+    report["writes"] = server.writes
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inventory server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Target a running server (default: start one locally)")
+    parser.add_argument("--unix", metavar="PATH", help="Target a running server on a Unix socket")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per connection")
+    parser.add_argument("--pipeline", type=int, default=16, help="Requests in flight per connection")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--products", type=int, default=10000, help="Products in the local server")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = dict(connections=args.connections, requests=args.requests, pipeline=args.pipeline,
+                   write_ratio=args.write_ratio, seed=args.seed)
+    if args.port is None and args.unix is None:
+        report = asyncio.run(run_local(args.products, **options))
+    else:
+        report = asyncio.run(run_load(args.host, args.port, args.unix, **options))
+
+    print(f"\nRequests:   {report['requests']} ({report['errors']} errors) in {report['seconds']:.2f}s")
+    print(f"Throughput: {report['ops_per_sec']:.0f} ops/sec")
+    print(f"Latency:    p50 {report['p50_ms']:.2f} ms, p99 {report['p99_ms']:.2f} ms")
+    if "write_batches" in report:
+        print(f"Writes:     {report['writes']} in {report['write_batches']} batches")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,32 +5,42 @@
 # ----------------------------------------------------------------------------------------------------------------------
 
 # Import necessary dependencies.
-from hashtable import HashTable
-from AVLTree import AVLTree
+import os
+
+from inventory import Inventory
 from utils import generate_random_inventory
 from utils import print_inventory
-from utils import initialize_inventory
 from utils import print_hashTable_as_table
 from utils import insert_product
 
 # Define maximum inventory size
 MAX_INVENTORY_SIZE = 1000000
 
+# The inventory's snapshot and write-ahead log live here, so every change survives a restart
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
 def main():
+    inventory = None
     try:
-        # Initialize data structures
-        hashTable = HashTable()
-        avlTree = AVLTree()
-        
-        # Initialize with some random data
-        categories = ["Laptop", "Phone", "Tablet", "Watch", "Camera", "Headphones", "Speaker", "Charger"]
+        # Restore the saved inventory, which keeps the hash table and the AVL tree in sync
         try:
-            inventory = generate_random_inventory(categories, 5)
-            initialize_inventory(inventory, hashTable, avlTree)
-        except ValueError as e:
-            print(f"Error initializing inventory: {str(e)}")
+            # Price range searches are answered by the columnar price index
+            inventory = Inventory.open(DATA_DIR, price_index=True)
+        except (OSError, ValueError) as e:
+            print(f"Could not load the saved inventory: {str(e)}")
             return
 
+        if inventory:
+            print(f"Loaded {len(inventory)} products from {DATA_DIR}")
+        else:
+            # Initialize with some random data
+            categories = ["Laptop", "Phone", "Tablet", "Watch", "Camera", "Headphones", "Speaker", "Charger"]
+            try:
+                inventory.bulk_upsert(generate_random_inventory(categories, 5))
+            except ValueError as e:
+                print(f"Error initializing inventory: {str(e)}")
+                return
+
         while True:
             try:
                 print("\nPlease enter your option.\n")
@@ -52,14 +62,13 @@ def main():
                     continue
 
                 if choice == '1':
-                    current_size = sum(len(bucket) for bucket in hashTable.table)
-                    if current_size >= MAX_INVENTORY_SIZE:
+                    if len(inventory) >= MAX_INVENTORY_SIZE:
                         print(f"\nError: Maximum inventory size ({MAX_INVENTORY_SIZE}) reached")
                         continue
-                    insert_product(hashTable, avlTree)
+                    insert_product(inventory)
                     
                 elif choice == '2':
-                    if not any(bucket for bucket in hashTable.table):
+                    if not inventory:
                         print("\nInventory is empty!")
                         continue
                         
@@ -68,32 +77,25 @@ def main():
                         print("ID cannot be empty")
                         continue
                         
-                    product = hashTable.find_by_partial_id(item_id)
+                    product = inventory.find_by_partial_id(item_id)
                     if product:
                         confirm = input(f"\nAre you sure you want to delete '{product['name']}' priced at ${product['price']:.2f}? (y/n): ").lower().strip()
                         if confirm != 'y':
                             print("Deletion cancelled")
                             continue
                         
-                        product_price = product['price']
                         product_name = product['name']
                         
-                        hash_result = hashTable.delete(product['id'])
-                        avlTree.root = avlTree.delete(avlTree.root, product_price)
-                        
-                        print(f"Product '{product_name}' with ID starting with '{item_id}' has been deleted.")
-                        
-                        if hash_result and avlTree.root:
-                            if not avlTree.is_balanced():
-                                print("\nWarning: AVL tree is not balanced!")
+                        if inventory.delete(product['id']):
+                            print(f"Product '{product_name}' with ID starting with '{item_id}' has been deleted.")
                     
                 elif choice == '3':
-                    if not any(bucket for bucket in hashTable.table):
+                    if not inventory:
                         print("\nInventory is empty!")
                         continue
                         
                     item_id = input("\nEnter the first few characters of product ID to retrieve: ").strip()
-                    product = hashTable.find_by_partial_id(item_id)
+                    product = inventory.find_by_partial_id(item_id)
                     if product:
                         print("\nProduct Details:")
                         print(f"ID: {product['id']}")
@@ -101,28 +103,28 @@ def main():
                         print(f"Price: ${product['price']:.2f}")
                     
                 elif choice == '4':
-                    print_hashTable_as_table(hashTable)
+                    print_hashTable_as_table(inventory.hashTable)
                     
                 elif choice == '5':
-                    if not avlTree.root:
+                    if not inventory:
                         print("\nNo products in inventory!")
                         continue
-                    cheapest = avlTree.find_cheapest()
+                    cheapest = inventory.find_cheapest()
                     print(f"\nCheapest Product:")
                     print(f"Name: {cheapest['name']}")
                     print(f"Price: ${cheapest['price']:.2f}")
                     
                 elif choice == '6':
-                    if not avlTree.root:
+                    if not inventory:
                         print("\nNo products in inventory!")
                         continue
-                    most_expensive = avlTree.find_most_expensive()
+                    most_expensive = inventory.find_most_expensive()
                     print(f"\nMost Expensive Product:")
                     print(f"Name: {most_expensive['name']}")
                     print(f"Price: ${most_expensive['price']:.2f}")
                     
                 elif choice == '7':
-                    if not avlTree.root:
+                    if not inventory:
                         print("\nNo products in inventory!")
                         continue
                         
@@ -160,19 +162,21 @@ def main():
                             max_price = round(max_price, 2)
                             break
 
-                        products = avlTree.find_products_in_range(min_price, max_price)
-                        if not products:
+                        # Print the range lazily instead of materializing it first
+                        found = False
+                        for product in inventory.iter_range(min_price, max_price):
+                            if not found:
+                                print(f"\nProducts between ${min_price:.2f} and ${max_price:.2f}:")
+                                found = True
+                            print(f"Name: {product['name']}, Price: ${product['price']:.2f}")
+                        if not found:
                             print(f"\nNo products found between ${min_price:.2f} and ${max_price:.2f}")
-                        else:
-                            print(f"\nProducts between ${min_price:.2f} and ${max_price:.2f}:")
-                            for product in products:
-                                print(f"Name: {product['name']}, Price: ${product['price']:.2f}")
                                 
                     except ValueError:
                         print("Please enter valid numbers for prices")
                     
                 elif choice == '8':
-                    if not avlTree.root:
+                    if not inventory:
                         print("\nNo products in inventory!")
                         continue
                         
@@ -181,19 +185,24 @@ def main():
                         print("Please enter 'y' for yes or 'n' for no")
                         sort_order = input("Sort in descending order? (y/n): ").lower().strip()
                         
-                    products = avlTree.get_sorted_products(descending=sort_order == 'y')
-                    if not products:
-                        print("No products to display")
-                        continue
-                    
                     print("\nProducts Sorted by Price:")
-                    for product in products:
+                    for product in inventory.get_sorted_products(descending=sort_order == 'y'):
                         print(f"Name: {product['name']}, Price: ${product['price']:.2f}")
                     
                 elif choice == '9':
+                    try:
+                        inventory.checkpoint()
+                        inventory.close()
+                        print(f"\nSaved {len(inventory)} products to {DATA_DIR}")
+                    except (OSError, ValueError) as e:
+                        print(f"\nCould not save the inventory: {str(e)}")
                     print("\nExiting the Inventory Management system.")
                     break
 
+            except (EOFError, KeyboardInterrupt):
+                print("\nExiting the Inventory Management system.")
+                break
+
             except Exception as e:
                 print(f"An error occurred: {str(e)}")
                 print("Please try again.")
@@ -202,6 +211,11 @@ def main():
         print(f"Fatal error: {str(e)}")
         print("Program terminated.")
 
+    finally:
+        # Sync the log however the program ends, so no acknowledged change is lost
+        if inventory is not None:
+            inventory.close()
+
 if __name__ == "__main__":
     main()
 
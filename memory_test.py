@@ -1,23 +1,23 @@
+import sys
 import psutil
 import time
+import tracemalloc
 import matplotlib.pyplot as plt
 from datetime import datetime
-from hashtable import HashTable
-from AVLTree import AVLTree
+from inventory import Inventory
 from utils import generate_random_inventory
 
-def test_memory_usage():
+def test_memory_usage(backend="chaining"):
     """Test memory usage with different data sizes"""
     # Initialize data structures
-    hashTable = HashTable()
-    avlTree = AVLTree()
+    store = Inventory(backend=backend)
     
     # Test sizes
     sizes = [100, 500, 1000, 5000, 10000, 50000, 100000]
     memory_usage = []
     categories = ["Laptop", "Phone", "Tablet", "Watch", "Camera", "Headphones"]
     
-    print("\nStarting Memory Usage Test...")
+    print(f"\nStarting Memory Usage Test ({backend} hash table)...")
     
     for size in sizes:
         # Record memory before
@@ -29,8 +29,7 @@ def test_memory_usage():
         # Generate and insert data
         inventory = generate_random_inventory(categories, size)
         for product in inventory:
-            hashTable.insert(product["id"], product)
-            avlTree.root = avlTree.insert(avlTree.root, product["price"], product["name"])
+            store.insert(product)
             
         # Record memory after
         memory_after = process.memory_info().rss / (1024 * 1024)  # MB
@@ -63,6 +62,31 @@ def test_memory_usage():
     print(f"Maximum memory usage: {max(memory_usage):.2f} MB")
     print(f"Average memory usage: {sum(memory_usage)/len(memory_usage):.2f} MB")
     print(f"Memory usage per item: {sum(memory_usage)/sum(sizes):.4f} MB")
+    print(f"Memory usage per item: {sum(memory_usage) * 1024 * 1024 / sum(sizes):.0f} bytes")
+
+def compare_record_memory(size=100000, backend="chaining"):
+    """Compare the bytes per item of dictionary products against slotted Product records"""
+    categories = ["Laptop", "Phone", "Tablet", "Watch", "Camera", "Headphones"]
+    print(f"\nComparing product representations with {size} items ({backend} hash table)...")
+
+    bytes_per_item = {}
+    for label, as_records in (("dict", False), ("Product", True)):
+        tracemalloc.start()
+        store = Inventory(backend=backend)
+        for product in generate_random_inventory(categories, size, as_records=as_records):
+            store.insert(product)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        bytes_per_item[label] = allocated / size
+        print(f"{label:>8}: {bytes_per_item[label]:.0f} bytes per item")
+        del store
+
+    saving = bytes_per_item["dict"] - bytes_per_item["Product"]
+    print(f"Product records save {saving:.0f} bytes per item "
+          f"({saving / bytes_per_item['dict']:.0%})")
+    return bytes_per_item
 
 if __name__ == "__main__":
-    test_memory_usage() 
\ No newline at end of file
+    # Optionally pass the hash table backend, e.g. "python3 memory_test.py open_addressing"
+    test_memory_usage(*sys.argv[1:2])
+    compare_record_memory(backend=(sys.argv[1:2] or ["chaining"])[0]) 
\ No newline at end of file
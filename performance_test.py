@@ -2,68 +2,105 @@ import time
 import random
 import matplotlib.pyplot as plt
 from utils import generate_random_inventory
-from hashtable import HashTable
-from AVLTree import AVLTree
+from inventory import Inventory
+from price_index import PriceIndex
 
 class PerformanceTest:
-    def __init__(self):
+    def __init__(self, seed=None):
+        self.seed = seed  # Fixes the generated inventories so runs are reproducible
         self.categories = ["Laptop", "Phone", "Tablet", "Watch", "Camera", "Headphones"]
         self.test_sizes = [100, 500, 1000, 5000, 10000, 100000]
         self.results = {
             'insert': {'sizes': [], 'times': []},
             'search': {'sizes': [], 'times': []},
             'range_search': {'sizes': [], 'times': []},
+            'index_range_search': {'sizes': [], 'times': []},
+            'bulk_load': {'sizes': [], 'times': []},
             'delete': {'sizes': [], 'times': []}
         }
 
     def test_insertion(self, size):
         """Test insertion performance"""
-        hashTable = HashTable()
-        avlTree = AVLTree()
+        store = Inventory()
         
         start_time = time.perf_counter()
         
-        inventory = generate_random_inventory(self.categories, size)
+        inventory = generate_random_inventory(self.categories, size, seed=self.seed)
         for product in inventory:
-            hashTable.insert(product["id"], product)
-            avlTree.root = avlTree.insert(avlTree.root, product["price"], product["name"])
+            store.insert(product)
             
         end_time = time.perf_counter()
         return end_time - start_time
 
+    def test_bulk_load(self, size):
+        """Test bulk loading of the inventory from a product list"""
+        inventory = generate_random_inventory(self.categories, size, seed=self.seed)
+        
+        start_time = time.perf_counter()
+        Inventory().bulk_upsert(inventory)
+        end_time = time.perf_counter()
+        
+        return end_time - start_time
+
     def test_search(self, size):
         """Test search performance"""
-        hashTable = HashTable()
-        inventory = generate_random_inventory(self.categories, size)
+        store = Inventory()
+        inventory = generate_random_inventory(self.categories, size, seed=self.seed)
         
         # Insert data first
-        for product in inventory:
-            hashTable.insert(product["id"], product)
+        store.bulk_upsert(inventory)
         
         # Test search performance
         start_time = time.perf_counter()
         for _ in range(100):  # Perform 100 random searches
             search_id = random.choice(inventory)["id"][:4]
-            hashTable.find_by_partial_id(search_id)
+            store.find_by_partial_id(search_id)
         end_time = time.perf_counter()
         
         return (end_time - start_time) / 100  # Average search time
 
     def test_range_search(self, size):
         """Test range search performance"""
-        avlTree = AVLTree()
-        inventory = generate_random_inventory(self.categories, size)
+        store = Inventory()
+        inventory = generate_random_inventory(self.categories, size, seed=self.seed)
         
         # Insert data first
+        store.bulk_upsert(inventory)
+        
+        # Test range search performance
+        start_time = time.perf_counter()
+        for _ in range(50):  # Perform 50 random range searches
+            min_price = random.uniform(50, 1000)
+            max_price = min_price + random.uniform(100, 500)
+            store.find_products_in_range(min_price, max_price)
+        end_time = time.perf_counter()
+        
+        return (end_time - start_time) / 50  # Average range search time
+
+    def test_deletion(self, size):
+        """Test deletion performance"""
+        store = Inventory()
+        inventory = generate_random_inventory(self.categories, size, seed=self.seed)
+        store.bulk_upsert(inventory)
+        
+        start_time = time.perf_counter()
         for product in inventory:
-            avlTree.root = avlTree.insert(avlTree.root, product["price"], product["name"])
+            store.delete(product["id"])
+        end_time = time.perf_counter()
+        
+        return end_time - start_time
+
+    def test_index_range_search(self, size):
+        """Test range search performance of the NumPy price index"""
+        inventory = generate_random_inventory(self.categories, size, seed=self.seed)
+        priceIndex = PriceIndex.from_items((product["price"], product) for product in inventory)
         
         # Test range search performance
         start_time = time.perf_counter()
         for _ in range(50):  # Perform 50 random range searches
             min_price = random.uniform(50, 1000)
             max_price = min_price + random.uniform(100, 500)
-            avlTree.find_products_in_range(min_price, max_price)
+            priceIndex.find_products_in_range(min_price, max_price)
         end_time = time.perf_counter()
         
         return (end_time - start_time) / 50  # Average range search time
@@ -79,6 +116,12 @@ class PerformanceTest:
             self.results['insert']['times'].append(insert_time)
             print(f"Insertion time: {insert_time:.4f} seconds")
             
+            # Test bulk loading
+            bulk_time = self.test_bulk_load(size)
+            self.results['bulk_load']['sizes'].append(size)
+            self.results['bulk_load']['times'].append(bulk_time)
+            print(f"AVL bulk load time: {bulk_time:.4f} seconds")
+            
             # Test search
             search_time = self.test_search(size)
             self.results['search']['sizes'].append(size)
@@ -90,13 +133,25 @@ class PerformanceTest:
             self.results['range_search']['sizes'].append(size)
             self.results['range_search']['times'].append(range_time)
             print(f"Average range search time: {range_time:.4f} seconds")
+            
+            # Test deletion
+            delete_time = self.test_deletion(size)
+            self.results['delete']['sizes'].append(size)
+            self.results['delete']['times'].append(delete_time)
+            print(f"Deletion time: {delete_time:.4f} seconds")
+            
+            # Test range search on the price index
+            index_range_time = self.test_index_range_search(size)
+            self.results['index_range_search']['sizes'].append(size)
+            self.results['index_range_search']['times'].append(index_range_time)
+            print(f"Average price index range search time: {index_range_time:.4f} seconds")
 
     def plot_results(self):
         """Plot performance results"""
         plt.figure(figsize=(12, 8))
         
-        operations = ['insert', 'search', 'range_search']
-        markers = ['o', 's', '^']
+        operations = ['insert', 'search', 'range_search', 'index_range_search', 'bulk_load', 'delete']
+        markers = ['o', 's', '^', 'v', 'd', 'x']
         
         for op, marker in zip(operations, markers):
             plt.plot(
@@ -116,7 +171,7 @@ class PerformanceTest:
 
 def main():
     # Run performance tests
-    tester = PerformanceTest()
+    tester = PerformanceTest(seed=2025)
     tester.run_all_tests()
     tester.plot_results()
     
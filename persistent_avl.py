@@ -0,0 +1,277 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Persistent AVL Tree
+# Author: Unique Karanjit
+# Copy-on-write variant of the AVL tree whose versions can be read without locks while a writer updates it
+# ----------------------------------------------------------------------------------------------------------------------
+
+from heapq import merge as merge_sorted
+from operator import itemgetter
+
+from AVLTree import AVLNode, AVLTree, product_key
+
+
+def _node(price, products, left, right):
+    """
+    Creates a node with the given bucket and children and computes its height and counts.
+    Nodes of a persistent tree are never modified once they have been built.
+    """
+    node = AVLNode.__new__(AVLNode)
+    node.price = price
+    node.products = products
+    node.left = left
+    node.right = right
+    count = len(products)
+    height, size, total = 0, count, price * count
+    if left:
+        height, size, total = left.height, size + left.size, total + left.total
+    if right:
+        height = max(height, right.height)
+        size += right.size
+        total += right.total
+    node.height = height + 1
+    node.size = size
+    node.total = total
+    return node
+
+
+def _height(node):
+    return node.height if node else 0
+
+
+def _balanced(price, products, left, right):
+    """
+    Creates a node like _node, rotating (with new nodes) if its children's heights differ by two.
+    """
+    if _height(left) > _height(right) + 1:
+        if _height(left.left) >= _height(left.right):
+            return _node(left.price, left.products, left.left, _node(price, products, left.right, right))
+        pivot = left.right
+        return _node(pivot.price, pivot.products,
+                     _node(left.price, left.products, left.left, pivot.left),
+                     _node(price, products, pivot.right, right))
+    if _height(right) > _height(left) + 1:
+        if _height(right.right) >= _height(right.left):
+            return _node(right.price, right.products, _node(price, products, left, right.left), right.right)
+        pivot = right.left
+        return _node(pivot.price, pivot.products,
+                     _node(price, products, left, pivot.left),
+                     _node(right.price, right.products, pivot.right, right.right))
+    return _node(price, products, left, right)
+
+
+def _insert(node, price, key, product):
+    """
+    Returns a copy of the subtree with the product added, sharing every untouched subtree.
+    """
+    if node is None:
+        return _node(price, {key: product}, None, None)
+    if price < node.price:
+        return _balanced(node.price, node.products, _insert(node.left, price, key, product), node.right)
+    if price > node.price:
+        return _balanced(node.price, node.products, node.left, _insert(node.right, price, key, product))
+    products = dict(node.products)
+    products[key] = product
+    return _node(price, products, node.left, node.right)
+
+
+def _pop_min(node):
+    """
+    Returns the subtree's cheapest node and a copy of the subtree without it.
+    """
+    if node.left is None:
+        return node, node.right
+    smallest, left = _pop_min(node.left)
+    return smallest, _balanced(node.price, node.products, left, node.right)
+
+
+def _delete(node, price, key):
+    """
+    Returns a copy of the subtree without the product, or the subtree itself if the product
+    is not in it.
+    """
+    if node is None:
+        return None
+    if price < node.price:
+        left = _delete(node.left, price, key)
+        return node if left is node.left else _balanced(node.price, node.products, left, node.right)
+    if price > node.price:
+        right = _delete(node.right, price, key)
+        return node if right is node.right else _balanced(node.price, node.products, node.left, right)
+    if key not in node.products:
+        return node
+    if len(node.products) > 1:
+        products = dict(node.products)
+        del products[key]
+        return _node(price, products, node.left, node.right)
+    if node.left is None or node.right is None:
+        return node.left or node.right
+    successor, right = _pop_min(node.right)
+    return _balanced(successor.price, successor.products, node.left, right)
+
+
+class PersistentAVLTree(AVLTree):
+    """
+    A path-copying (persistent) variant of the AVLTree.
+
+    insert and delete never modify an existing node. They copy the O(log N) nodes on the path
+    to the change and return a new root that shares every other subtree with the previous
+    version, so every root ever returned stays a valid, immutable tree. The writer works on
+    root as with an AVLTree and calls publish() to make its current root the version that
+    readers see, with a single assignment. snapshot() pins the published version in O(1), and
+    the pinned tree can be scanned by any thread without locks for as long as it is needed,
+    no matter what the writer does meanwhile.
+
+    All query methods (iter_range, count_in_range, select, ...) are inherited unchanged.
+    """
+
+    def __init__(self, track_ids=False):
+        """
+        Initializes an empty persistent tree.
+
+        :param track_ids: If True, the tree keeps the price of every product ID, so products
+                          can be found or removed by ID alone (see price_of and remove).
+        """
+        super().__init__()
+        # Nodes are replaced on every update, so IDs map to prices rather than to nodes.
+        self._prices = {} if track_ids else None
+        self.published = None  # The root readers see, see publish().
+
+    def publish(self):
+        """
+        Makes the current root the version returned by snapshot().
+        """
+        self.published = self.root
+
+    def snapshot(self):
+        """
+        Returns a tree pinned to the published version in O(1).
+
+        The snapshot shares its nodes with this tree and never changes. Updating the snapshot
+        itself is allowed and only creates new versions of the snapshot.
+        """
+        version = PersistentAVLTree()
+        version.root = self.published
+        return version
+
+    def insert(self, root, price, product, product_id=None):
+        """
+        Returns a new version of the tree rooted at root with the product added (or replacing
+        the product with the same ID at this price). root itself is left unchanged.
+
+        :param root: The root of the version to update.
+        :param price: The price of the product (used as the key).
+        :param product: The product to be inserted.
+        :param product_id: The product's ID (taken from product['id'] if None).
+        :return: The root of the new version.
+        """
+        key = product_key(product, product_id)
+        new_root = _insert(root, price, key, product)
+        if self._prices is not None:
+            self._prices[key] = price
+        return new_root
+
+    def delete(self, root, price, product_id=None):
+        """
+        Returns a new version of the tree rooted at root without the product. root itself is
+        left unchanged.
+
+        :param root: The root of the version to update.
+        :param price: The price of the product to delete.
+        :param product_id: The ID of the product to delete. If None, the product that was
+                           added first at this price is deleted.
+        :return: The root of the new version (root itself if the product was not found).
+        """
+        if product_id is None:
+            node = root
+            while node and node.price != price:
+                node = node.left if price < node.price else node.right
+            if node is None:
+                return root
+            product_id = next(iter(node.products))
+        new_root = _delete(root, price, product_id)
+        if new_root is not root and self._prices is not None:
+            self._prices.pop(product_id, None)
+        return new_root
+
+    def merge(self, items, presorted=False):
+        """
+        Adds a batch of (price, product) pairs. Large batches build a new balanced version
+        from the current products and the batch in O(N + M) instead of copying a path per item.
+
+        :param items: An iterable of (price, product) pairs.
+        :param presorted: Set to True if the items are already sorted by price.
+        """
+        items = items if presorted else sorted(items, key=itemgetter(0))
+        if not isinstance(items, (list, tuple)):
+            items = list(items)
+        height = self.root.height if self.root else 0
+        if self.root and len(items) * height < 2 * (len(self) + len(items)):
+            for price, product in items:
+                self.root = self.insert(self.root, price, product)
+            return
+        existing = ((node.price, key, product) for node in self._iter_nodes() for key, product in node.products.items())
+        added = ((price, product_key(product), product) for price, product in items)
+        self._rebuild(merge_sorted(existing, added, key=itemgetter(0)))
+
+    def delete_many(self, items):
+        """
+        Deletes a batch of products, given as (price, product_id) pairs.
+
+        :param items: An iterable of (price, product_id) pairs.
+        :return: The number of products that were deleted.
+        """
+        before = len(self)
+        for price, product_id in items:
+            self.root = self.delete(self.root, price, product_id)
+        return before - len(self)
+
+    def _rebuild(self, entries):
+        """
+        Replaces root with a new perfectly balanced version holding the (price, key, product)
+        entries, which must be sorted by price. Existing nodes are not reused.
+        """
+        nodes = []
+        for price, key, product in entries:
+            if not nodes or nodes[-1].price != price:
+                nodes.append(AVLNode(price, product, key))
+            else:
+                nodes[-1].products[key] = product
+            if self._prices is not None:
+                self._prices[key] = price
+        self.root = self._build_balanced(nodes)
+
+    def node_for(self, product_id):
+        """
+        Returns the node holding a product in the current version in O(log N), or None.
+        Requires the tree to track IDs.
+        """
+        if self._prices is None:
+            raise ValueError("The tree does not track product IDs")
+        price = self._prices.get(product_id)
+        node = self.root
+        while node and price is not None:
+            if price == node.price:
+                return node
+            node = node.left if price < node.price else node.right
+        return None
+
+    def price_of(self, product_id):
+        """
+        Returns the price a product is stored under, or None if it is not in the tree (or
+        the tree does not track IDs).
+        """
+        return self._prices.get(product_id) if self._prices is not None else None
+
+    def remove(self, product_id):
+        """
+        Removes a product by ID alone. Requires the tree to track IDs.
+
+        :return: True if the product was removed, False if it was not in the tree.
+        """
+        if self._prices is None:
+            raise ValueError("The tree does not track product IDs")
+        price = self._prices.get(product_id)
+        if price is None:
+            return False
+        self.root = self.delete(self.root, price, product_id)
+        return True
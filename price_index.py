@@ -0,0 +1,369 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Columnar Price Index
+# Author: Unique Karanjit
+# Read-optimized alternative to the AVL tree for price range queries and price analytics
+# ----------------------------------------------------------------------------------------------------------------------
+
+import numpy as np
+
+from AVLTree import product_key
+from product import PRODUCT_TYPES
+
+
+class PriceIndex:
+    """
+    A price index that keeps prices and row ids in sorted NumPy arrays.
+
+    Every product gets a row id when it is added. The index holds the prices sorted in
+    ascending order together with the matching row ids (products sharing a price keep their
+    insertion order), so a range query is two binary searches with numpy.searchsorted followed
+    by a slice, and aggregates such as counts, sums, histograms and percentiles run as
+    vectorized NumPy operations instead of a node-by-node tree walk.
+
+    Inserts and deletes are buffered and merged into the sorted arrays in batches, either
+    once batch_size changes are pending or before the next query, so a burst of writes costs
+    one O(N + k log k) merge instead of k array shifts.
+
+    The query methods mirror AVLTree (find_products_in_range, iter_range, count_in_range,
+    sum_in_range, find_cheapest, find_most_expensive, get_sorted_products), so the index can
+    be used wherever the tree serves price range queries.
+    """
+
+    def __init__(self, batch_size=1024):
+        """
+        Initializes an empty price index.
+
+        :param batch_size: The number of buffered inserts and deletes that triggers a merge.
+        """
+        if batch_size <= 0:
+            raise ValueError("Batch size must be positive")
+        self.batch_size = batch_size
+
+        self._prices = np.empty(0, dtype=np.float64)  # Sorted prices.
+        self._row_ids = np.empty(0, dtype=np.int64)  # Row id of each sorted price.
+
+        # Row storage, indexed by row id. Deleted rows are set to None until compaction.
+        self._rows = []  # The products.
+        self._row_prices = []  # The price each product was indexed under.
+        self._row_codes = []  # The product name's code, used by the vectorized filters.
+        self._row_of = {}  # Product key -> row id.
+        self._dead = 0  # Number of deleted rows still occupying row storage.
+
+        self._name_codes = {}  # Product name -> code.
+        self._code_array = None  # Cached NumPy copy of _row_codes.
+
+        self._pending_inserts = {}  # Row id -> price, waiting to be merged.
+        self._pending_deletes = set()  # Row ids waiting to be removed from the arrays.
+
+    @classmethod
+    def from_items(cls, items, batch_size=1024):
+        """
+        Builds an index from (price, product) pairs with a single vectorized sort.
+
+        :param items: An iterable of (price, product) pairs.
+        :param batch_size: The batch size of the new index.
+        :return: A new PriceIndex.
+        """
+        index = cls(batch_size)
+        for price, product in items:
+            key = product_key(product)
+            replaced = index._row_of.get(key)
+            if replaced is not None:
+                index._rows[replaced] = None
+                index._dead += 1
+            index._add_row(price, product, key)
+        prices = np.asarray(index._row_prices, dtype=np.float64)
+        order = np.argsort(prices, kind='stable')
+        if index._dead:
+            alive = np.fromiter((row is not None for row in index._rows), dtype=bool, count=len(index._rows))
+            order = order[alive[order]]
+        index._prices = prices[order]
+        index._row_ids = order.astype(np.int64)
+        return index
+
+    def insert(self, price, product, product_id=None):
+        """
+        Adds a product to the index. The change is buffered until the next merge.
+
+        Inserting a product whose ID is already indexed replaces the old entry, which lets
+        a price change be recorded with a single insert.
+
+        :param price: The product's price.
+        :param product: The product (a product dictionary, a Product record or just its name).
+        :param product_id: The product's ID (derived from the product if None).
+        """
+        key = product_key(product, product_id)
+        if key in self._row_of:
+            self.delete(key)
+        row = self._add_row(price, product, key)
+        self._pending_inserts[row] = price
+        self._maybe_flush()
+
+    def delete(self, product_id):
+        """
+        Removes a product from the index. The change is buffered until the next merge.
+
+        :param product_id: The ID of the product to remove.
+        :return: True if the product was indexed, False otherwise.
+        """
+        row = self._row_of.pop(product_id, None)
+        if row is None:
+            return False
+        self._rows[row] = None
+        self._dead += 1
+        if self._pending_inserts.pop(row, None) is None:
+            self._pending_deletes.add(row)
+        self._maybe_flush()
+        return True
+
+    def __len__(self):
+        """
+        Returns the number of indexed products, including buffered changes.
+        """
+        return len(self._row_of)
+
+    def __contains__(self, product_id):
+        return product_id in self._row_of
+
+    def _add_row(self, price, product, key=None):
+        """
+        Appends a product to row storage and returns its row id.
+        """
+        if key is None:
+            key = product_key(product)
+        name = product['name'] if isinstance(product, PRODUCT_TYPES) else product
+        code = self._name_codes.setdefault(name, len(self._name_codes))
+
+        row = len(self._rows)
+        self._rows.append(product)
+        self._row_prices.append(price)
+        self._row_codes.append(code)
+        self._row_of[key] = row
+        self._code_array = None
+        return row
+
+    def _maybe_flush(self):
+        """
+        Merges the buffered changes once batch_size of them are pending.
+        """
+        if len(self._pending_inserts) + len(self._pending_deletes) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Merges the buffered inserts and deletes into the sorted arrays.
+        """
+        if self._pending_deletes:
+            deleted = np.fromiter(self._pending_deletes, dtype=np.int64, count=len(self._pending_deletes))
+            keep = ~np.isin(self._row_ids, deleted)
+            self._prices = self._prices[keep]
+            self._row_ids = self._row_ids[keep]
+            self._pending_deletes.clear()
+
+        if self._pending_inserts:
+            count = len(self._pending_inserts)
+            rows = np.fromiter(self._pending_inserts.keys(), dtype=np.int64, count=count)
+            prices = np.fromiter(self._pending_inserts.values(), dtype=np.float64, count=count)
+            order = np.argsort(prices, kind='stable')
+            rows, prices = rows[order], prices[order]
+            # New rows have the highest row ids, so inserting them after any equal prices
+            # keeps products sharing a price in insertion order.
+            positions = np.searchsorted(self._prices, prices, side='right')
+            self._prices = np.insert(self._prices, positions, prices)
+            self._row_ids = np.insert(self._row_ids, positions, rows)
+            self._pending_inserts.clear()
+
+        if self._dead > 1024 and self._dead * 2 > len(self._rows):
+            self._compact()
+
+    def _compact(self):
+        """
+        Drops deleted rows from row storage and renumbers the remaining ones.
+        Must only be called when no changes are buffered.
+        """
+        alive = np.fromiter((row is not None for row in self._rows), dtype=bool, count=len(self._rows))
+        new_ids = np.cumsum(alive) - 1
+        self._row_ids = new_ids[self._row_ids]
+
+        self._rows = [row for row in self._rows if row is not None]
+        self._row_prices = [price for price, keep in zip(self._row_prices, alive) if keep]
+        self._row_codes = [code for code, keep in zip(self._row_codes, alive) if keep]
+        self._row_of = {key: int(new_ids[row]) for key, row in self._row_of.items()}
+        self._code_array = None
+        self._dead = 0
+
+    def _range_slice(self, min_price, max_price):
+        """
+        Returns the [lo, hi) positions of the prices between min_price and max_price.
+        """
+        self.flush()
+        if max_price < min_price:
+            return 0, 0
+        lo = int(np.searchsorted(self._prices, min_price, side='left'))
+        hi = int(np.searchsorted(self._prices, max_price, side='right'))
+        return lo, max(lo, hi)
+
+    def _entry(self, price, product):
+        """
+        Builds a product summary in the same form as the summaries returned by AVLTree.
+        """
+        if not isinstance(product, PRODUCT_TYPES):
+            return {'name': product, 'price': price}
+        entry = {'name': product['name'], 'price': price}
+        if product.get('id'):
+            entry['id'] = product['id']
+        return entry
+
+    def _entries(self, positions):
+        """
+        Returns an iterator over the product summaries for positions in the sorted arrays.
+
+        :param positions: A slice or an array of positions.
+
+        The prices and products are read when this is called, not as the summaries are
+        consumed, so they stay consistent even if the index is modified (and merged or
+        compacted) in the meantime.
+        """
+        prices = self._prices[positions].tolist()
+        rows = self._rows
+        products = [rows[row] for row in self._row_ids[positions].tolist()]
+        entry = self._entry
+        return (entry(price, product) for price, product in zip(prices, products) if product is not None)
+
+    def iter_range(self, min_price, max_price, descending=False, limit=None, offset=0):
+        """
+        Lazily yields the products priced between min_price and max_price (inclusive).
+
+        :param min_price: The lowest price to include.
+        :param max_price: The highest price to include.
+        :param descending: If True, the most expensive products come first.
+        :param limit: The maximum number of products to yield (None for no limit).
+        :param offset: The number of matching products to skip first.
+        """
+        lo, hi = self._range_slice(min_price, max_price)
+        if descending:
+            stop = hi - offset
+            start = lo if limit is None else max(lo, stop - limit)
+            positions = slice(start, max(start, stop))
+        else:
+            start = lo + offset
+            stop = hi if limit is None else min(hi, start + limit)
+            positions = slice(start, max(start, stop))
+        entries = self._entries(positions)
+        if descending:
+            entries = reversed(list(entries))
+        yield from entries
+
+    def find_products_in_range(self, min_price, max_price):
+        """
+        Find all products within a given price range.
+        Returns a list of products with their names and prices.
+        """
+        return list(self.iter_range(min_price, max_price))
+
+    def get_sorted_products(self, descending=False):
+        """
+        Yields every product ordered by price.
+
+        :param descending: If True, the most expensive products come first.
+        """
+        return self.iter_range(float('-inf'), float('inf'), descending=descending)
+
+    def find_cheapest(self):
+        """
+        Returns the cheapest product, or None if the index is empty.
+        """
+        self.flush()
+        return next(self._entries(slice(0, 1)), None)
+
+    def find_most_expensive(self):
+        """
+        Returns the most expensive product, or None if the index is empty.
+        """
+        self.flush()
+        return next(self._entries(slice(-1, None)), None)
+
+    def count_in_range(self, min_price, max_price):
+        """
+        Returns the number of products priced between min_price and max_price (inclusive).
+        """
+        lo, hi = self._range_slice(min_price, max_price)
+        return hi - lo
+
+    def sum_in_range(self, min_price, max_price):
+        """
+        Returns the sum of the prices of the products priced between min_price and max_price
+        (inclusive).
+        """
+        lo, hi = self._range_slice(min_price, max_price)
+        return float(self._prices[lo:hi].sum())
+
+    def histogram(self, bins=10, min_price=None, max_price=None):
+        """
+        Counts the products per price bucket.
+
+        :param bins: The number of equal-width buckets, or a sequence of bucket edges.
+        :param min_price: The lower bound of the histogram (the cheapest price if None).
+        :param max_price: The upper bound of the histogram (the highest price if None).
+        :return: A (counts, edges) pair of NumPy arrays, as returned by numpy.histogram.
+        """
+        lo, hi = self._range_slice(
+            float('-inf') if min_price is None else min_price,
+            float('inf') if max_price is None else max_price,
+        )
+        prices = self._prices[lo:hi]
+        price_range = None
+        if min_price is not None and max_price is not None:
+            price_range = (min_price, max_price)
+        return np.histogram(prices, bins=bins, range=price_range)
+
+    def percentile(self, q):
+        """
+        Returns the price at the given percentile(s), interpolating between neighbours.
+
+        :param q: A percentile between 0 and 100, or a sequence of them.
+        :return: A float, or a NumPy array when q is a sequence.
+        :raises ValueError: If the index is empty.
+        """
+        self.flush()
+        if not len(self._prices):
+            raise ValueError("Price index is empty")
+        result = np.percentile(self._prices, q)
+        return float(result) if np.ndim(result) == 0 else result
+
+    def median(self):
+        """
+        Returns the median price, or None if the index is empty.
+        """
+        self.flush()
+        if not len(self._prices):
+            return None
+        return self.percentile(50)
+
+    def filter(self, min_price=None, max_price=None, names=None, limit=None):
+        """
+        Returns the products matching all the given conditions, in ascending price order.
+
+        The price bounds are resolved with binary searches and the name condition with a
+        vectorized membership test over the matching slice.
+
+        :param min_price: The lowest price to include (no lower bound if None).
+        :param max_price: The highest price to include (no upper bound if None).
+        :param names: A collection of product names to keep (all names if None).
+        :param limit: The maximum number of products to return (None for no limit).
+        :return: A list of product summaries.
+        """
+        lo, hi = self._range_slice(
+            float('-inf') if min_price is None else min_price,
+            float('inf') if max_price is None else max_price,
+        )
+        positions = np.arange(lo, hi)
+        if names is not None:
+            codes = [self._name_codes[name] for name in names if name in self._name_codes]
+            if self._code_array is None:
+                self._code_array = np.asarray(self._row_codes, dtype=np.int64)
+            row_codes = self._code_array[self._row_ids[lo:hi]]
+            positions = positions[np.isin(row_codes, codes)]
+        if limit is not None:
+            positions = positions[:limit]
+        return list(self._entries(positions))
@@ -0,0 +1,122 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Compact Product Record
+# Author: Unique Karanjit
+# Shared by the hash table, the AVL tree and the utilities as a memory-efficient alternative to product dictionaries
+# ----------------------------------------------------------------------------------------------------------------------
+
+import math
+
+
+class Product:
+    """
+    A product record stored in ``__slots__`` instead of a per-instance dictionary.
+
+    A Product takes a fraction of the memory of the equivalent ``{"id", "name", "price"}``
+    dictionary. It supports the dictionary-style access used throughout the project
+    (``product['price']``, ``product.get('id')``, ``'name' in product``), so it can be stored
+    in the HashTable and the AVLTree wherever a product dictionary is accepted.
+    """
+
+    __slots__ = ('id', 'name', 'price')
+    FIELDS = ('id', 'name', 'price')
+
+    def __init__(self, id=None, name=None, price=None):
+        """
+        Initializes a product record.
+
+        :param id: The product ID.
+        :param name: The product name.
+        :param price: The product price.
+        """
+        self.id = id
+        self.name = name
+        self.price = price
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a record from a product dictionary.
+
+        :param data: A dictionary with 'id', 'name' and 'price' keys (missing keys become None).
+        :return: A new Product.
+        """
+        return cls(data.get('id'), data.get('name'), data.get('price'))
+
+    def to_dict(self):
+        """
+        Returns the record as a plain product dictionary.
+        """
+        return {'id': self.id, 'name': self.name, 'price': self.price}
+
+    def __getitem__(self, field):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        setattr(self, field, value)
+
+    def __contains__(self, field):
+        return field in self.FIELDS
+
+    def get(self, field, default=None):
+        """
+        Returns a field's value, or default if the field is unknown or unset.
+        """
+        if field not in self.FIELDS:
+            return default
+        value = getattr(self, field)
+        return default if value is None else value
+
+    def keys(self):
+        """
+        Returns the field names, mirroring dict.keys().
+        """
+        return self.FIELDS
+
+    def __eq__(self, other):
+        if isinstance(other, Product):
+            return (self.id, self.name, self.price) == (other.id, other.name, other.price)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None  # Records are mutable, like the dictionaries they replace.
+
+    def __repr__(self):
+        return f"Product(id={self.id!r}, name={self.name!r}, price={self.price!r})"
+
+
+# The product representations accepted by the data structures.
+PRODUCT_TYPES = (dict, Product)
+
+
+def is_valid_price(price):
+    """
+    Returns True if price is a finite, positive number. NaN and infinity are rejected: NaN
+    compares false with every price, so it could not be kept in price order.
+    """
+    return isinstance(price, (int, float)) and math.isfinite(price) and price > 0
+
+
+def product_error(product):
+    """
+    Returns the reason a product cannot be stored, or None if it can. The ID (when given)
+    and the name must be strings, since both are used as index keys and are saved to disk.
+    The reasons are the ones bulk_upsert counts its rejections under.
+    """
+    if not isinstance(product, PRODUCT_TYPES):
+        return "not a product"
+    product_id = product.get('id')
+    if product_id is not None and not isinstance(product_id, str):
+        return "invalid id"
+    name = product.get('name')
+    if not name:
+        return "missing name"
+    if not isinstance(name, str):
+        return "invalid name"
+    if not is_valid_price(product.get('price')):
+        return "invalid price"
+    return None
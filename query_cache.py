@@ -0,0 +1,194 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Query Result Cache
+# Author: Unique Karanjit
+# Bounded LRU/TTL cache of price range and ID prefix query results with precise invalidation
+# ----------------------------------------------------------------------------------------------------------------------
+
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+def _estimate_size(value):
+    """
+    Estimates the memory held by a cached result: the container, each item and each item's
+    fields. Strings and numbers shared with the stored products are counted too, so the
+    estimate errs on the high side.
+    """
+    items = value if isinstance(value, (list, tuple)) else (value,)
+    size = sys.getsizeof(value) if items is value else 0
+    for item in items:
+        size += sys.getsizeof(item)
+        if hasattr(item, 'keys'):
+            size += sum(sys.getsizeof(item[field]) for field in item.keys())
+    return size
+
+
+class QueryCache:
+    """
+    A bounded cache of query results, evicting the least recently used entry first.
+
+    Entries are limited both by count (max_entries) and by estimated memory (max_bytes), and
+    may expire ttl seconds after they were stored. Each entry records what it depends on: a
+    price range or an ID prefix. A change to a product then invalidates only the ranges that
+    contain its old or new price and the prefixes its ID starts with; every other entry stays
+    valid. Prefix invalidation costs O(length of the ID) and range invalidation O(R log M)
+    for R cached ranges and M changed prices.
+
+    The cache has its own lock, so it can be shared by the reader threads of a
+    ConcurrentInventory. With persistent=True, though, a ConcurrentInventory answers range
+    queries lock-free from a pinned tree version and bypasses the cache for them: a result
+    computed from an older version could be stored after a writer had already invalidated
+    its range. Only its partial ID lookups are cached then.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=None):
+        """
+        Initializes an empty cache.
+
+        :param max_entries: The maximum number of cached results.
+        :param max_bytes: The maximum estimated memory of all cached results.
+        :param ttl: The number of seconds a result stays valid (None for no expiry).
+        """
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("The cache needs room for at least one entry")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # Key -> (result, size, expiry time), least recently used first.
+        self._ranges = {}  # Key -> (min_price, max_price) of a range entry.
+        self._prefixes = {}  # Lowercased prefix -> keys of the prefix entries it matches.
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # Entries dropped to stay within max_entries or max_bytes.
+        self.expirations = 0  # Entries dropped because their TTL ran out.
+        self.invalidations = 0  # Entries dropped because a product they depend on changed.
+
+    def get(self, key, default=None):
+        """
+        Returns a cached result and marks it as recently used, or default on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put_range(self, key, min_price, max_price, result):
+        """
+        Caches the result of a query that depends on the products priced between min_price
+        and max_price (inclusive).
+        """
+        with self._lock:
+            if self._store(key, result):
+                self._ranges[key] = (min_price, max_price)
+
+    def put_prefix(self, prefix, result):
+        """
+        Caches the result of a query that depends on the products whose IDs start with prefix.
+        The prefix itself is the key. Changes are matched without regard to case, so prefixes
+        that differ only in case are invalidated together.
+        """
+        with self._lock:
+            if self._store(prefix, result):
+                self._prefixes.setdefault(prefix.lower(), set()).add(prefix)
+
+    def invalidate(self, product_ids=(), prices=()):
+        """
+        Drops the entries affected by changes to some products.
+
+        :param product_ids: The IDs of the changed products.
+        :param prices: Every price the changed products had before or have after the change.
+        :return: The number of entries dropped.
+        """
+        with self._lock:
+            if not self._entries:
+                return 0
+            doomed = set()
+            if self._prefixes:
+                for product_id in product_ids:
+                    product_id = str(product_id).lower()
+                    for end in range(1, len(product_id) + 1):
+                        doomed.update(self._prefixes.get(product_id[:end], ()))
+            if self._ranges:
+                prices = sorted(price for price in prices if isinstance(price, (int, float)))
+                for key, (min_price, max_price) in self._ranges.items():
+                    index = bisect_left(prices, min_price)
+                    if index < len(prices) and prices[index] <= max_price:
+                        doomed.add(key)
+            for key in doomed:
+                self._remove(key)
+            self.invalidations += len(doomed)
+            return len(doomed)
+
+    def clear(self):
+        """
+        Drops every entry. The counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._ranges.clear()
+            self._prefixes.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        """
+        Returns the counters and the current size as a dictionary.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key, result):
+        """
+        Adds or replaces an entry, then evicts least recently used entries until the cache
+        fits again. A result larger than max_bytes on its own is not cached.
+
+        :return: True if the entry was stored.
+        """
+        size = _estimate_size(result)
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return False
+        expiry = None if self.ttl is None else time.monotonic() + self.ttl
+        self._entries[key] = (result, size, expiry)
+        self.size_bytes += size
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return True
+
+    def _remove(self, key):
+        """
+        Removes an entry and its dependency record.
+        """
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+        if self._ranges.pop(key, None) is None and isinstance(key, str):
+            keys = self._prefixes.get(key.lower())
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._prefixes[key.lower()]
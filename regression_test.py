@@ -1,8 +1,28 @@
 import unittest
 from AVLTree import AVLTree
-from hashtable import HashTable
-from utils import generate_random_inventory, initialize_inventory
+from hashtable import HashTable, OpenAddressingHashTable
+from utils import generate_random_inventory, initialize_inventory, iter_random_inventory, bulk_upsert, bulk_delete
+import uuid
+from product import Product
+from AVLTree import AVLNode
+from persistent_avl import PersistentAVLTree
+from price_index import PriceIndex
+from inventory import Inventory, ConcurrentInventory
+from rwlock import ReadWriteLock
+import threading
+import asyncio
+import json
+from server import InventoryServer
+from loadgen import run_local
+from sharded import ShardedInventory, shard_of
+from query_cache import QueryCache
+import time
+from wal import WriteAheadLog, read_log
+from snapshot import write_snapshot, read_snapshot, _HEADER, _aligned
+from inventory_io import import_csv, import_jsonl, export_csv, export_jsonl
 import random
+import os
+import tempfile
 
 class RegressionTest(unittest.TestCase):
     def setUp(self):
@@ -147,20 +167,23 @@ class RegressionTest(unittest.TestCase):
 
     def test_data_consistency(self):
         """Test consistency between hash table and AVL tree"""
+        store = Inventory()
         test_product = {"id": "TEST001", "name": "Test Product", "price": 999.99}
         
         # Insert in both structures
-        self.hashTable.insert(test_product["id"], test_product)
-        self.avlTree.root = self.avlTree.insert(self.avlTree.root, test_product["price"], test_product)
+        store.insert(test_product)
         
         # Verify retrieval
-        hash_result = self.hashTable.find_by_partial_id("TEST001")
+        hash_result = store.find_by_partial_id("TEST001")
         self.assertIsNotNone(hash_result, "Should retrieve from hash table")
         self.assertEqual(hash_result["price"], test_product["price"])
+        self.assertEqual(store.find_products_in_range(999.99, 999.99)[0]["id"], "TEST001")
         
         # Test deletion
-        self.assertTrue(self.hashTable.delete("TEST001"), "Should successfully delete from hash table")
-        self.assertTrue(self.avlTree.is_balanced(), "Tree should remain balanced after operations")
+        self.assertTrue(store.delete("TEST001"), "Should successfully delete from both structures")
+        self.assertIsNone(store.get("TEST001"))
+        self.assertEqual(store.find_products_in_range(0.00, 2000.00), [], "Tree should no longer hold the product")
+        self.assertTrue(store.is_consistent(), "Tree should remain balanced after operations")
 
     def test_id_collisions(self):
         """Test handling of similar IDs"""
@@ -183,5 +206,1008 @@ class RegressionTest(unittest.TestCase):
         self.assertIsNotNone(exact_result, "Should find exact ID match")
         self.assertEqual(exact_result["price"], 1000.00)
 
+    def test_hash_table_resizing(self):
+        """Test that the hash table grows and shrinks while keeping every key reachable"""
+        table = HashTable(size=8, max_load_factor=1.0, min_load_factor=0.25, rehash_step=1)
+        for i in range(200):
+            table.insert(f"R{i:04d}", {"id": f"R{i:04d}", "name": "Resize", "price": float(i + 1)})
+            # Every key inserted so far must be visible, even mid-migration
+            self.assertIsNotNone(table.get(f"R{i // 2:04d}"))
+        self.assertGreater(table.size, 8, "Table should grow past its initial size")
+        self.assertEqual(len(table.items()), 200)
+
+        for i in range(190):
+            self.assertTrue(table.delete(f"R{i:04d}"))
+        for i in range(190, 200):
+            self.assertIsNotNone(table.get(f"R{i:04d}"), "Remaining keys should survive shrinking")
+        self.assertEqual(len(table.items()), 10)
+        self.assertLessEqual(table.load_factor(), 1.0)
+
+        with self.assertRaises(ValueError):
+            HashTable(size=8, max_load_factor=1.0, min_load_factor=0.6)
+
+    def test_prefix_index(self):
+        """Test that prefix lookups stay in sync with inserts and deletes"""
+        for i in range(50):
+            self.hashTable.insert(f"AB{i:03d}", {"id": f"AB{i:03d}", "name": "Prefix", "price": 10.00})
+        self.hashTable.insert("XY001", {"id": "XY001", "name": "Other", "price": 20.00})
+
+        self.assertEqual(len(self.hashTable.find_by_prefix("ab")), 50, "Prefix search is case-insensitive")
+        self.assertEqual(len(self.hashTable.find_by_prefix("AB04")), 10)
+        self.assertEqual(len(self.hashTable.find_by_prefix("ab", limit=2)), 2)
+        self.assertEqual(self.hashTable.find_by_prefix("xy")[0]["name"], "Other")
+
+        self.hashTable.delete("XY001")
+        self.assertEqual(self.hashTable.find_by_prefix("xy"), [], "Deleted keys leave the prefix index")
+        self.assertIsNone(self.hashTable.find_by_partial_id("ab04"), "Ambiguous prefix should return None")
+        self.assertEqual(self.hashTable.find_by_partial_id("ab049")["id"], "AB049")
+
+    def test_hash_table_length(self):
+        """Test the live element count and emptiness of the hash table"""
+        self.assertEqual(len(self.hashTable), 0)
+        self.assertFalse(self.hashTable)
+        self.hashTable.insert("LEN001", {"id": "LEN001", "name": "Count", "price": 5.00})
+        self.hashTable.insert("LEN001", {"id": "LEN001", "name": "Count", "price": 6.00})
+        self.hashTable.insert("LEN002", {"id": "LEN002", "name": "Count", "price": 7.00})
+        self.assertEqual(len(self.hashTable), 2, "Updating an existing key should not change the count")
+        self.assertTrue(self.hashTable)
+        self.hashTable.delete("LEN001")
+        self.hashTable.delete("LEN001")
+        self.assertEqual(len(self.hashTable), 1)
+
+    def test_open_addressing_backend(self):
+        """Test the open addressing backend against the same API as the chaining table"""
+        table = HashTable(size=8, backend="open_addressing", rehash_step=1)
+        self.assertIsInstance(table, OpenAddressingHashTable)
+        for i in range(300):
+            table.insert(f"OA{i:04d}", {"id": f"OA{i:04d}", "name": "Open", "price": float(i + 1)})
+        for i in range(0, 300, 2):
+            self.assertTrue(table.delete(f"OA{i:04d}"))
+        self.assertFalse(table.delete("OA0000"), "Deleting twice should fail")
+
+        # Tombstones must not hide keys further along the probe sequence
+        for i in range(1, 300, 2):
+            self.assertEqual(table.get(f"OA{i:04d}")["price"], float(i + 1))
+        table.insert("OA0001", {"id": "OA0001", "name": "Updated", "price": 9.99})
+        self.assertEqual(len(table), 150)
+        self.assertEqual(len(table.items()), 150)
+        self.assertEqual(table.find_by_partial_id("oa0001")["name"], "Updated")
+
+        with self.assertRaises(ValueError):
+            HashTable(backend="unknown")
+
+    def test_hash_table_collisions(self):
+        """Test a collision-heavy table and non-string keys"""
+        table = HashTable(size=2, max_load_factor=1000)
+        for i in range(100):
+            table.insert(f"COL{i:03d}", {"id": f"COL{i:03d}", "name": "Collide", "price": float(i + 1)})
+        # Equal but non-identical key objects must still match
+        self.assertEqual(table.get("".join(["COL", "042"]))["price"], 43.0)
+        self.assertTrue(table.delete("COL042"))
+        self.assertIsNone(table.get("COL042"))
+        self.assertEqual(table.get("COL043")["price"], 44.0)
+        self.assertEqual(len(table.items()), 99)
+
+        table.insert(0, {"id": 0, "name": "Zero", "price": 1.00})
+        self.assertEqual(table.get(0)["name"], "Zero", "Falsy non-string keys are valid")
+        with self.assertRaises(ValueError):
+            table.insert("", {"name": "Empty", "price": 1.00})
+
+    def test_avl_bulk_insert_and_range(self):
+        """Test iterative insertion with sorted and duplicate prices"""
+        for price in range(1, 2001):
+            self.avlTree.root = self.avlTree.insert(self.avlTree.root, float(price), f"Item {price}")
+        for price in (5.0, 5.0, 1000.0):
+            self.avlTree.root = self.avlTree.insert(self.avlTree.root, price, "Duplicate")
+        self.assertTrue(self.avlTree.is_balanced(), "Sorted insertions should keep the tree balanced")
+        self.assertLessEqual(self.avlTree.root.height, 16, "Height should stay logarithmic")
+
+        products = self.avlTree.find_products_in_range(4.0, 6.0)
+        self.assertEqual([p["price"] for p in products], [4.0, 5.0, 5.0, 5.0, 6.0])
+        self.assertEqual(len(self.avlTree.find_products_in_range(0.0, 3000.0)), 2003)
+        self.assertEqual(self.avlTree.find_products_in_range(2500.0, 3000.0), [])
+
+    def test_avl_delete_and_extremes(self):
+        """Test deletion, cheapest/most expensive lookups and sorted output"""
+        self.assertIsNone(self.avlTree.find_cheapest())
+        prices = [500.00, 1500.00, 2000.00, 2500.00, 300.00, 800.00, 1200.00]
+        for price in prices:
+            self.avlTree.root = self.avlTree.insert(self.avlTree.root, price, f"Item {price:.0f}")
+
+        self.assertEqual(self.avlTree.find_cheapest(), {"name": "Item 300", "price": 300.00})
+        self.assertEqual(self.avlTree.find_most_expensive()["price"], 2500.00)
+
+        # Delete the extremes and a node with two children
+        for price in (300.00, 2500.00, 1500.00):
+            self.avlTree.root = self.avlTree.delete(self.avlTree.root, price)
+            self.assertTrue(self.avlTree.is_balanced(), "Tree should remain balanced after deletion")
+        self.avlTree.root = self.avlTree.delete(self.avlTree.root, 9999.00)  # Missing price is a no-op
+
+        self.assertEqual(self.avlTree.find_cheapest()["price"], 500.00)
+        self.assertEqual(self.avlTree.find_most_expensive()["price"], 2000.00)
+        ascending = [p["price"] for p in self.avlTree.get_sorted_products()]
+        descending = [p["price"] for p in self.avlTree.get_sorted_products(descending=True)]
+        self.assertEqual(ascending, [500.00, 800.00, 1200.00, 2000.00])
+        self.assertEqual(descending, ascending[::-1])
+
+    def test_avl_duplicate_prices(self):
+        """Test that products sharing a price are kept apart and deleted exactly"""
+        for i in range(100):
+            product = {"id": f"DUP{i:03d}", "name": f"Same Price {i}", "price": 99.99}
+            self.avlTree.root = self.avlTree.insert(self.avlTree.root, product["price"], product)
+        self.avlTree.root = self.avlTree.insert(self.avlTree.root, 10.00, {"id": "LOW", "name": "Low", "price": 10.00})
+        self.assertEqual(self.avlTree.root.height, 2, "Height should depend on distinct prices only")
+
+        self.avlTree.root = self.avlTree.delete(self.avlTree.root, 99.99, "DUP042")
+        remaining = [p["id"] for p in self.avlTree.find_products_in_range(99.99, 99.99)]
+        self.assertEqual(len(remaining), 99)
+        self.assertNotIn("DUP042", remaining, "Exactly the requested product should be deleted")
+
+        # An unknown ID at an existing price leaves the tree untouched
+        self.avlTree.root = self.avlTree.delete(self.avlTree.root, 99.99, "MISSING")
+        self.assertEqual(len(self.avlTree.find_products_in_range(0.00, 100.00)), 100)
+        self.assertEqual(self.avlTree.find_cheapest()["id"], "LOW")
+
+    def test_avl_bulk_load(self):
+        """Test building the AVL tree from a batch and merging further batches"""
+        items = [(float(price % 97 + 1), {"id": f"BULK{price}", "name": "Bulk", "price": float(price % 97 + 1)})
+                 for price in range(1000)]
+        tree = AVLTree.from_items(items)
+        self.assertTrue(tree.is_balanced(), "Bulk-built tree should be balanced")
+        self.assertEqual(len(tree.find_products_in_range(0.0, 100.0)), 1000)
+        self.assertEqual(tree.find_cheapest()["price"], 1.0)
+
+        # Small batches are inserted, large ones merged; both must keep every product
+        tree.merge([(500.0, {"id": "SMALL", "name": "Small", "price": 500.0})])
+        tree.merge([(float(p), {"id": f"BIG{p}", "name": "Big", "price": float(p)}) for p in range(50, 3000)])
+        self.assertTrue(tree.is_balanced())
+        self.assertEqual(len(list(tree.get_sorted_products())), 1000 + 1 + 2950)
+        self.assertEqual(tree.find_most_expensive()["id"], "BIG2999")
+        self.assertEqual(len(tree.find_products_in_range(50.0, 50.0)), 1 + 10, "Equal prices share a node")
+
+    def test_avl_iter_range_paging(self):
+        """Test lazy range iteration with early termination and paging"""
+        self.avlTree = AVLTree.from_items(
+            (float(price), {"id": f"PAGE{price}", "name": "Page", "price": float(price)})
+            for price in range(1, 1001))
+
+        scan = self.avlTree.iter_range(100.0, 900.0)
+        self.assertEqual(next(scan)["price"], 100.0, "Iteration should be lazy and start at the minimum")
+        self.assertEqual(next(scan)["price"], 101.0)
+        scan.close()
+
+        page = [p["price"] for p in self.avlTree.iter_range(100.0, 900.0, limit=5, offset=10)]
+        self.assertEqual(page, [110.0, 111.0, 112.0, 113.0, 114.0])
+        page = [p["price"] for p in self.avlTree.iter_range(100.0, 900.0, descending=True, limit=3, offset=1)]
+        self.assertEqual(page, [899.0, 898.0, 897.0])
+        self.assertEqual(list(self.avlTree.iter_range(100.0, 900.0, offset=801)), [])
+        self.assertEqual(list(self.avlTree.iter_range(100.0, 900.0, limit=0)), [])
+
+    def test_avl_order_statistics(self):
+        """Test rank, select, median and range aggregates"""
+        prices = [10.00, 20.00, 20.00, 30.00, 40.00, 50.00]
+        for i, price in enumerate(prices):
+            product = {"id": f"OS{i}", "name": f"Stat {i}", "price": price}
+            self.avlTree.root = self.avlTree.insert(self.avlTree.root, price, product)
+
+        self.assertEqual(len(self.avlTree), 6)
+        self.assertEqual(self.avlTree.rank(20.00), 1)
+        self.assertEqual(self.avlTree.rank(25.00), 3)
+        self.assertEqual(self.avlTree.count_in_range(20.00, 40.00), 4)
+        self.assertEqual(self.avlTree.count_in_range(41.00, 49.00), 0)
+        self.assertAlmostEqual(self.avlTree.sum_in_range(15.00, 35.00), 70.00)
+        self.assertEqual(self.avlTree.select(0)["price"], 10.00)
+        self.assertEqual(self.avlTree.select(2)["id"], "OS2")
+        self.assertEqual(self.avlTree.median(), 25.00)
+        with self.assertRaises(IndexError):
+            self.avlTree.select(6)
+
+        # Counts must follow deletions, including ones that rotate the tree
+        for i in (0, 1, 3):
+            self.avlTree.root = self.avlTree.delete(self.avlTree.root, prices[i], f"OS{i}")
+        self.assertEqual(len(self.avlTree), 3)
+        self.assertEqual(self.avlTree.median(), 40.00)
+        self.assertAlmostEqual(self.avlTree.sum_in_range(0.00, 100.00), 110.00)
+
+    def test_product_records(self):
+        """Test slotted Product records in both data structures"""
+        node = AVLNode(10.00, {"id": "N1", "name": "Node", "price": 10.00})
+        self.assertFalse(hasattr(node, "__dict__"))
+
+        products = generate_random_inventory(self.categories, 300, as_records=True)
+        self.assertTrue(all(isinstance(p, Product) for p in products))
+        initialize_inventory(products, self.hashTable, self.avlTree)
+        self.assertEqual(len(self.hashTable), 300)
+        self.assertEqual(len(self.avlTree), 300)
+        self.assertTrue(self.avlTree.is_balanced())
+
+        # The tree and the hash table share the same record
+        product = products[0]
+        self.assertIs(self.hashTable.get(product.id), product)
+        matches = self.avlTree.find_products_in_range(product.price, product.price)
+        self.assertIn(product.id, [entry["id"] for entry in matches])
+        self.assertEqual(product.to_dict(), {"id": product.id, "name": product.name, "price": product.price})
+        self.assertEqual(Product.from_dict(product.to_dict()), product)
+
+        # Records are validated like dictionaries and can receive a generated ID
+        record = self.hashTable.insert(None, Product(name="Record", price=25.00))
+        self.assertIsNotNone(record.id)
+        with self.assertRaises(ValueError):
+            self.hashTable.insert("BAD", Product(name="", price=25.00))
+        with self.assertRaises(KeyError):
+            product["stock"]
+
+    def test_price_index(self):
+        """Test the NumPy price index against the AVL tree"""
+        products = generate_random_inventory(self.categories, 500)
+        priceIndex = PriceIndex(batch_size=64)
+        for product in products:
+            priceIndex.insert(product["price"], product)
+            self.avlTree.root = self.avlTree.insert(self.avlTree.root, product["price"], product)
+        for product in products[:100]:
+            self.assertTrue(priceIndex.delete(product["id"]))
+            self.avlTree.root = self.avlTree.delete(self.avlTree.root, product["price"], product["id"])
+        self.assertFalse(priceIndex.delete("missing"))
+
+        self.assertEqual(len(priceIndex), 400)
+        self.assertEqual(priceIndex.find_products_in_range(200.00, 800.00),
+                         self.avlTree.find_products_in_range(200.00, 800.00))
+        self.assertEqual(list(priceIndex.iter_range(0.00, 3000.00, descending=True, limit=5, offset=2)),
+                         list(self.avlTree.iter_range(0.00, 3000.00, descending=True, limit=5, offset=2)))
+        self.assertEqual(priceIndex.count_in_range(500.00, 1500.00), self.avlTree.count_in_range(500.00, 1500.00))
+        self.assertEqual(priceIndex.find_cheapest(), self.avlTree.find_cheapest())
+        self.assertEqual(priceIndex.median(), self.avlTree.median())
+
+        counts, edges = priceIndex.histogram(bins=5, min_price=0.00, max_price=2000.00)
+        self.assertEqual(counts.sum(), 400)
+        self.assertEqual(len(edges), 6)
+        low, high = priceIndex.percentile([0, 100])
+        self.assertEqual((low, high), (self.avlTree.find_cheapest()["price"], self.avlTree.find_most_expensive()["price"]))
+        laptops = priceIndex.filter(max_price=1000.00, names=["Laptop"])
+        self.assertTrue(all(p["name"] == "Laptop" and p["price"] <= 1000.00 for p in laptops))
+
+        rebuilt = PriceIndex.from_items((p["price"], p) for p in products[100:])
+        self.assertEqual(list(rebuilt.get_sorted_products()), list(priceIndex.get_sorted_products()))
+        with self.assertRaises(ValueError):
+            PriceIndex().percentile(50)
+
+    def test_generate_random_inventory(self):
+        """Test seeded, chunked random inventory generation"""
+        inventory = generate_random_inventory(self.categories, 1000, seed=42)
+        self.assertEqual(inventory, generate_random_inventory(self.categories, 1000, seed=42))
+        self.assertNotEqual(inventory, generate_random_inventory(self.categories, 1000, seed=43))
+        self.assertEqual(len({p["id"] for p in inventory}), 1000)
+        for product in inventory:
+            self.assertEqual(str(uuid.UUID(product["id"])), product["id"])
+            self.assertEqual(uuid.UUID(product["id"]).version, 4)
+            self.assertIn(product["name"], self.categories)
+            self.assertTrue(50 <= product["price"] <= 2000)
+            self.assertEqual(round(product["price"], 2), product["price"])
+
+        chunks = list(iter_random_inventory(self.categories, 2500, chunk_size=1000, seed=42))
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 500])
+        with self.assertRaises(ValueError):
+            iter_random_inventory(self.categories, 0)
+        with self.assertRaises(ValueError):
+            generate_random_inventory([], 10)
+
+    def test_hash_table_bulk_operations(self):
+        """Test reserve, insert_many and delete_many on both backends"""
+        for backend in ("chaining", "open_addressing"):
+            table = HashTable(backend=backend)
+            table.reserve(5000)
+            size = table.size
+            items = [(f"B{i:05d}", {"id": f"B{i:05d}", "name": "Bulk", "price": 1.0}) for i in range(5000)]
+            self.assertEqual(table.insert_many(items), 5000)
+            self.assertEqual(table.size, size, "Reserved table should not resize")
+            self.assertEqual(table.insert_many(items[:10]), 0)
+            self.assertEqual(len(table), 5000)
+            self.assertEqual(len(table.find_by_prefix("b0001")), 10)
+
+            self.assertEqual(table.delete_many([key for key, _ in items[:3000]] + ["missing"]), 3000)
+            self.assertEqual(len(table), 2000)
+            self.assertIsNone(table.get("B00000"))
+            self.assertEqual(table.get("B04999")["id"], "B04999")
+            self.assertEqual(len(table.find_by_prefix("b")), 2000)
+
+    def test_bulk_upsert_and_delete(self):
+        """Test batch inserts, updates and deletes across both data structures"""
+        products = generate_random_inventory(self.categories, 2000, seed=7)
+        invalid = ["not a product", {"id": "X1", "name": "", "price": 10.00},
+                   {"id": "X2", "name": "Bad", "price": -5}, {"id": "X3", "name": "Bad"}]
+        report = bulk_upsert(self.hashTable, self.avlTree, products + invalid)
+        self.assertEqual(report["inserted"], 2000)
+        self.assertEqual(report["rejected"], {"not a product": 1, "missing name": 1, "invalid price": 2})
+
+        # Price changes move the tree entry; new products without an ID get one
+        changed = [dict(product, price=product["price"] + 1000) for product in products[:500]]
+        report = bulk_upsert(self.hashTable, self.avlTree, changed + [{"name": "New", "price": 3.00}])
+        self.assertEqual((report["inserted"], report["updated"]), (1, 500))
+        self.assertEqual(len(self.hashTable), 2001)
+        self.assertEqual(len(self.avlTree), 2001)
+        self.assertEqual(self.avlTree.find_cheapest()["name"], "New")
+        moved = changed[0]
+        self.assertIn(moved["id"], [e["id"] for e in self.avlTree.find_products_in_range(moved["price"], moved["price"])])
+
+        report = bulk_delete(self.hashTable, self.avlTree, [p["id"] for p in products[:1500]] + ["missing"])
+        self.assertEqual(report, {"deleted": 1500, "missing": 1})
+        self.assertEqual(len(self.hashTable), 501)
+        self.assertEqual(len(self.avlTree), 501)
+        self.assertTrue(self.avlTree.is_balanced())
+        remaining = sorted(p["id"] for _, p in self.hashTable.items())
+        self.assertEqual(remaining, sorted(e["id"] for e in self.avlTree.get_sorted_products()))
+
+    def test_inventory_facade(self):
+        """Test that Inventory keeps the hash table and AVL tree in sync"""
+        for backend in ("chaining", "open_addressing"):
+            store = Inventory(backend=backend)
+            store.bulk_upsert(generate_random_inventory(self.categories, 300, seed=3))
+            product = store.insert({"name": "Facade", "price": 10.00})
+            self.assertEqual(len(store), 301)
+            self.assertIs(store.avlTree.node_for(product["id"]).products[product["id"]], product)
+
+            # Price changes move the product in the tree
+            self.assertIs(store.update_price(product["id"], 2500.00), product)
+            self.assertEqual(store.find_most_expensive()["id"], product["id"])
+            self.assertEqual(store.count_in_range(10.00, 10.00), 0)
+            self.assertIsNone(store.update_price("missing", 5.00))
+            with self.assertRaises(ValueError):
+                store.update_price(product["id"], -1)
+
+            # Re-inserting an ID replaces the product in both structures
+            store.insert({"id": product["id"], "name": "Replaced", "price": 20.00})
+            self.assertEqual(len(store), 301)
+            self.assertEqual(store.find_products_in_range(20.00, 20.00)[0]["name"], "Replaced")
+
+            # Invalid products leave the inventory unchanged
+            with self.assertRaises(ValueError):
+                store.insert({"id": "BAD", "name": "", "price": 5.00})
+            self.assertNotIn("BAD", store)
+
+            for product_id, _ in store.items()[:150]:
+                self.assertTrue(store.delete(product_id))
+            self.assertFalse(store.delete("missing"))
+            self.assertTrue(store.is_consistent())
+
+    def test_category_index(self):
+        """Test category + price range queries with and without category trees"""
+        for category_trees in (True, False):
+            store = Inventory(category_trees=category_trees)
+            products = generate_random_inventory(self.categories, 600, seed=11)
+            store.bulk_upsert(products)
+            expected = sorted(p["price"] for p in products if p["name"] == "Laptop" and p["price"] < 800)
+            self.assertEqual([p["price"] for p in store.find_by_category("Laptop", max_price=799.99)], expected)
+            self.assertEqual(store.count_by_category("Laptop", max_price=799.99), len(expected))
+            self.assertEqual(sum(store.categories().values()), 600)
+            self.assertEqual(store.find_by_category("Drone"), [])
+
+            # Renaming, repricing and deleting move products between categories
+            product = products[0]
+            store.insert({"id": product["id"], "name": "Drone", "price": 99.00})
+            store.update_price(product["id"], 120.00)
+            self.assertEqual([p["id"] for p in store.find_by_category("Drone", 100.00, 200.00)], [product["id"]])
+            self.assertEqual(store.find_by_category("Drone", 0.00, 100.00), [])
+            self.assertTrue(store.delete(product["id"]))
+            self.assertNotIn("Drone", store.categories())
+
+            store.bulk_delete([p["id"] for p in products if p["name"] == "Phone"])
+            self.assertNotIn("Phone", store.categories())
+            self.assertEqual(store.find_by_category("Phone"), [])
+            self.assertTrue(store.is_consistent())
+
+    def test_snapshot_round_trip(self):
+        """Test saving and restoring the inventory through a binary snapshot"""
+        store = Inventory()
+        products = generate_random_inventory(self.categories, 500, seed=5)
+        products.append({"id": "Ünïcode-ID", "name": "Café", "price": 12.50})
+        store.bulk_upsert(products)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "inventory.snap")
+            self.assertEqual(store.save_snapshot(path), 501)
+            self.assertEqual(os.listdir(directory), ["inventory.snap"])
+
+            for as_records in (False, True):
+                restored = Inventory.load_snapshot(path, as_records=as_records)
+                self.assertEqual(len(restored), 501)
+                self.assertTrue(restored.is_consistent())
+                self.assertEqual(restored.get("Ünïcode-ID"), {"id": "Ünïcode-ID", "name": "Café", "price": 12.50})
+                self.assertEqual([p["price"] for p in restored.get_sorted_products()],
+                                 [p["price"] for p in store.get_sorted_products()])
+                self.assertEqual(restored.categories(), store.categories())
+            self.assertIsInstance(restored.get(products[0]["id"]), Product)
+
+            empty = os.path.join(directory, "empty.snap")
+            Inventory().save_snapshot(empty)
+            self.assertEqual(len(Inventory.load_snapshot(empty)), 0)
+
+            # Anything that is not a complete snapshot is rejected
+            with open(path, "rb") as f:
+                data = f.read()
+            for name, content in (("junk.snap", b"not a snapshot"), ("short.snap", data[:len(data) // 2])):
+                bad = os.path.join(directory, name)
+                with open(bad, "wb") as f:
+                    f.write(content)
+                with self.assertRaises(ValueError):
+                    Inventory.load_snapshot(bad)
+
+    def test_write_ahead_log_replay(self):
+        """Test that logged changes survive a crash and are compacted into the snapshot"""
+        with tempfile.TemporaryDirectory() as directory:
+            store = Inventory.open(directory, sync_every=50, sync_interval=60)
+            products = generate_random_inventory(self.categories, 200, seed=3)
+            store.bulk_upsert(products)
+            store.insert({"id": "W001", "name": "Watch", "price": 99.00})
+            store.update_price(products[0]["id"], 1.50)
+            self.assertTrue(store.delete(products[1]["id"]))
+            store.bulk_delete([p["id"] for p in products[2:10]])
+            self.assertEqual(store.log.syncs, 4)  # 211 changes in groups of 50
+
+            # Simulate a crash: the 200 synced inserts survive, the 11 buffered changes are lost
+            store.log._file.close()
+            restored = Inventory.open(directory)
+            self.assertEqual(len(restored), 200)
+            self.assertNotIn("W001", restored)
+            restored.close()
+
+            # A clean close makes every change durable
+            store = Inventory.open(os.path.join(directory, "clean"), sync_every=1000, sync_interval=60)
+            store.bulk_upsert(products)
+            store.insert({"id": "W001", "name": "Watch", "price": 99.00})
+            store.update_price(products[0]["id"], 1.50)
+            store.delete(products[1]["id"])
+            store.bulk_delete([p["id"] for p in products[2:10]])
+            store.close()
+
+            # A torn record at the end of the log is ignored and cut off
+            log_path = os.path.join(directory, "clean", Inventory.LOG_FILE)
+            with open(log_path, "ab") as f:
+                f.write(b"\x10\x00\x00\x00garbage")
+            restored = Inventory.open(os.path.join(directory, "clean"))
+            self.assertEqual(len(restored), 192)
+            self.assertEqual(restored.get(products[0]["id"])["price"], 1.50)
+            self.assertEqual(restored.get("W001")["name"], "Watch")
+            self.assertNotIn(products[1]["id"], restored)
+            self.assertTrue(restored.is_consistent())
+            self.assertEqual(len(read_log(log_path)[0]), 211)
+            restored.close()
+
+            # Compaction folds the log into a new snapshot
+            restored = Inventory.open(os.path.join(directory, "clean"), compact_bytes=1)
+            self.assertEqual(os.path.getsize(log_path), 0)
+            restored.delete("W001")
+            self.assertEqual(restored.log.size, 0)
+            restored.close()
+            self.assertEqual(len(Inventory.open(os.path.join(directory, "clean"))), 191)
+
+    def test_csv_and_jsonl_import_export(self):
+        """Test streaming imports and exports in both formats, plain and gzipped"""
+        store = Inventory()
+        store.bulk_upsert(generate_random_inventory(self.categories, 250, seed=8))
+        store.insert({"id": "Q,1", "name": 'Quoted "Laptop", 15\"', "price": 0.1 + 0.2})
+        expected = sorted((p["id"], p["name"], p["price"]) for _, p in store.items())
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name, export, load in (("a.csv", export_csv, import_csv), ("a.csv.gz", export_csv, import_csv),
+                                       ("a.jsonl", export_jsonl, import_jsonl), ("a.jsonl.gz", export_jsonl, import_jsonl)):
+                path = os.path.join(directory, name)
+                self.assertEqual(export(store, path, chunk_size=40), 251)
+                copy = Inventory()
+                report = load(copy, path, chunk_size=40, as_records=name.startswith("a.jsonl"))
+                self.assertEqual(report, {"inserted": 251, "updated": 0, "rejected": {}})
+                self.assertEqual(sorted((p["id"], p["name"], p["price"]) for _, p in copy.items()), expected)
+                self.assertTrue(copy.is_consistent())
+
+            # Bad rows are counted by reason, and a missing ID is generated
+            path = os.path.join(directory, "bad.csv")
+            with open(path, "w") as f:
+                f.write("id,name,price,stock\nA1,Phone,10.5,3\n,Tablet,20,1\nA2,Phone,cheap,0\nA3,,5,0\nA1,Phone,11,3\n")
+            copy = Inventory()
+            self.assertEqual(import_csv(copy, path, chunk_size=2),
+                             {"inserted": 2, "updated": 1, "rejected": {"invalid price": 1, "missing name": 1}})
+            self.assertEqual(copy.get("A1")["price"], 11.0)
+
+            path = os.path.join(directory, "bad.jsonl")
+            with open(path, "w") as f:
+                f.write('{"id": "J1", "name": "Watch", "price": 5}\n\nnot json\n[1, 2]\n{"id": "J2", "price": 1}\n')
+            report = import_jsonl(copy, path)
+            self.assertEqual(report["inserted"], 1)
+            self.assertEqual(report["rejected"], {"missing name": 1, "malformed line": 2})
+
+            with open(path, "w") as f:
+                f.write("sku,title\n")
+            with self.assertRaises(ValueError):
+                import_csv(copy, path)
+
+    def test_read_write_lock(self):
+        """Test that writers exclude readers and that nested holds do not deadlock"""
+        lock = ReadWriteLock()
+        events = []
+        with lock.read():
+            with lock.read():
+                writer = threading.Thread(target=lambda: (lock.acquire_write(), events.append("write"), lock.release_write()))
+                writer.start()
+                writer.join(0.1)
+                self.assertEqual(events, [])  # Blocked by the readers
+            with self.assertRaises(RuntimeError):
+                lock.acquire_write()
+        writer.join(1)
+        self.assertEqual(events, ["write"])
+
+        with lock.write():
+            with lock.write(), lock.read():
+                pass
+        with lock.read():  # Everything above was released
+            pass
+
+    def test_concurrent_inventory(self):
+        """Test that readers always see consistent results while a writer updates the inventory"""
+        store = ConcurrentInventory()
+        products = generate_random_inventory(self.categories, 2000, seed=4)
+        store.bulk_upsert(products[:1000])
+        errors = []
+        done = threading.Event()
+
+        def read():
+            try:
+                while not done.is_set():
+                    found = store.find_products_in_range(0, 10000)
+                    prices = [p["price"] for p in found]
+                    if prices != sorted(prices) or len(found) < 1000:
+                        errors.append("inconsistent range")
+                    if store.count_by_category("Laptop") > len(store):
+                        errors.append("inconsistent category")
+                    for product in products[:1000:50]:
+                        if store.get(product["id"]) is None:
+                            errors.append("missing product")
+            except Exception as e:  # Surface any crash in the main thread
+                errors.append(repr(e))
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for product in products[1000:]:
+            store.insert(product)
+        for product in products[1000:1500]:
+            store.update_price(product["id"], product["price"] + 1)
+        store.bulk_delete([p["id"] for p in products[1500:]])
+        done.set()
+        for reader in readers:
+            reader.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(store), 1500)
+        self.assertTrue(store.is_consistent())
+
+    def test_persistent_avl_tree(self):
+        """Test that path copying matches the mutable tree and never changes old versions"""
+        rng = random.Random(6)
+        tree = PersistentAVLTree(track_ids=True)
+        reference = AVLTree(track_ids=True)
+        versions = []
+        for step in range(3000):
+            product_id = str(rng.randrange(800))
+            tree.remove(product_id)
+            reference.remove(product_id)
+            if rng.random() < 0.6:
+                price = rng.randrange(200)
+                product = {"id": product_id, "name": "Laptop", "price": price}
+                tree.root = tree.insert(tree.root, price, product)
+                reference.root = reference.insert(reference.root, price, product)
+            if step % 300 == 0:
+                tree.publish()
+                version = tree.snapshot()
+                versions.append((version, list(version.get_sorted_products())))
+        self.assertTrue(tree.is_balanced())
+        self.assertEqual(list(tree.get_sorted_products()), list(reference.get_sorted_products()))
+        self.assertEqual(tree.count_in_range(10, 50), reference.count_in_range(10, 50))
+        self.assertEqual(tree.find_cheapest(), reference.find_cheapest())
+        for version, contents in versions:
+            self.assertEqual(list(version.get_sorted_products()), contents)
+
+        # A bulk merge builds a new version too
+        tree.publish()
+        before = tree.snapshot()
+        count = len(tree)
+        tree.merge([(rng.randrange(200), {"id": f"M{i}", "name": "Phone", "price": 0}) for i in range(2000)])
+        self.assertEqual(len(tree), count + 2000)
+        self.assertEqual(len(before), count)
+        self.assertTrue(tree.is_balanced())
+
+    def test_lock_free_scans(self):
+        """Test that a scan in progress is not affected by concurrent writes"""
+        store = ConcurrentInventory(persistent=True)
+        products = generate_random_inventory(self.categories, 1000, seed=9)
+        store.bulk_upsert(products)
+        scan = store.iter_range(0, 10000)
+        first = next(scan)
+
+        done = threading.Event()
+        writer = threading.Thread(target=lambda: (store.bulk_delete([p["id"] for p in products[:500]]), done.set()))
+        writer.start()
+        self.assertTrue(done.wait(5))  # The open scan does not block the writer
+        writer.join()
+
+        self.assertEqual(len([first] + list(scan)), 1000)  # ...and still sees the old version
+        self.assertEqual(len(store.find_products_in_range(0, 10000)), 500)
+        self.assertEqual(store.count_in_range(0, 10000), 500)
+        self.assertTrue(store.is_consistent())
+
+    def test_inventory_server(self):
+        """Test pipelined requests, read-your-writes ordering and write coalescing over TCP"""
+        async def scenario():
+            store = Inventory()
+            server = InventoryServer(store)
+            listener = await server.start("127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+            requests = [{"op": "insert", "product": {"id": f"S{i:03}", "name": "Phone", "price": 10.0 + i}, "req": i}
+                        for i in range(50)]
+            requests += [
+                {"op": "get", "id": "S007", "req": "get"},
+                {"op": "prefix", "prefix": "s00", "limit": 3, "req": "prefix"},
+                {"op": "delete", "id": "S000", "req": "delete"},
+                {"op": "min", "req": "min"},
+                {"op": "max", "req": "max"},
+                {"op": "range", "min": 20, "max": 22.5, "req": "range"},
+                {"op": "sorted_page", "offset": 1, "limit": 2, "descending": True, "req": "page"},
+                {"op": "insert", "product": {"name": "Phone", "price": -1}, "req": "bad"},
+                {"op": "explode", "req": "unknown"},
+            ]
+            # Send everything at once (pipelined), plus a line that is not JSON
+            writer.write(b"".join(json.dumps(r).encode() + b"\n" for r in requests) + b"not json\n")
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in range(len(requests) + 1)]
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            await server.stop()
+            return store, server, responses
+
+        store, server, responses = asyncio.run(scenario())
+        self.assertEqual([r.get("req") for r in responses[:-1]], list(range(50)) + [
+            "get", "prefix", "delete", "min", "max", "range", "page", "bad", "unknown"])
+        by_req = {r.get("req"): r for r in responses}
+        self.assertEqual(by_req["get"]["result"], {"id": "S007", "name": "Phone", "price": 17.0})
+        self.assertEqual([p["id"] for p in by_req["prefix"]["result"]], ["S000", "S001", "S002"])
+        self.assertTrue(by_req["delete"]["result"])
+        self.assertEqual(by_req["min"]["result"]["id"], "S001")
+        self.assertEqual(by_req["max"]["result"]["id"], "S049")
+        self.assertEqual([p["price"] for p in by_req["range"]["result"]], [20.0, 21.0, 22.0])
+        self.assertEqual([p["id"] for p in by_req["page"]["result"]], ["S048", "S047"])
+        self.assertFalse(by_req["bad"]["ok"])
+        self.assertFalse(by_req["unknown"]["ok"])
+        self.assertFalse(responses[-1]["ok"])
+        self.assertEqual(len(store), 49)
+        self.assertEqual(server.writes, 51)  # The invalid insert is rejected before it is queued
+        self.assertLess(server.batches, server.writes)  # Pipelined writes were coalesced
+
+        report = asyncio.run(run_local(products=500, connections=4, requests=200, pipeline=8, write_ratio=0.3))
+        self.assertEqual(report["requests"], 800)
+        self.assertEqual(report["errors"], 0)
+        self.assertLessEqual(report["p50_ms"], report["p99_ms"])
+
+    def test_sharded_inventory(self):
+        # Products are spread over worker processes and price queries merge every shard's answer
+        products = [{"id": f"S{i:03d}", "name": ["Laptop", "Phone"][i % 2], "price": float(i + 1)} for i in range(60)]
+        for shards in (0, -1):
+            with self.assertRaises(ValueError):
+                ShardedInventory(shards)
+        with tempfile.TemporaryDirectory() as directory:
+            with ShardedInventory(3, directory) as store:
+                report = store.bulk_upsert(products + [{"id": "bad", "name": "Phone", "price": -1}])
+                self.assertEqual(report, {"inserted": 60, "updated": 0, "rejected": {"invalid price": 1}})
+                self.assertEqual(len(store), 60)
+                self.assertTrue(store.is_consistent())
+                self.assertEqual(len({shard_of(p["id"], 3) for p in products}), 3)
+
+                self.assertEqual(store.get("S007")["price"], 8.0)
+                self.assertEqual([p["id"] for p in store.find_by_prefix("s0", limit=5)],
+                                 ["S000", "S001", "S002", "S003", "S004"])
+                self.assertEqual([p and p["id"] for p in store.get_many(["S010", "nope", "S002"])], ["S010", None, "S002"])
+                self.assertEqual(store.find_cheapest()["id"], "S000")
+                self.assertEqual(store.find_most_expensive()["id"], "S059")
+                self.assertEqual([p["price"] for p in store.iter_range(10, 30, limit=4, offset=2)], [12.0, 13.0, 14.0, 15.0])
+                self.assertEqual([p["id"] for p in store.top_k(3, descending=True)], ["S059", "S058", "S057"])
+                self.assertEqual(store.count_in_range(1, 20), 20)
+                self.assertEqual(store.categories(), {"Laptop": 30, "Phone": 30})
+                self.assertEqual([p["price"] for p in store.find_by_category("Phone", limit=3)], [2.0, 4.0, 6.0])
+                prices = [p["price"] for p in store.get_sorted_products()]
+                self.assertEqual(prices, sorted(prices))
+
+                self.assertEqual(store.update_price("S000", 100.5)["price"], 100.5)
+                self.assertTrue(store.delete("S001"))
+                self.assertEqual(store.bulk_delete(["S002", "S003", "nope"]), {"deleted": 2, "missing": 1})
+                new = store.insert({"name": "Tablet", "price": 50.5})
+                self.assertIn(new["id"], store)
+                with self.assertRaises(ValueError):
+                    store.update_price("S004", -3)
+                self.assertEqual(len(store), 58)
+                self.assertTrue(store.is_consistent())
+
+            # Every shard reopens from its own snapshot and log, with the recorded shard count
+            with self.assertRaises(ValueError):
+                ShardedInventory(2, directory)
+            with ShardedInventory(directory=directory) as store:
+                self.assertEqual(store.shards, 3)
+            with ShardedInventory(3, directory) as store:
+                self.assertEqual(len(store), 58)
+                self.assertEqual(store.find_cheapest()["id"], "S004")
+                self.assertTrue(store.is_consistent())
+
+    def test_query_cache(self):
+        # LRU eviction by count and by size, TTL expiry and precise invalidation
+        cache = QueryCache(max_entries=2)
+        cache.put_range(("range", 1, 10), 1, 10, [1])
+        cache.put_range(("range", 20, 30), 20, 30, [2])
+        self.assertEqual(cache.get(("range", 1, 10)), [1])
+        cache.put_prefix("ab", {"id": "abc"})
+        self.assertIsNone(cache.get(("range", 20, 30)))  # Least recently used, evicted
+        self.assertEqual(cache.invalidate(["xyz"], [15.0]), 0)
+        self.assertEqual(cache.invalidate(["abd"], [10.0]), 2)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["invalidations"], 2)
+
+        # Prefixes that differ only in case are both invalidated by a matching ID
+        cased = QueryCache()
+        cased.put_prefix("ab", [1])
+        cased.put_prefix("AB", [2])
+        self.assertEqual(cased.invalidate(["ab9"]), 2)
+        self.assertIsNone(cased.get("ab"))
+        cased.put_prefix("ab", [1])
+        cased.put_prefix("AB", [2])
+        cased.put_prefix("AB", [3])  # Replacing one entry keeps the other's dependency record
+        self.assertEqual(cased.invalidate(["AB1"]), 2)
+        self.assertEqual(len(cased), 0)
+
+        small = QueryCache(max_bytes=2000)
+        small.put_prefix("aa", list(range(50)))
+        small.put_prefix("bb", list(range(50)))
+        self.assertEqual(len(small), 1)
+        self.assertLessEqual(small.size_bytes, 2000)
+        expiring = QueryCache(ttl=0.01)
+        expiring.put_prefix("aa", 1)
+        time.sleep(0.02)
+        self.assertIsNone(expiring.get("aa"))
+        self.assertEqual(expiring.expirations, 1)
+
+        store = Inventory(cache=QueryCache())
+        store.bulk_upsert([{"id": f"c{i:03d}", "name": "Phone", "price": float(i + 1)} for i in range(100)])
+        self.assertEqual(len(store.find_products_in_range(10, 20)), 11)
+        self.assertEqual(len(store.find_products_in_range(50, 60)), 11)
+        self.assertEqual(store.find_by_partial_id("c050")["id"], "c050")
+        self.assertEqual(len(store.find_products_in_range(10, 20)), 11)
+        self.assertEqual(store.cache.hits, 1)
+
+        store.update_price("c014", 55.5)  # Leaves 10-20, enters 50-60; the prefix is untouched
+        self.assertEqual(store.cache.invalidations, 2)
+        self.assertEqual(len(store.find_products_in_range(10, 20)), 10)
+        self.assertEqual(len(store.find_products_in_range(50, 60)), 12)
+        self.assertEqual(store.find_by_partial_id("c050")["id"], "c050")
+        self.assertEqual(store.cache.hits, 2)
+        store.delete("c050")
+        self.assertIsNone(store.find_by_partial_id("c050"))
+        store.insert({"id": "c099", "name": "Tablet", "price": 12.0})
+        self.assertIn(12.0, [p["price"] for p in store.find_products_in_range(10, 20)])
+        store.bulk_delete(["c009", "c010"])
+        self.assertEqual([p["price"] for p in store.find_products_in_range(10, 12)], [12.0, 12.0])
+        self.assertTrue(store.is_consistent())
+
+    def test_non_finite_prices_rejected(self):
+        # NaN and infinity cannot be kept in price order, so every entry point rejects them
+        store = Inventory()
+        report = store.bulk_upsert([
+            {"id": "n1", "name": "Phone", "price": float("nan")},
+            {"id": "n2", "name": "Phone", "price": float("inf")},
+            {"id": "n3", "name": "Phone", "price": 5.0},
+        ])
+        self.assertEqual(report, {"inserted": 1, "updated": 0, "rejected": {"invalid price": 2}})
+        for price in (float("nan"), float("-inf"), float("inf")):
+            with self.assertRaises(ValueError):
+                store.insert({"id": "n4", "name": "Phone", "price": price})
+            with self.assertRaises(ValueError):
+                store.update_price("n3", price)
+        self.assertEqual(len(store), 1)
+        self.assertTrue(store.is_consistent())
+
+    def test_insert_validates_before_indexing(self):
+        # A product that cannot be indexed is rejected before any index is written
+        store = Inventory(category_trees=False)
+        store.insert({"id": "v1", "name": "Phone", "price": 3.0})
+        for product in ({"id": "v2", "name": ["x"], "price": 5.0}, {"id": 7, "name": "Phone", "price": 5.0}):
+            with self.assertRaises(ValueError):
+                store.insert(product)
+        report = store.bulk_upsert([{"id": "v3", "name": {"a": 1}, "price": 5.0}, {"id": ("v",), "name": "Phone", "price": 5.0}])
+        self.assertEqual(report["rejected"], {"invalid name": 1, "invalid id": 1})
+        self.assertEqual(len(store), 1)
+        self.assertTrue(store.is_consistent())
+        self.assertEqual(list(store.iter_category("Phone")), [{"id": "v1", "name": "Phone", "price": 3.0}])
+
+    def test_import_rejects_non_finite_prices(self):
+        # "nan" and "inf" parse as floats but are counted as invalid prices
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "prices.csv")
+            with open(csv_path, "w") as f:
+                f.write("id,name,price\na,Phone,nan\nb,Phone,inf\nc,Phone,-Infinity\nd,Phone,9.5\n")
+            jsonl_path = os.path.join(directory, "prices.jsonl")
+            with open(jsonl_path, "w") as f:
+                f.write('{"id": "e", "name": "Phone", "price": NaN}\n{"id": "f", "name": "Phone", "price": "inf"}\n')
+            store = Inventory()
+            self.assertEqual(import_csv(store, csv_path), {"inserted": 1, "updated": 0, "rejected": {"invalid price": 3}})
+            self.assertEqual(import_jsonl(store, jsonl_path), {"inserted": 0, "updated": 0, "rejected": {"invalid price": 2}})
+            self.assertEqual(len(store), 1)
+
+    def test_server_validates_requests(self):
+        # Malformed requests are rejected up front, and stop() closes open connections cleanly
+        async def scenario():
+            store = Inventory()
+            server = InventoryServer(store)
+            listener = await server.start("127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+            lines = [
+                b'{"op":"insert","product":{"id":"a","name":["x"],"price":5}}',
+                b'{"op":"insert","product":{"id":"b","name":"x","price":NaN}}',
+                b'{"op":"insert","product":{"id":7,"name":"x","price":5}}',
+                b'{"op":"get","id":["a"]}',
+                b'{"op":"range","min":"1","max":5}',
+                b'{"op":"sorted_page","limit":-1}',
+                b'{"op":"prefix","prefix":"a","limit":true}',
+                b'{"op":"insert","product":{"id":"c","name":"x","price":5}}',
+            ]
+            writer.write(b"\n".join(lines) + b"\n")
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in lines]
+            listener.close()
+            await listener.wait_closed()
+            await server.stop()  # The client connection is still open
+            self.assertEqual(await reader.read(), b"")
+            writer.close()
+            return store, responses
+
+        store, responses = asyncio.run(scenario())
+        self.assertEqual([r["ok"] for r in responses], [False] * 7 + [True])
+        self.assertEqual([product_id for product_id, _ in store.items()], ["c"])
+        self.assertTrue(store.is_consistent())
+
+    def test_write_ahead_log_idle_sync(self):
+        # The last records of a burst are synced by the timer without another append
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "idle.log")
+            log = WriteAheadLog(path, sync_every=1000, sync_interval=0.05)
+            for i in range(3):
+                log.log_insert({"id": f"w{i}", "name": "Phone", "price": 1.0 + i})
+            self.assertEqual(read_log(path)[0], [])
+            deadline = time.monotonic() + 5
+            while log.syncs == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(len(read_log(path)[0]), 3)
+            self.assertEqual(log.syncs, 1)
+            log.close()
+
+    def test_inventory_price_index(self):
+        # With price_index=True the range queries are answered by the PriceIndex
+        store = Inventory(price_index=True)
+        store.bulk_upsert([{"id": f"x{i:03d}", "name": "Phone", "price": float(i + 1)} for i in range(100)])
+        store.insert({"id": "x200", "name": "Tablet", "price": 15.5})
+        store.update_price("x000", 16.0)
+        store.delete("x010")
+        store.bulk_delete(["x011", "x012"])
+        self.assertEqual([p["price"] for p in store.find_products_in_range(10, 16)],
+                         [10.0, 14.0, 15.0, 15.5, 16.0, 16.0])
+        self.assertEqual(store.count_in_range(10, 16), 6)
+        self.assertEqual([p["id"] for p in store.iter_range(0, 100, descending=True, limit=2)], ["x099", "x098"])
+        self.assertTrue(store.is_consistent())
+        self.assertEqual(store.find_products_in_range(10, 16), store.avlTree.find_products_in_range(10, 16))
+
+        # Results are read when the query runs, so later changes do not leak into them
+        index = PriceIndex(batch_size=1)
+        for i in range(5):
+            index.insert(float(i + 1), {"id": f"r{i}", "name": "Phone", "price": float(i + 1)})
+        entries = index._entries(slice(0, 5))
+        index.delete("r0")
+        index.insert(9.0, {"id": "r9", "name": "Phone", "price": 9.0})
+        self.assertEqual([entry["id"] for entry in entries], ["r0", "r1", "r2", "r3", "r4"])
+
+    def test_persistent_checkpoint_during_write(self):
+        # A compaction inside a write must snapshot the write itself, not the last published version
+        with tempfile.TemporaryDirectory() as directory:
+            store = ConcurrentInventory.open(directory, persistent=True)
+            store.insert({"id": "a1", "name": "Phone", "price": 1.0})
+            store.insert({"id": "b2", "name": "Phone", "price": 2.0})
+            store._compact_bytes = 0
+            store.insert({"id": "c3", "name": "Phone", "price": 3.0})
+            store.close()
+            reopened = ConcurrentInventory.open(directory, persistent=True)
+            self.assertEqual(sorted(product_id for product_id, _ in reopened.items()), ["a1", "b2", "c3"])
+            self.assertEqual([p["id"] for p in reopened.get_sorted_products()], ["a1", "b2", "c3"])
+            reopened.close()
+
+    def test_server_survives_failing_writes(self):
+        # An unexpected error fails only its own request (or its batch, for a failed sync)
+        class FailingLog:
+            fail = False
+            size = 0
+
+            def log_insert(self, product):
+                pass
+
+            def log_delete(self, product_id):
+                pass
+
+            def sync(self):
+                if self.fail:
+                    raise OSError("disk full")
+
+        class FailingInventory(Inventory):
+            failures = 1
+
+            def insert(self, product):
+                if self.failures:
+                    self.failures -= 1
+                    raise OSError("no space left on device")
+                return super().insert(product)
+
+        async def scenario():
+            store = FailingInventory()
+            store.log = FailingLog()
+            store._compact_bytes = 1 << 30
+            server = InventoryServer(store)
+            listener = await server.start("127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+
+            async def ask(*requests):
+                writer.write(b"".join(json.dumps(r).encode() + b"\n" for r in requests))
+                await writer.drain()
+                return [json.loads(await reader.readline()) for _ in requests]
+
+            product = {"name": "Phone", "price": 5.0}
+            first = await ask({"op": "insert", "product": dict(product, id="f1"), "req": 1},
+                              {"op": "insert", "product": dict(product, id="f2"), "req": 2},
+                              {"op": "get", "id": "f2", "req": 3})
+            store.log.fail = True
+            second = await ask({"op": "delete", "id": "f2", "req": 4})
+            store.log.fail = False
+            third = await ask({"op": "insert", "product": dict(product, id="f3"), "req": 5})
+            alive = not server._writer_task.done()
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            await server.stop()
+            return first + second + third, alive
+
+        responses, alive = asyncio.run(scenario())
+        self.assertEqual([r["ok"] for r in responses], [False, True, True, False, True])
+        self.assertIn("no space", responses[0]["error"])
+        self.assertIn("durable", responses[3]["error"])
+        self.assertEqual([r["req"] for r in responses], [1, 2, 3, 4, 5])
+        self.assertTrue(alive)
+
+    def test_cached_bulk_upsert_rejects_like_uncached(self):
+        # A malformed ID is reported the same way whether or not the inventory has a cache
+        rows = [{"id": ["x"], "name": "Phone", "price": 5.0}, {"id": "ok", "name": "Phone", "price": 6.0}]
+        reports = [Inventory(cache=cache).bulk_upsert([dict(row) for row in rows]) for cache in (None, QueryCache())]
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual(reports[1]["rejected"], {"invalid id": 1})
+
+    def test_corrupt_snapshot_raises_value_error(self):
+        # Out-of-range name codes and offsets are reported as an invalid snapshot
+        products = [{"id": "a", "name": "X", "price": 1.0}, {"id": "bb", "name": "Y", "price": 2.0}]
+        codes_at = _aligned(_aligned(_HEADER.size) + 8 * 2)
+        id_offsets_at = _aligned(codes_at + 4 * 2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "inventory.snap")
+            for position, value in ((codes_at, (7).to_bytes(4, "little")),
+                                    (id_offsets_at + 8, (99).to_bytes(8, "little")),
+                                    (id_offsets_at + 16, (0).to_bytes(8, "little"))):
+                write_snapshot(path, products)
+                with open(path, "r+b") as f:
+                    f.seek(position)
+                    f.write(value)
+                with self.assertRaises(ValueError):
+                    read_snapshot(path)
+            write_snapshot(path, products)
+            self.assertEqual(read_snapshot(path), products)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,115 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Reader-Writer Lock
+# Author: Unique Karanjit
+# Lets many threads read the inventory at once while writers get exclusive access
+# ----------------------------------------------------------------------------------------------------------------------
+
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    A lock held either by any number of readers or by a single writer.
+
+    Writers are preferred: once a writer is waiting, new readers wait behind it, so a steady
+    stream of lookups cannot starve updates. The lock is reentrant in the ways a method that
+    calls other locked methods needs: a thread holding the read lock may read again, and a
+    thread holding the write lock may read or write again. Upgrading a read to a write would
+    deadlock against another upgrading reader and raises RuntimeError instead.
+    """
+
+    def __init__(self):
+        """
+        Initializes an unlocked lock.
+        """
+        self._mutex = threading.Lock()
+        self._condition = threading.Condition(self._mutex)
+        self._readers = 0  # Threads holding the read lock.
+        self._writer = None  # Ident of the thread holding the write lock.
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()  # Per-thread read depth.
+
+    def acquire_read(self):
+        """
+        Blocks until no writer holds or is waiting for the lock, then takes a read hold.
+        """
+        local = self._local
+        depth = getattr(local, "reads", 0)
+        if depth or self._writer == threading.get_ident():
+            local.reads = depth + 1  # Already protected by this thread's outer hold.
+            return
+        with self._mutex:
+            while self._writer is not None or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        local.reads = 1
+
+    def release_read(self):
+        """
+        Releases a read hold.
+        """
+        local = self._local
+        local.reads -= 1
+        if local.reads or self._writer == threading.get_ident():
+            return
+        with self._mutex:
+            self._readers -= 1
+            if not self._readers and self._writers_waiting:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """
+        Blocks until no other thread holds the lock, then takes the write hold.
+
+        :raises RuntimeError: If this thread holds a read lock.
+        """
+        me = threading.get_ident()
+        if self._writer == me:
+            self._write_depth += 1
+            return
+        if getattr(self._local, "reads", 0):
+            raise RuntimeError("Cannot acquire the write lock while holding the read lock")
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self):
+        """
+        Releases a write hold.
+        """
+        self._write_depth -= 1
+        if self._write_depth:
+            return
+        with self._condition:
+            self._writer = None
+            self._condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        """
+        Holds the read lock for the duration of a with block.
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """
+        Holds the write lock for the duration of a with block.
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,334 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Inventory Network Server
+# Author: Unique Karanjit
+# Asyncio server exposing the inventory as line-delimited JSON over TCP or a Unix socket
+# ----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import asyncio
+import json
+from collections import deque
+
+from inventory import Inventory
+from product import Product, product_error
+from utils import generate_random_inventory
+
+# Requests are JSON objects, one per line, with an "op" and its arguments. An optional "req"
+# value is echoed back so that a client can match pipelined responses, which are always sent
+# in request order. Every response is {"ok": true, "result": ...} or {"ok": false, "error": ...}.
+#
+#   insert       {"product": {"id"?, "name", "price"}}     -> the stored product
+#   get          {"id"}                                     -> the product, or null
+#   prefix       {"prefix", "limit"?}                       -> products whose IDs start with prefix
+#   delete       {"id"}                                     -> true if deleted
+#   range        {"min", "max", "limit"?, "offset"?}        -> products in the price range
+#   min / max                                               -> the cheapest / most expensive product
+#   sorted_page  {"offset"?, "limit"?, "descending"?}       -> one page of products ordered by price
+#
+# Requests are validated before they are dispatched: IDs, names and prefixes are strings,
+# prices and price bounds are finite numbers, and limits and offsets are non-negative integers.
+WRITE_OPS = ("insert", "delete")
+READ_OPS = ("get", "prefix", "range", "min", "max", "sorted_page")
+DEFAULT_PAGE_SIZE = 100
+
+
+class InventoryServer:
+    """
+    Serves an Inventory to any number of clients over line-delimited JSON.
+
+    Each connection may pipeline requests: they are read as fast as they arrive and answered
+    in order. Reads are answered directly on the event loop. Writes from every connection go
+    to a single queue, and a writer task applies whatever has accumulated as one batch, so
+    concurrent writers share one commit (and one log fsync when the inventory has a
+    write-ahead log) instead of paying for one each. A read waits for the writes sent before
+    it on the same connection, so a client always sees its own writes.
+    """
+
+    def __init__(self, inventory, max_batch=512):
+        """
+        Initializes a server for an inventory.
+
+        :param inventory: The Inventory to serve. Only the server should modify it while it runs.
+        :param max_batch: The maximum number of writes applied in one batch.
+        """
+        self.inventory = inventory
+        self.max_batch = max_batch
+        self._writes = deque()  # (request, future) pairs waiting for the writer task.
+        self._wakeup = None
+        self._writer_task = None
+        self._readers = {}  # Connection handler task -> its stream reader.
+        self.batches = 0  # Number of write batches applied.
+        self.writes = 0  # Number of write requests applied.
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """
+        Starts listening, on a Unix socket if path is given and on TCP otherwise.
+
+        :return: The asyncio server; its sockets give the bound address (port 0 picks one).
+        """
+        self._wakeup = asyncio.Event()
+        self._writer_task = asyncio.ensure_future(self._apply_writes())
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve, path=path)
+        return await asyncio.start_server(self._serve, host, port)
+
+    async def stop(self):
+        """
+        Ends every open connection once the requests it has already sent are answered, then
+        stops the writer task once every queued write has been applied.
+        """
+        for reader in self._readers.values():
+            reader.feed_eof()
+        if self._readers:
+            await asyncio.gather(*self._readers, return_exceptions=True)
+        if self._writer_task is not None:
+            while self._writes:
+                await asyncio.sleep(0)
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+
+    async def _serve(self, reader, writer):
+        """
+        Handles one client connection.
+        """
+        task = asyncio.current_task()
+        self._readers[task] = reader
+        responses = asyncio.Queue()
+        sender = asyncio.ensure_future(self._send(responses, writer))
+        last_write = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line, parse_constant=_reject_constant)
+                    if not isinstance(request, dict):
+                        raise ValueError("A request must be a JSON object")
+                    _validate(request)
+                except ValueError as e:
+                    responses.put_nowait(_done(_error(request, str(e))))
+                    continue
+
+                if request.get("op") in WRITE_OPS:
+                    future = asyncio.get_running_loop().create_future()
+                    self._writes.append((request, future))
+                    self._wakeup.set()
+                    last_write = future
+                else:
+                    if last_write is not None and not last_write.done():
+                        await asyncio.wait([last_write])
+                    future = _done(self._respond(request, self._read))
+                responses.put_nowait(future)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            del self._readers[task]
+            responses.put_nowait(None)
+            await sender
+
+    async def _send(self, responses, writer):
+        """
+        Writes the responses of one connection in request order, draining once per burst.
+        """
+        try:
+            while True:
+                future = await responses.get()
+                if future is None:
+                    break
+                writer.write(json.dumps(await future, separators=(",", ":")).encode() + b"\n")
+                if responses.empty():
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _apply_writes(self):
+        """
+        Applies the queued writes in batches, in the order they arrived. A failed write only
+        fails its own request, and a failed log sync fails the whole batch, since none of it
+        is known to be durable; either way the task keeps serving later writes.
+        """
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._writes:
+                batch = [self._writes.popleft() for _ in range(min(self.max_batch, len(self._writes)))]
+                results = [self._respond(request, self._write) for request, _ in batch]
+                log = self.inventory.log
+                if log is not None:
+                    try:
+                        log.sync()  # One fsync makes the whole batch durable before anyone is answered.
+                    except Exception as e:
+                        results = [_error(request, f"The write could not be made durable: {e}") for request, _ in batch]
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+                self.batches += 1
+                self.writes += len(batch)
+                await asyncio.sleep(0)  # Let readers run between batches.
+
+    def _respond(self, request, handler):
+        """
+        Runs a handler and wraps its result or error in a response.
+        """
+        try:
+            response = {"ok": True, "result": handler(request)}
+        except Exception as e:
+            return _error(request, str(e) or type(e).__name__)
+        if "req" in request:
+            response["req"] = request["req"]
+        return response
+
+    def _write(self, request):
+        """
+        Applies one write request.
+        """
+        if request["op"] == "insert":
+            return _plain(self.inventory.insert(request["product"]))
+        return self.inventory.delete(request["id"])
+
+    def _read(self, request):
+        """
+        Answers one read request.
+        """
+        op = request.get("op")
+        inventory = self.inventory
+        if op == "get":
+            return _plain(inventory.get(request["id"]))
+        if op == "prefix":
+            return [_plain(product) for product in inventory.find_by_prefix(request["prefix"], request.get("limit"))]
+        if op == "range":
+            return list(inventory.iter_range(request["min"], request["max"], limit=request.get("limit"),
+                                             offset=request.get("offset", 0)))
+        if op == "min":
+            return inventory.find_cheapest()
+        if op == "max":
+            return inventory.find_most_expensive()
+        if op == "sorted_page":
+            return list(inventory.iter_range(float('-inf'), float('inf'), request.get("descending", False),
+                                             request.get("limit", DEFAULT_PAGE_SIZE), request.get("offset", 0)))
+        raise ValueError(f"Unknown op {op!r}")
+
+
+def _error(request, message):
+    """
+    Returns an error response to a request.
+    """
+    response = {"ok": False, "error": message}
+    if isinstance(request, dict) and "req" in request:
+        response["req"] = request["req"]
+    return response
+
+
+def _reject_constant(name):
+    """
+    Rejects the NaN, Infinity and -Infinity literals that json.loads accepts by default.
+    """
+    raise ValueError(f"{name} is not a valid JSON number")
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _validate(request):
+    """
+    Checks a request's op and argument types before it is dispatched.
+
+    :raises ValueError: If the op is unknown or an argument is missing or has the wrong type.
+    """
+    op = request.get("op")
+    if op not in WRITE_OPS and op not in READ_OPS:
+        raise ValueError(f"Unknown op {op!r}")
+    if op == "insert":
+        product = request.get("product")
+        if not isinstance(product, dict):
+            raise ValueError("product must be an object")
+        error = product_error(product)
+        if error is not None:
+            raise ValueError(f"Invalid product: {error}")
+    elif op in ("get", "delete") and not isinstance(request.get("id"), str):
+        raise ValueError("id must be a string")
+    elif op == "prefix" and not isinstance(request.get("prefix"), str):
+        raise ValueError("prefix must be a string")
+    elif op == "range" and not (_is_number(request.get("min")) and _is_number(request.get("max"))):
+        raise ValueError("min and max must be numbers")
+    if request.get("limit") is not None and not _is_count(request["limit"]):
+        raise ValueError("limit must be a non-negative integer")
+    if "offset" in request and not _is_count(request["offset"]):
+        raise ValueError("offset must be a non-negative integer")
+    if "descending" in request and not isinstance(request["descending"], bool):
+        raise ValueError("descending must be a boolean")
+
+
+def _done(result):
+    """
+    Returns a future that already holds result.
+    """
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(result)
+    return future
+
+
+def _plain(product):
+    """
+    Returns a product as a JSON-serializable dictionary.
+    """
+    return product.to_dict() if isinstance(product, Product) else product
+
+
+async def serve(inventory, host="127.0.0.1", port=8765, path=None, max_batch=512):
+    """
+    Serves an inventory until the task is cancelled.
+    """
+    server = InventoryServer(inventory, max_batch)
+    listener = await server.start(host, port, path)
+    address = path or "%s:%d" % listener.sockets[0].getsockname()[:2]
+    print(f"Serving {len(inventory)} products on {address}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the inventory as line-delimited JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--data", metavar="DIR", help="Open a durable inventory (snapshot and log) in DIR")
+    parser.add_argument("--products", type=int, default=0, help="Start with this many random products")
+    parser.add_argument("--max-batch", type=int, default=512)
+    args = parser.parse_args()
+
+    if args.data:
+        # The server syncs the log once per write batch, so the log itself never has to.
+        inventory = Inventory.open(args.data, sync_every=1 << 30, sync_interval=float('inf'))
+    else:
+        inventory = Inventory()
+    if args.products:
+        categories = ["Laptop", "Phone", "Tablet", "Watch", "Camera", "Headphones", "Speaker", "Charger"]
+        inventory.bulk_upsert(generate_random_inventory(categories, args.products))
+    try:
+        asyncio.run(serve(inventory, args.host, args.port, args.unix, args.max_batch))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.data:
+            inventory.close()
+
+
+if __name__ == "__main__":
+    main()
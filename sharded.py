@@ -0,0 +1,496 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Sharded Inventory
+# Author: Unique Karanjit
+# Partitions the inventory by product ID hash across worker processes so that work spreads over several cores
+# ----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+import uuid
+import zlib
+from collections.abc import Iterator
+from heapq import merge as merge_sorted
+from itertools import chain, islice
+from operator import itemgetter
+
+from inventory import Inventory
+from product import PRODUCT_TYPES
+from utils import generate_random_inventory
+
+CATEGORIES = ["Laptop", "Phone", "Tablet", "Watch", "Camera", "Headphones", "Speaker", "Charger"]
+
+
+def shard_of(product_id, shards):
+    """
+    Returns the shard that owns a product ID. CRC-32 is stable across processes and runs,
+    unlike hash(), so a directory of shards can be reopened with the same routing.
+    """
+    return zlib.crc32(str(product_id).encode()) % shards
+
+
+def _run_shard(connection, directory, options):
+    """
+    The loop of a worker process: owns one Inventory and answers batches of calls on it.
+
+    Every message is a list of (method name, args, kwargs) calls. The reply is a list with
+    one (True, result) or (False, exception) pair per call; lazy results are collected first.
+    A None message closes the inventory and ends the worker.
+    """
+    inventory = Inventory.open(directory, **options) if directory else Inventory(**options)
+    try:
+        while True:
+            calls = connection.recv()
+            if calls is None:
+                break
+            replies = []
+            for name, args, kwargs in calls:
+                try:
+                    result = getattr(inventory, name)(*args, **kwargs)
+                    if isinstance(result, Iterator):
+                        result = list(result)
+                    replies.append((True, result))
+                except Exception as e:
+                    replies.append((False, e))
+            connection.send(replies)
+    except (EOFError, KeyboardInterrupt):
+        pass  # The coordinator went away.
+    finally:
+        if directory:
+            inventory.close()
+        connection.close()
+
+
+class ShardedInventory:
+    """
+    An inventory partitioned across worker processes, each owning a HashTable/AVLTree pair.
+
+    A single process is held to one core by the GIL. Here every product lives on the shard
+    chosen by the CRC-32 of its ID, and each shard is an Inventory in its own process. The
+    coordinator (this object) routes lookups and updates by ID to one shard, and splits
+    batches so that every shard works on its part at the same time. Price queries are sent
+    to every shard at once; each shard answers from its own tree in price order, and the
+    sorted answers are combined with a k-way heap merge, so a page of k results costs each
+    shard O(log N + k).
+
+    Products and results cross a process boundary, so they are copies: changing a returned
+    product does not change the stored one. The coordinator is not thread-safe.
+    """
+
+    SHARDS_FILE = "shards"
+
+    def __init__(self, shards=None, directory=None, **options):
+        """
+        Starts the worker processes.
+
+        :param shards: The number of shards. Defaults to the count stored in directory, or
+                       else to the number of CPUs.
+        :param directory: If given, each shard is a durable inventory (see Inventory.open) in
+                          its own subdirectory. The shard count is stored there too, since
+                          reopening with another count would route IDs to the wrong shards.
+        :param options: Further keyword arguments for each shard's Inventory (or Inventory.open).
+        :raises ValueError: If shards is less than one, or differs from the count stored in directory.
+        """
+        if directory:
+            shards = self._check_shard_count(directory, shards)
+        elif shards is None:
+            shards = os.cpu_count() or 1
+        if shards < 1:
+            raise ValueError("A sharded inventory needs at least one shard")
+        self._connections = []
+        self._processes = []
+        for number in range(shards):
+            path = os.path.join(directory, f"shard-{number}") if directory else None
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_run_shard, args=(child, path, options), daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+
+    @classmethod
+    def _check_shard_count(cls, directory, shards):
+        """
+        Returns the shard count of a durable directory, recording it if the directory is new.
+
+        :raises ValueError: If shards is given and differs from the recorded count.
+        """
+        path = os.path.join(directory, cls.SHARDS_FILE)
+        try:
+            with open(path) as f:
+                stored = int(f.read())
+        except FileNotFoundError:
+            stored = None
+        if stored is not None:
+            if shards is not None and shards != stored:
+                raise ValueError(f"{directory} holds {stored} shards, not {shards}")
+            return stored
+        if shards is None:
+            shards = os.cpu_count() or 1
+        if shards < 1:
+            raise ValueError("A sharded inventory needs at least one shard")
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(f"{shards}\n")
+        return shards
+
+    @property
+    def shards(self):
+        """
+        Returns the number of shards.
+        """
+        return len(self._connections)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Messaging
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def _scatter(self, batches):
+        """
+        Sends each shard its batch of calls, then collects the results. The shards work in
+        parallel while the coordinator waits.
+
+        :param batches: A dictionary mapping shard numbers to lists of (name, args, kwargs) calls.
+        :return: A dictionary mapping the same shard numbers to lists of results.
+        :raises Exception: The first error raised by any call, once every shard has replied.
+        """
+        if self._connections is None:
+            raise ValueError("The sharded inventory is closed")
+        for shard, calls in batches.items():
+            self._connections[shard].send(calls)
+        results, error = {}, None
+        for shard in batches:
+            replies = self._connections[shard].recv()
+            for ok, value in replies:
+                if not ok and error is None:
+                    error = value
+            results[shard] = [value for _, value in replies]
+        if error is not None:
+            raise error
+        return results
+
+    def _call(self, shard, name, *args, **kwargs):
+        """
+        Runs one Inventory method on one shard and returns its result.
+        """
+        return self._scatter({shard: [(name, args, kwargs)]})[shard][0]
+
+    def _broadcast(self, name, *args, **kwargs):
+        """
+        Runs one Inventory method on every shard and returns the list of their results.
+        """
+        call = [(name, args, kwargs)]
+        results = self._scatter({shard: call for shard in range(self.shards)})
+        return [results[shard][0] for shard in range(self.shards)]
+
+    def _route(self, product):
+        """
+        Returns the shard for a product, giving it a new ID first if it has none. Values that
+        are not products go to shard 0, which rejects them.
+        """
+        if not isinstance(product, PRODUCT_TYPES):
+            return 0
+        product_id = product.get('id')
+        if product_id is None or product_id == "":
+            product_id = str(uuid.uuid4())
+            product['id'] = product_id
+        return shard_of(product_id, self.shards)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def insert(self, product):
+        """
+        Inserts a product, or replaces the product with the same ID, see Inventory.insert.
+
+        :return: A copy of the stored product.
+        """
+        return self._call(self._route(product), "insert", product)
+
+    def update_price(self, product_id, price):
+        """
+        Changes a product's price, see Inventory.update_price.
+        """
+        return self._call(shard_of(product_id, self.shards), "update_price", product_id, price)
+
+    def delete(self, product_id):
+        """
+        Deletes a product, see Inventory.delete.
+
+        :return: True if deleted, False if not found.
+        """
+        return self._call(shard_of(product_id, self.shards), "delete", product_id)
+
+    def bulk_upsert(self, products):
+        """
+        Splits a batch of products by shard and loads every part at the same time, see
+        Inventory.bulk_upsert.
+
+        :return: The counts of inserted, updated and rejected products over all shards.
+        """
+        parts = {}
+        for product in products:
+            parts.setdefault(self._route(product), []).append(product)
+        report = {"inserted": 0, "updated": 0, "rejected": {}}
+        results = self._scatter({shard: [("bulk_upsert", (part,), {})] for shard, part in parts.items()})
+        for (result,) in results.values():
+            report["inserted"] += result["inserted"]
+            report["updated"] += result["updated"]
+            for reason, count in result["rejected"].items():
+                report["rejected"][reason] = report["rejected"].get(reason, 0) + count
+        return report
+
+    def bulk_delete(self, ids):
+        """
+        Splits a batch of IDs by shard and deletes every part at the same time.
+
+        :return: The counts of deleted and missing IDs over all shards.
+        """
+        parts = {}
+        for product_id in ids:
+            parts.setdefault(shard_of(product_id, self.shards), []).append(product_id)
+        results = self._scatter({shard: [("bulk_delete", (part,), {})] for shard, part in parts.items()})
+        return {
+            "deleted": sum(result["deleted"] for (result,) in results.values()),
+            "missing": sum(result["missing"] for (result,) in results.values()),
+        }
+
+    def checkpoint(self):
+        """
+        Checkpoints every durable shard, see Inventory.checkpoint.
+        """
+        self._broadcast("checkpoint")
+
+    def close(self):
+        """
+        Stops the worker processes, closing durable shards first. Safe to call twice.
+        """
+        if self._connections is None:
+            return
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for connection, process in zip(self._connections, self._processes):
+            process.join()
+            connection.close()
+        self._connections = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Lookups by ID
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def get(self, product_id):
+        """
+        Returns a copy of the product with the given ID, or None.
+        """
+        return self._call(shard_of(product_id, self.shards), "get", product_id)
+
+    def get_many(self, ids):
+        """
+        Looks up a batch of IDs with one message per shard.
+
+        :return: A list with a copy of each product (or None), in the order of ids.
+        """
+        ids = ids if isinstance(ids, (list, tuple)) else list(ids)
+        owners = [shard_of(product_id, self.shards) for product_id in ids]
+        batches = {}
+        for product_id, shard in zip(ids, owners):
+            batches.setdefault(shard, []).append(("get", (product_id,), {}))
+        results = {shard: iter(values) for shard, values in self._scatter(batches).items()}
+        return [next(results[shard]) for shard in owners]
+
+    def find_by_prefix(self, prefix, limit=None):
+        """
+        Returns the products whose IDs start with prefix, in key order like
+        HashTable.find_by_prefix. Every shard returns its first limit matches in that order and
+        the lists are merged, so the result is the first limit matching IDs of all shards.
+        """
+        pages = self._broadcast("find_by_prefix", prefix, limit)
+        return list(islice(merge_sorted(*pages, key=lambda product: str(product['id']).lower()), limit))
+
+    def items(self):
+        """
+        Returns every (product ID, product) pair.
+        """
+        return list(chain.from_iterable(self._broadcast("items")))
+
+    def __contains__(self, product_id):
+        return self.get(product_id) is not None
+
+    def __len__(self):
+        """
+        Returns the number of products on all shards.
+        """
+        return sum(self._broadcast("__len__"))
+
+    def __bool__(self):
+        """
+        Returns True if any shard holds a product.
+        """
+        return any(self._broadcast("__bool__"))
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Queries by price
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def find_cheapest(self):
+        """
+        Returns the cheapest product of all shards, or None if the inventory is empty.
+        """
+        products = [product for product in self._broadcast("find_cheapest") if product is not None]
+        return min(products, key=itemgetter('price')) if products else None
+
+    def find_most_expensive(self):
+        """
+        Returns the most expensive product of all shards, or None if the inventory is empty.
+        """
+        products = [product for product in self._broadcast("find_most_expensive") if product is not None]
+        return max(products, key=itemgetter('price')) if products else None
+
+    def iter_range(self, min_price, max_price, descending=False, limit=None, offset=0):
+        """
+        Yields the products priced between min_price and max_price in price order, see
+        Inventory.iter_range. Each shard returns its first offset + limit matches and the
+        sorted lists are merged, so no shard sends more than the page could need.
+        """
+        if limit is not None and limit <= 0:
+            return iter(())
+        end = None if limit is None else offset + limit
+        pages = self._broadcast("iter_range", min_price, max_price, descending, end)
+        return islice(merge_sorted(*pages, key=itemgetter('price'), reverse=descending), offset, end)
+
+    def find_products_in_range(self, min_price, max_price):
+        """
+        Returns the products priced between min_price and max_price (inclusive).
+        """
+        return list(self.iter_range(min_price, max_price))
+
+    def count_in_range(self, min_price, max_price):
+        """
+        Returns the number of products priced between min_price and max_price (inclusive).
+        """
+        return sum(self._broadcast("count_in_range", min_price, max_price))
+
+    def top_k(self, k, descending=False):
+        """
+        Returns the k cheapest products, or the k most expensive ones if descending is True.
+        """
+        return list(self.iter_range(float('-inf'), float('inf'), descending, k))
+
+    def get_sorted_products(self, descending=False):
+        """
+        Yields every product ordered by price.
+        """
+        return self.iter_range(float('-inf'), float('inf'), descending)
+
+    def categories(self):
+        """
+        Returns the number of products in each category over all shards.
+        """
+        counts = {}
+        for shard_counts in self._broadcast("categories"):
+            for category, count in shard_counts.items():
+                counts[category] = counts.get(category, 0) + count
+        return counts
+
+    def find_by_category(self, category, min_price=None, max_price=None, limit=None):
+        """
+        Returns the products of a category in ascending price order, see Inventory.find_by_category.
+        """
+        pages = self._broadcast("find_by_category", category, min_price, max_price, limit)
+        return list(islice(merge_sorted(*pages, key=itemgetter('price')), limit))
+
+    def count_by_category(self, category, min_price=None, max_price=None):
+        """
+        Returns the number of products of a category within a price range.
+        """
+        return sum(self._broadcast("count_by_category", category, min_price, max_price))
+
+    def is_consistent(self):
+        """
+        Checks every shard's indexes and that every product is on the shard its ID routes to.
+        Runs in O(N); intended for tests and diagnostics.
+        """
+        if not all(self._broadcast("is_consistent")):
+            return False
+        return all(
+            shard_of(product_id, self.shards) == shard
+            for shard, items in enumerate(self._broadcast("items"))
+            for product_id, _ in items
+        )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------------------------------------------------------
+
+def benchmark(shards, products=200000, batch=1000, queries=2000, seed=0):
+    """
+    Measures a sharded inventory: a bulk load, batched lookups by ID, and price queries.
+    shards=0 measures a plain in-process Inventory for comparison.
+
+    :param shards: The number of worker processes (0 for none).
+    :param products: The number of random products to load.
+    :param batch: The number of products per bulk load and IDs per get_many.
+    :param queries: The number of range, count and top-k queries.
+    :return: A dictionary of operations per second for "load", "get", "range", "count" and "top_k".
+    """
+    data = generate_random_inventory(CATEGORIES, products, seed=seed)
+    ids = [product['id'] for product in data]
+    rng = random.Random(seed)
+    windows = [(low, low + 10) for low in (round(rng.uniform(10, 1990), 2) for _ in range(queries))]
+    store = ShardedInventory(shards) if shards else Inventory()
+    get_many = store.get_many if shards else (lambda batch_ids: [store.get(i) for i in batch_ids])
+    top_k = store.top_k if shards else (lambda k: list(store.iter_range(float('-inf'), float('inf'), False, k)))
+    report = {}
+    try:
+        def timed(name, count, run):
+            start = time.perf_counter()
+            run()
+            report[name] = count / (time.perf_counter() - start)
+
+        timed("load", products, lambda: [store.bulk_upsert(data[i:i + batch]) for i in range(0, products, batch)])
+        timed("get", products, lambda: [get_many(ids[i:i + batch]) for i in range(0, products, batch)])
+        timed("range", queries, lambda: [list(store.iter_range(low, high, limit=20)) for low, high in windows])
+        timed("count", queries, lambda: [store.count_in_range(low, high) for low, high in windows])
+        timed("top_k", queries, lambda: [top_k(10) for _ in range(queries)])
+    finally:
+        if shards:
+            store.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sharded inventory against a single process.")
+    parser.add_argument("--shards", type=int, nargs="+",
+                        help="Shard counts to measure (default: 1, 2, 4... up to the CPU count)")
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=1000, help="Products per bulk load and IDs per lookup batch")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = args.shards
+    if not counts:
+        cpus = os.cpu_count() or 1
+        counts = sorted({min(2 ** power, cpus) for power in range(cpus.bit_length() + 1)})
+    print(f"{'shards':>8}{'load/s':>12}{'get/s':>12}{'range/s':>12}{'count/s':>12}{'top_k/s':>12}")
+    for shards in [0] + counts:
+        report = benchmark(shards, args.products, args.batch, args.queries, args.seed)
+        label = shards if shards else "local"
+        print(f"{label:>8}" + "".join(f"{report[name]:>12.0f}" for name in ("load", "get", "range", "count", "top_k")))
+
+
+if __name__ == "__main__":
+    main()
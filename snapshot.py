@@ -0,0 +1,193 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Binary Inventory Snapshots
+# Author: Unique Karanjit
+# Compact columnar file format used to persist the inventory and restore it quickly
+# ----------------------------------------------------------------------------------------------------------------------
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from product import Product
+
+# File layout (little-endian). Every section starts on an 8-byte boundary.
+#
+#   header        magic, version, name count, product count, ID bytes, name bytes
+#   prices        float64[count]        ascending, so the price tree can be built presorted
+#   name_codes    uint32[count]         index into the name table
+#   id_offsets    uint64[count + 1]     into the ID blob
+#   name_offsets  uint64[names + 1]     into the name blob
+#   ids           UTF-8 blob
+#   names         UTF-8 blob
+MAGIC = b"INVSNAP\x00"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIQQQ")
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def write_snapshot(path, products):
+    """
+    Writes products to a snapshot file.
+
+    The file is written to a temporary file next to path and then renamed over it, so a
+    crash never leaves a partially written snapshot behind.
+
+    :param path: The snapshot file to create or replace.
+    :param products: An iterable of product dictionaries or Product records. IDs must be strings.
+    :return: The number of products written.
+    :raises ValueError: If a product ID is not a non-empty string.
+    """
+    products = products if isinstance(products, (list, tuple)) else list(products)
+    count = len(products)
+
+    prices = np.fromiter((product['price'] for product in products), dtype=np.float64, count=count)
+    order = np.argsort(prices, kind='stable')
+    prices = prices[order]
+    rows = [products[i] for i in order.tolist()]
+
+    ids = []
+    for product in rows:
+        product_id = product['id']
+        if type(product_id) is not str or not product_id:
+            raise ValueError(f"Snapshot product IDs must be non-empty strings, got {product_id!r}")
+        ids.append(product_id)
+
+    name_codes = {}
+    codes = np.fromiter(
+        (name_codes.setdefault(product['name'], len(name_codes)) for product in rows), dtype=np.uint32, count=count
+    )
+    names = [name.encode() for name in name_codes]
+    encoded_ids = [product_id.encode() for product_id in ids]
+
+    id_offsets = np.zeros(count + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded_ids], out=id_offsets[1:])
+    name_offsets = np.zeros(len(names) + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in names], out=name_offsets[1:])
+    ids_blob = b"".join(encoded_ids)
+    names_blob = b"".join(names)
+
+    header = _HEADER.pack(MAGIC, VERSION, len(names), count, len(ids_blob), len(names_blob))
+    sections = [header, prices.astype('<f8').tobytes(), codes.astype('<u4').tobytes(),
+                id_offsets.astype('<u8').tobytes(),
+                name_offsets.astype('<u8').tobytes(), ids_blob, names_blob]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            position = 0
+            for section in sections:
+                padding = _aligned(position) - position
+                f.write(b"\0" * padding)
+                f.write(section)
+                position += padding + len(section)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(directory)
+    return count
+
+
+def _fsync_directory(directory):
+    """
+    Makes a rename inside directory durable, where the platform supports it.
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _column_error(arrays, name_count, ids_size, names_size):
+    """
+    Checks that every name code and offset points inside its table or blob, so that a
+    corrupted file is reported as invalid instead of failing with an IndexError. The error
+    is returned rather than raised, so that no traceback keeps a view of the map alive.
+
+    :return: A description of the first problem found, or None.
+    """
+    _, codes, id_offsets, name_offsets = arrays
+    if len(codes) and int(codes.max()) >= name_count:
+        return "a name code out of range"
+    for offsets, size in ((id_offsets, ids_size), (name_offsets, names_size)):
+        if int(offsets[-1]) > size or (len(offsets) > 1 and bool((np.diff(offsets.astype(np.int64)) < 0).any())):
+            return "an offset out of range"
+    return None
+
+
+def read_snapshot(path, as_records=False):
+    """
+    Reads a snapshot file through a memory map.
+
+    The numeric columns are decoded in bulk with NumPy and the IDs are sliced out of a
+    single decoded string, so no per-product parsing happens.
+
+    :param path: The snapshot file.
+    :param as_records: Return Product records instead of product dictionaries.
+    :return: The products, in ascending price order.
+    :raises ValueError: If the file is not a valid snapshot.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size:
+            raise ValueError(f"{path} is not an inventory snapshot")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, name_count, count, ids_size, names_size = _HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an inventory snapshot")
+            if version != VERSION:
+                raise ValueError(f"Unsupported snapshot version {version}")
+
+            position = _HEADER.size
+            arrays = []
+            for dtype, length in (('<f8', count), ('<u4', count),
+                                  ('<u8', count + 1), ('<u8', name_count + 1)):
+                position = _aligned(position)
+                end = position + np.dtype(dtype).itemsize * length
+                if end > len(mm):
+                    raise ValueError(f"Snapshot {path} is truncated")
+                arrays.append(np.frombuffer(mm, dtype=dtype, count=length, offset=position))
+                position = end
+            error = _column_error(arrays, name_count, ids_size, names_size)
+            # Copy the columns out of the map as lists, so no view outlives the mmap.
+            columns = None if error else [array.tolist() for array in arrays]
+            del arrays
+            if error:
+                raise ValueError(f"Snapshot {path} has {error}")
+            ids_start = _aligned(position)
+            names_start = _aligned(ids_start + ids_size)
+            if names_start + names_size > len(mm):
+                raise ValueError(f"Snapshot {path} is truncated")
+            ids_blob = mm[ids_start:ids_start + ids_size]
+            names_blob = mm[names_start:names_start + names_size]
+
+    prices, codes, id_offsets, name_offsets = columns
+    names = [names_blob[a:b].decode() for a, b in zip(name_offsets, name_offsets[1:])]
+
+    ids_text = ids_blob.decode()
+    if len(ids_text) == ids_size:
+        # Pure ASCII (the usual case for UUIDs): byte offsets are also character offsets.
+        ids = [ids_text[a:b] for a, b in zip(id_offsets, id_offsets[1:])]
+    else:
+        ids = [ids_blob[a:b].decode() for a, b in zip(id_offsets, id_offsets[1:])]
+
+    row_names = [names[code] for code in codes]
+    if as_records:
+        products = list(map(Product, ids, row_names, prices))
+    else:
+        products = [{"id": i, "name": n, "price": p} for i, n, p in zip(ids, row_names, prices)]
+    return products
@@ -4,33 +4,103 @@
 # Feb 2, 2025
 # ----------------------------------------------------------------------------------------------------------------------
 
-import random
+import gc
+import math
+import os
+from contextlib import contextmanager
+import numpy as np
 from tabulate import tabulate
 import uuid
+from product import Product, PRODUCT_TYPES, product_error
 
 # Function to generate a list of random products based on categories and quantity
-def generate_random_inventory(categories, noOfProducts):
+def generate_random_inventory(categories, noOfProducts, as_records=False, seed=None):
     """
     Generates a list of random products with prices having 2 decimal places
+
+    Args:
+    categories (list): The product names to choose from.
+    noOfProducts (int): The number of products to generate.
+    as_records (bool): Generate compact Product records instead of dictionaries.
+    seed (int, optional): Seed for reproducible inventories. If None, the inventory is random.
     """
-    if noOfProducts <= 0:
-        raise ValueError("Number of products must be positive")
     if noOfProducts > 1000000:  # Set reasonable limit
         raise ValueError("Too many products requested")
-    if not categories:
-        raise ValueError("Categories list cannot be empty")
     products = []
-    for i in range(noOfProducts):
-        # Generate price with 2 decimal places between 50 and 2000
-        price = round(random.uniform(50, 2000), 2)
-        product = {
-            "id": str(uuid.uuid4()),
-            "name": random.choice(categories),
-            "price": price
-        }
-        products.append(product)
+    for chunk in iter_random_inventory(categories, noOfProducts, as_records=as_records, seed=seed):
+        products.extend(chunk)
     return products
 
+# Function to stream random products in chunks
+def iter_random_inventory(categories, noOfProducts, chunk_size=10000, as_records=False, seed=None):
+    """
+    Yields random products in lists of at most chunk_size products, so that large fixtures
+    can be generated and consumed without holding them all in memory.
+
+    Prices and categories are drawn for a whole chunk at once with NumPy, and the IDs are
+    minted in bulk from random bytes formatted as version 4 UUIDs.
+
+    Args:
+    categories (list): The product names to choose from.
+    noOfProducts (int): The total number of products to generate.
+    chunk_size (int): The maximum number of products per chunk.
+    as_records (bool): Generate compact Product records instead of dictionaries.
+    seed (int, optional): Seed for reproducible inventories, IDs included. If None, the IDs
+        come from os.urandom like uuid.uuid4().
+
+    Yields:
+    list: The next chunk of products.
+    """
+    if noOfProducts <= 0:
+        raise ValueError("Number of products must be positive")
+    if not categories:
+        raise ValueError("Categories list cannot be empty")
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be positive")
+    return _random_inventory_chunks(categories, noOfProducts, chunk_size, as_records, seed)
+
+def _random_inventory_chunks(categories, noOfProducts, chunk_size, as_records, seed):
+    """
+    Generator behind iter_random_inventory, which validates its arguments up front.
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array(categories, dtype=object)
+    remaining = noOfProducts
+    while remaining:
+        size = min(chunk_size, remaining)
+        remaining -= size
+
+        # Generate prices with 2 decimal places between 50 and 2000
+        prices = np.round(rng.uniform(50, 2000, size), 2).tolist()
+        chosen = names[rng.integers(0, len(categories), size)].tolist()
+        ids = _random_uuids(size, None if seed is None else rng)
+
+        if as_records:
+            yield list(map(Product, ids, chosen, prices))
+        else:
+            yield [{"id": id, "name": name, "price": price} for id, name, price in zip(ids, chosen, prices)]
+
+def _random_uuids(count, rng=None):
+    """
+    Mints count random version 4 UUID strings at once.
+
+    Args:
+    count (int): The number of IDs to generate.
+    rng (numpy.random.Generator, optional): Source of the random bytes. If None, os.urandom is used.
+
+    Returns:
+    list: The UUIDs, formatted like str(uuid.uuid4()).
+    """
+    raw = os.urandom(16 * count) if rng is None else rng.bytes(16 * count)
+    octets = np.frombuffer(raw, dtype=np.uint8).reshape(count, 16).copy()
+    octets[:, 6] = (octets[:, 6] & 0x0F) | 0x40  # Version 4
+    octets[:, 8] = (octets[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    digits = octets.tobytes().hex()
+    return [
+        f"{digits[i:i + 8]}-{digits[i + 8:i + 12]}-{digits[i + 12:i + 16]}-{digits[i + 16:i + 20]}-{digits[i + 20:i + 32]}"
+        for i in range(0, 32 * count, 32)
+    ]
+
 # Function to print the full inventory as a table
 def print_inventory(inventory):
     """
@@ -41,28 +111,28 @@ def print_inventory(inventory):
     
     """
     print("\n------Full Inventory------\n")
-    print(tabulate(inventory, headers="keys", tablefmt="grid"))
+    rows = [product.to_dict() if isinstance(product, Product) else product for product in inventory]
+    print(tabulate(rows, headers="keys", tablefmt="grid"))
 
 # Function to print a hash table (dictionary) as a table
 def print_hashTable_as_table(hashTable):
     """
     Prints the hash table contents in a tabulated format with formatted prices
     """
-    if not any(bucket for bucket in hashTable.table):
+    if not hashTable:
         print("\nInventory is empty!")
         return
         
     products = []
-    for bucket in hashTable.table:
-        for _, product in bucket:
-            if isinstance(product, dict):
-                short_id = product.get('id', '')[:8] if product.get('id') else ''
-                price = f"${product.get('price', 0):.2f}"
-                products.append([
-                    short_id,
-                    product.get('name', ''),
-                    price
-                ])
+    for _, product in hashTable.items():
+        if isinstance(product, PRODUCT_TYPES):
+            short_id = product.get('id', '')[:8] if product.get('id') else ''
+            price = f"${product.get('price', 0):.2f}"
+            products.append([
+                short_id,
+                product.get('name', ''),
+                price
+            ])
 
     headers = ['ID', 'Name', 'Price']
     print("\nCurrent Inventory:")
@@ -76,16 +146,135 @@ def initialize_inventory(inventory, hashTable, avlTree):
     if not inventory:
         print("Warning: Empty inventory provided for initialization")
         return
-        
-    for product in inventory:
-        if not all(key in product for key in ['id', 'name', 'price']):
-            print(f"Warning: Skipping invalid product data: {product}")
+
+    report = bulk_upsert(hashTable, avlTree, inventory)
+    if report["rejected"]:
+        reasons = ", ".join(f"{count} {reason}" for reason, count in report["rejected"].items())
+        print(f"Warning: Skipped {sum(report['rejected'].values())} invalid products ({reasons})")
+
+# Function to insert or update a batch of products in the hash table and the AVL tree
+def bulk_upsert(hashTable, avlTree, products, stored=None):
+    """
+    Inserts or updates a batch of products in both data structures.
+
+    The batch is validated in a single pass, the hash table is pre-sized once for the whole
+    batch and the AVL tree is fed one sorted batch. Products without an ID get a generated
+    one. When an existing product's price changes, its old tree entry is removed. If the batch
+    holds the same ID more than once, the last occurrence wins.
+
+    Args:
+    hashTable (HashTable): The hash table keyed by product ID.
+    avlTree (AVLTree): The AVL tree keyed by price.
+    products (iterable): Product dictionaries or Product records.
+    stored (list, optional): If given, the products that were stored are appended to it,
+        which lets callers maintain further indexes without looking them up again.
+
+    Returns:
+    dict: The number of products "inserted" and "updated", and the "rejected" products
+    counted by reason.
+    """
+    with gc_paused():
+        return _bulk_upsert(hashTable, avlTree, products, stored)
+
+def _bulk_upsert(hashTable, avlTree, products, stored):
+    rejected = {}
+    batch = {}
+    unnamed = []
+    for product in products:
+        reason = product_error(product)
+        if reason is not None:
+            rejected[reason] = rejected.get(reason, 0) + 1
+            continue
+        product_id = product.get("id")
+        if product_id is None or product_id == "":
+            unnamed.append(product)
+        else:
+            batch[product_id] = product
+
+    if unnamed:
+        for product, product_id in zip(unnamed, _random_uuids(len(unnamed))):
+            product["id"] = product_id
+            batch[product_id] = product
+
+    stale = []
+    tree_items = []
+    updated = 0
+    if not hashTable:
+        # Nothing to update: every product is new.
+        tree_items = [(product["price"], product) for product in batch.values()]
+    else:
+        for product_id, product in batch.items():
+            existing = hashTable.get(product_id)
+            if existing is not None:
+                updated += 1
+                # Prefer the price the tree actually holds, in case the stored product was
+                # modified in place.
+                stored_price = avlTree.price_of(product_id)
+                if stored_price is None:
+                    stored_price = existing["price"]
+                if stored_price != product["price"]:
+                    stale.append((stored_price, product_id))
+                elif existing is product:
+                    continue  # Already stored under this price.
+            tree_items.append((product["price"], product))
+
+    if stale:
+        avlTree.delete_many(stale)
+    hashTable.insert_many(batch.items())
+    avlTree.merge(tree_items)
+    if stored is not None:
+        stored.extend(batch.values())
+    return {"inserted": len(batch) - updated, "updated": updated, "rejected": rejected}
+
+# Function to delete a batch of products from the hash table and the AVL tree
+def bulk_delete(hashTable, avlTree, ids):
+    """
+    Deletes a batch of products from both data structures.
+
+    Args:
+    hashTable (HashTable): The hash table keyed by product ID.
+    avlTree (AVLTree): The AVL tree keyed by price.
+    ids (iterable): The IDs of the products to delete.
+
+    Returns:
+    dict: The number of products "deleted" and the number of IDs that were "missing".
+    """
+    with gc_paused():
+        return _bulk_delete(hashTable, avlTree, ids)
+
+def _bulk_delete(hashTable, avlTree, ids):
+    found = []
+    tree_items = []
+    missing = 0
+    for product_id in dict.fromkeys(ids):
+        product = hashTable.get(product_id)
+        if product is None:
+            missing += 1
             continue
-        hashTable.insert(product["id"], product)
-        avlTree.root = avlTree.insert(avlTree.root, product["price"], product["name"])
+        found.append(product_id)
+        tree_items.append((product["price"], product_id))
+
+    hashTable.delete_many(found)
+    avlTree.delete_many(tree_items)
+    return {"deleted": len(found), "missing": missing}
+
+@contextmanager
+def gc_paused():
+    """
+    Pauses the cyclic garbage collector for the duration of a bulk operation. Bulk loads
+    allocate many long-lived objects at once, which would otherwise trigger repeated full
+    collections that find nothing to free.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
 
 # Function to generate a single product with specified ID, name, and price
-def generate_product(id=None, name=None, price=None):
+def generate_product(id=None, name=None, price=None, as_record=False):
     """
     Generates a product dictionary with specified ID (or generates a new UUID if None), 
     name, and price.
@@ -94,19 +283,22 @@ def generate_product(id=None, name=None, price=None):
     id (str, optional): The product ID. If None, generates a new UUID.
     name (str): The product name.
     price (int): The product price.
+    as_record (bool): Return a compact Product record instead of a dictionary.
     
     Returns:
     dict: A dictionary containing the product details.
     """
+    if as_record:
+        return Product(id if id else str(uuid.uuid4()), name, price)
     return {
         "id": id if id else str(uuid.uuid4()),
         "name": name,
         "price": price
     }
 
-def insert_product(hashtable, avl_tree):
+def insert_product(inventory):
     """
-    Get product details from user and insert into both data structures.
+    Get product details from user and insert them into the inventory.
     ID is auto-generated using UUID.
     """
     print("\n=== Insert New Product ===")
@@ -133,7 +325,7 @@ def insert_product(hashtable, avl_tree):
             if abs(round(price, 2) - price) > 0.00001:
                 print("Error: Price cannot have more than 2 decimal places")
                 continue
-            if price <= 0:
+            if not math.isfinite(price) or price <= 0:
                 print("Error: Price must be greater than 0")
                 continue
             if price > 1000000:
@@ -149,8 +341,7 @@ def insert_product(hashtable, avl_tree):
         "price": price
     }
     
-    new_product = hashtable.insert(None, new_product)
-    avl_tree.root = avl_tree.insert(avl_tree.root, price, new_product["name"])
+    new_product = inventory.insert(new_product)
     
     print("\nProduct added successfully!")
     print(f"Generated ID: {new_product['id'][:8]}")
@@ -0,0 +1,203 @@
+# ----------------------------------------------------------------------------------------------------------------------
+# Inventory Write-Ahead Log
+# Author: Unique Karanjit
+# Append-only operation log that makes changes durable between snapshots with group commit
+# ----------------------------------------------------------------------------------------------------------------------
+
+import json
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+
+# Every record is a header (payload length, CRC-32 of the payload) followed by the payload,
+# a compact JSON array: ["i", id, name, price], ["d", id] or ["p", id, price].
+INSERT = "i"
+DELETE = "d"
+PRICE = "p"
+_RECORD = struct.Struct("<II")
+
+
+def read_log(path):
+    """
+    Reads the valid records of a log file.
+
+    Reading stops at the first record that is incomplete or fails its checksum, which is
+    what a crash in the middle of a write leaves behind.
+
+    :param path: The log file. A missing file is an empty log.
+    :return: A (records, length) pair: the decoded records, and the number of bytes they span.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+
+    records = []
+    position = 0
+    while position + _RECORD.size <= len(data):
+        length, checksum = _RECORD.unpack_from(data, position)
+        start = position + _RECORD.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            break
+        try:
+            records.append(json.loads(payload))
+        except ValueError:
+            break
+        position = start + length
+    return records, position
+
+
+class WriteAheadLog:
+    """
+    An append-only log of inventory changes with group commit.
+
+    Appended records are buffered in memory and written with a single write and fsync once
+    sync_every records are pending or sync_interval seconds have passed since the last sync,
+    so a burst of changes shares one fsync instead of paying for one each. When no further
+    record arrives, a background timer syncs the pending ones sync_interval seconds after the
+    last sync, so the end of a burst is not left unsynced. A record is durable once the sync
+    that covers it returns; call sync() to force one. The log may be appended to from several
+    threads.
+    """
+
+    def __init__(self, path, sync_every=64, sync_interval=0.05):
+        """
+        Opens a log, creating it if needed.
+
+        Records left by a previous run are kept for replay() and a torn record at the end of
+        the file is cut off, so new records are never appended after garbage.
+
+        :param path: The log file.
+        :param sync_every: Sync once this many records are pending (1 syncs every record).
+        :param sync_interval: Sync pending records this many seconds after the last sync (infinity
+                              leaves syncing to sync_every and explicit sync() calls).
+        """
+        if sync_every < 1:
+            raise ValueError("sync_every must be at least 1")
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+
+        self._recovered, length = read_log(path)
+        self._file = open(path, "ab")
+        if self._file.tell() != length:
+            self._file.truncate(length)
+            os.fsync(self._file.fileno())
+        self._buffer = []
+        self._size = length  # Bytes in the file plus bytes still buffered.
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._timer = None  # Pending idle sync, see append().
+        self.syncs = 0
+
+    def replay(self):
+        """
+        Returns the records found when the log was opened, oldest first, and forgets them.
+        """
+        records, self._recovered = self._recovered, []
+        return records
+
+    def append(self, record):
+        """
+        Appends a record, syncing if the group-commit policy says so.
+
+        :param record: A record list, see the module header.
+        """
+        payload = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode()
+        with self._lock:
+            self._buffer.append(_RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._size += _RECORD.size + len(payload)
+            elapsed = time.monotonic() - self._last_sync
+            if len(self._buffer) >= self.sync_every or elapsed >= self.sync_interval:
+                self._sync()
+            elif self._timer is None and math.isfinite(self.sync_interval):
+                self._timer = threading.Timer(self.sync_interval - elapsed, self._sync_idle)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sync_idle(self):
+        """
+        Runs on the timer thread: syncs the records still pending when the interval ran out.
+        """
+        with self._lock:
+            self._timer = None
+            if not self._file.closed:
+                self._sync()
+
+    def log_insert(self, product):
+        """
+        Appends an insert (or replace) of a stored product.
+        """
+        self.append([INSERT, product['id'], product['name'], product['price']])
+
+    def log_delete(self, product_id):
+        """
+        Appends a delete.
+        """
+        self.append([DELETE, product_id])
+
+    def log_price(self, product_id, price):
+        """
+        Appends a price change.
+        """
+        self.append([PRICE, product_id, price])
+
+    def sync(self):
+        """
+        Writes the buffered records and fsyncs the file.
+        """
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        """
+        Does the work of sync() with the lock held.
+        """
+        if self._buffer:
+            self._file.write(b"".join(self._buffer))
+            self._buffer.clear()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.syncs += 1
+        self._last_sync = time.monotonic()
+
+    def reset(self):
+        """
+        Discards every record, once a snapshot covering them has been saved.
+        """
+        with self._lock:
+            self._buffer.clear()
+            self._file.truncate(0)
+            os.fsync(self._file.fileno())
+            self._size = 0
+            self._last_sync = time.monotonic()
+
+    @property
+    def size(self):
+        """
+        The size of the log in bytes, including records that are not yet synced.
+        """
+        return self._size
+
+    def close(self):
+        """
+        Syncs any pending records, stops the idle sync timer and closes the file.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()